@@ -30,15 +30,25 @@ else:
 def menu_func_export(self, context):
     self.layout.operator("export.mdl", text="Leadwerks (.mdl, .tex)")
 
+def menu_func_import(self, context):
+    self.layout.operator("import.mdl", text="Leadwerks (.mdl)")
+
 def register():
     bpy.utils.register_module(__name__)
 
     bpy.types.INFO_MT_file_export.append(menu_func_export)
+    bpy.types.INFO_MT_file_import.append(menu_func_import)
 
 
 def unregister():
+    # Dumper is only loaded if something was exported
+    debug_xml = sys.modules.get('%s.leadwerks.debug_xml' % __name__)
+    if debug_xml:
+        debug_xml.cancel()
+
     bpy.utils.unregister_module(__name__)
     bpy.types.INFO_MT_file_export.remove(menu_func_export)
+    bpy.types.INFO_MT_file_import.remove(menu_func_import)
 
 if __name__ == "__main__":
     register()
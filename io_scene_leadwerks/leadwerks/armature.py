@@ -1,9 +1,48 @@
+import re
+
 import bpy
+import numpy
 from . import utils
-from .config import CONFIG
+from .config import ExportOptions
 from mathutils import Matrix
 
 
+# Basis of bones without animation, the same for all of them
+BONE_BASIS = numpy.array(utils.magick_convert(Matrix((
+    (1.0, 0.0, 0.0, 0.0),
+    (0.0, 0.0, 1.0, 0.0),
+    (0.0, -1.0, 0.0, 0.0),
+    (0.0, 0.0, 0.0, 1.0),
+)) * Matrix.Rotation(1.5707963267948966*2, 4, 'Z')), dtype=numpy.float32)
+
+MTX4_Z90 = numpy.array(utils.mtx4_z90)
+
+# utils.magick_convert as element-wise signs
+MAGICK_SIGNS = numpy.ones((4, 4))
+for i, j in [[0, 2], [1, 2], [2, 0], [2, 1], [3, 2]]:
+    MAGICK_SIGNS[i][j] = -1
+
+
+# Bone name in F-curve data path like pose.bones["Arm.L"].location
+BONE_DATA_PATH = re.compile(r'^pose\.bones\["((?:[^"\\]|\\.)*)"\]')
+
+
+def matmul(a, b):
+    return numpy.einsum('...ij,...jk->...ik', a, b)
+
+
+def animated_bones(action):
+    """
+    Names of pose bones animated by F-curves of the action
+    """
+    ret = set()
+    for fc in action.fcurves:
+        match = BONE_DATA_PATH.match(fc.data_path)
+        if match:
+            ret.add(re.sub(r'\\(.)', r'\1', match.group(1)))
+    return ret
+
+
 class Bone(object):
     """
     Helper class to store Bone hierarhy data, animations and generate
@@ -15,14 +54,7 @@ class Bone(object):
         self.parent = None
         self.children = []
         self.animations = []
-        self.matrix_basis = Matrix((
-            (1.0, 0.0, 0.0, 0.0),
-            (0.0, 0.0, 1.0, 0.0),
-            (0.0, -1.0, 0.0, 0.0),
-            (0.0, 0.0, 0.0, 1.0),
-        )) * Matrix.Rotation(1.5707963267948966*2, 4, 'Z')
-
-        self.matrix_basis = utils.magick_convert(self.matrix_basis)
+        self.matrix_basis = BONE_BASIS
 
         if blender_data:
             self.blender_data = blender_data
@@ -30,7 +62,7 @@ class Bone(object):
 
     def setup_matrix(self):
         if self.animations:
-            self.matrix_basis = self.animations[-1]['keyframes'][0]
+            self.matrix_basis = self.animations[-1]['keyframes'][0].reshape(4, 4)
 
 
 class Armature(object):
@@ -39,13 +71,21 @@ class Armature(object):
     and bake bone animations
     """
 
-    def __init__(self, blender_data, target_mesh):
+    def __init__(self, blender_data, target_mesh, config=None):
         # @TODO cache parsed armature data in global scope to avoid baking the same animation multiple times
         self.blender_data = blender_data
+        self.config = config or ExportOptions()
         self.current_bone_index = 1
 
         self._name_map = {}
         self._anims_map = {}
+        # Pose bone name -> position in per frame arrays
+        self.bone_slots = {}
+        # (actions x frames x bones x 16) converted keyframes,
+        # bone animations are views of it
+        self.keyframes = None
+        # (frames x bones x 4 x 4) skinning matrices, used for animated bounds
+        self.skin_frames = numpy.zeros((0, 0, 4, 4))
         self.target_mesh = target_mesh
         # Baking animations
         self.parse_animations()
@@ -63,12 +103,12 @@ class Armature(object):
                     self.__needs_export.append(pb.name)
         topmost_bone = Bone()
         topmost_bone.name = blender_data.name
-        anim_tpl = list(self._anims_map.values())[0]
+        anim_tpl = next(iter(self._anims_map.values()), [])
         anims = []
         for a in anim_tpl:
             anims.append({
                 'name': a['name'],
-                'keyframes': [topmost_bone.matrix_basis] * len(a['keyframes'])
+                'keyframes': numpy.tile(BONE_BASIS.reshape(16), (len(a['keyframes']), 1))
             })
         topmost_bone.animations = anims
         topmost_bone.children = self.parse_bones(second_level_bones)
@@ -78,8 +118,14 @@ class Armature(object):
         return Matrix.Identity(4)
 
     def parse_bones(self, bones):
+        """
+        Exported bones of hierarchy, indexed depth first. An explicit
+        stack is used, so long bone chains don't hit the recursion limit
+        """
         ret = []
-        for b in bones:
+        stack = [(b, ret) for b in reversed(bones)]
+        while stack:
+            b, out = stack.pop()
             if not b.name in self.__needs_export:
                 continue
             new_bone = Bone(blender_data=b)
@@ -87,25 +133,27 @@ class Armature(object):
             self.current_bone_index += 1
             new_bone.animations = self._anims_map.get(b.name, [])
             new_bone.setup_matrix()
-            new_bone.children = self.parse_bones(b.children)
             self._name_map[b.name] = new_bone
-            ret.append(new_bone)
+            out.append(new_bone)
+            stack.extend([(c, new_bone.children) for c in reversed(list(b.children))])
         return ret
 
-    def __get_mtx(self, pose_bone):
+    def convert_pose(self, pose, parents):
         """
-        Conversion of bone matrix to Leadwerks order
+        Conversion of (bones x 4 x 4) armature space pose to parent
+        relative matrices in Leadwerks order, (bones x 16)
         taken from fbx exporter
         """
-        mtx = pose_bone.matrix.copy()
-        if not pose_bone.parent:
-            mtx = mtx * utils.mtx4_z90
-        else:
-            par = pose_bone.parent.matrix.copy()
-            mtx = (par * utils.mtx4_z90).inverted() * mtx * utils.mtx4_z90
-        mtx.transpose()
-        mtx = utils.magick_convert(mtx)
-        return mtx
+        world = matmul(pose, MTX4_Z90)
+        local = world.copy()
+        children = parents >= 0
+        if children.any():
+            local[children] = matmul(
+                numpy.linalg.inv(world[parents[children]]),
+                world[children]
+            )
+        local = local.transpose(0, 2, 1) * MAGICK_SIGNS
+        return local.reshape(-1, 16)
 
     def parse_animations(self):
          # get current context and then switch to dopesheet temporarily
@@ -113,36 +161,68 @@ class Armature(object):
         bpy.context.area.type = "DOPESHEET_EDITOR"
         bpy.context.space_data.mode = "ACTION"
 
-        # For each action retrieving bone matrixes
+        pose_bones = self.blender_data.pose.bones
+        for slot, pb in enumerate(pose_bones):
+            self.bone_slots[pb.name] = slot
+        parents = numpy.array([
+            self.bone_slots[pb.parent.name] if pb.parent else -1 for pb in pose_bones
+        ], dtype=numpy.int32)
 
-        actions = self.__get_needed_actions()
-        for idx, action in enumerate(actions):
+        rest_inverted = None
+        if self.config.export_aabb:
+            rest_inverted = numpy.array([
+                numpy.array(pb.bone.matrix_local.inverted()) for pb in pose_bones
+            ])
+
+        actions = []
+        for action in self.__get_needed_actions():
             if not action:
                 break
-            baking_step = CONFIG.anim_baking_step
+            actions.append(action)
+
+        baking_step = self.config.anim_baking_step
+        frame_ranges = [
+            range(
+                int(action.frame_range[0]-baking_step),
+                int(action.frame_range[1]+baking_step),
+                baking_step
+            )
+            for action in actions
+        ]
+        frames_count = max([len(r) for r in frame_ranges] or [0])
+        self.keyframes = numpy.zeros(
+            (len(actions), frames_count, len(pose_bones), 16),
+            dtype=numpy.float32
+        )
+
+        # For each action retrieving bone matrixes
+        pose = numpy.zeros(len(pose_bones) * 16, dtype=numpy.float32)
+        skin_frames = []
+        for idx, action in enumerate(actions):
             # set active action
             bpy.context.area.spaces.active.action = action
 
-            start_frame = action.frame_range[0]-baking_step
-            end_frame = action.frame_range[1]+baking_step
-
-            for frame in range(int(start_frame), int(end_frame), baking_step):
+            for frame_idx, frame in enumerate(frame_ranges[idx]):
                 bpy.context.scene.frame_set(frame)
 
-                for b in self.blender_data.data.bones:
-                    pose_bone = self.blender_data.pose.bones[b.name]
-                    mtx = self.__get_mtx(pose_bone)
+                # Blender matrices are flattened column by column
+                pose_bones.foreach_get('matrix', pose)
+                matrices = pose.reshape(-1, 4, 4).transpose(0, 2, 1).astype(numpy.float64)
+                self.keyframes[idx, frame_idx] = self.convert_pose(matrices, parents)
 
-                    if not b.name in self._anims_map:
-                        self._anims_map[b.name] = []
+                if rest_inverted is not None:
+                    skin_frames.append(matmul(matrices, rest_inverted))
 
-                    if len(self._anims_map[b.name]) == idx:
-                        self._anims_map[b.name].append({
-                            'name': action.name,
-                            'keyframes': []
-                        })
+            for b in self.blender_data.data.bones:
+                if not b.name in self._anims_map:
+                    self._anims_map[b.name] = []
+                self._anims_map[b.name].append({
+                    'name': action.name,
+                    'keyframes': self.keyframes[idx, 0:len(frame_ranges[idx]), self.bone_slots[b.name]]
+                })
 
-                    self._anims_map[b.name][idx]['keyframes'].append(mtx)
+        if skin_frames:
+            self.skin_frames = numpy.array(skin_frames)
 
         bpy.data.scenes[0].frame_set(1)
         bpy.context.area.type = current_context
@@ -152,11 +232,58 @@ class Armature(object):
         if not all_actions:
             return []
 
-        if CONFIG.export_all_actions:
-            return all_actions
+        if self.config.export_all_actions:
+            # Checked before baking, so actions of other objects
+            # never run through frame_set
+            actions = []
+            for action in all_actions:
+                reason = self.skip_reason(action)
+                if reason:
+                    self.__report_skipped(action, reason)
+                else:
+                    actions.append(action)
+            return actions
 
+        # Filtered like any other action, the first one passing
+        # is taken instead of a skipped active action
         active_action = bpy.context.area.spaces.active.action
-        return [active_action] if active_action else [all_actions[0]]
+        if active_action:
+            reason = self.skip_reason(active_action)
+            if not reason:
+                return [active_action]
+            self.__report_skipped(active_action, reason)
+        for action in all_actions:
+            if action != active_action and not self.skip_reason(action):
+                return [action]
+        return []
+
+    def __report_skipped(self, action, reason):
+        print('Armature "%s": action "%s" skipped, %s' % (
+            self.blender_data.name, action.name, reason
+        ))
+
+    def skip_reason(self, action):
+        """
+        Why the action shouldn't be baked for this armature,
+        empty string if it should
+        """
+        prefix = self.config.action_name_prefix
+        if prefix and not action.name.startswith(prefix):
+            return 'name does not start with "%s"' % prefix
+
+        marker = self.config.action_marker
+        if marker and not marker in [m.name for m in action.pose_markers]:
+            return 'no "%s" pose marker' % marker
+
+        if not animated_bones(action) & set(self.bone_slots.keys()):
+            return 'no bones of the armature animated'
+        return ''
+
+    def get_bones_map(self):
+        """
+        Exported bones by name
+        """
+        return self._name_map
 
     def get_bone_by_name(self, bone_name):
         """
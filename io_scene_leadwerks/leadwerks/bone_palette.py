@@ -0,0 +1,138 @@
+"""
+Partitioning of skinned surfaces into sub-surfaces referencing a
+limited palette of bones, to fit uniform budget of skinning shaders.
+
+Triangles are grouped by the set of bones they are weighted to. A
+partition is filled with groups adding no new bones first and then with
+groups adding the fewest new bones, so vertices shared between
+partitions (and duplicated) stay few. Bone indices of a partition are
+remapped to positions in its palette, which is stored in the 'bones'
+surface property.
+"""
+from array import array
+
+
+def triangle_bone_groups(surface):
+    """
+    Returns {frozenset of bones: [triangle start offsets]}
+    """
+    indexes = surface['bone_indexes']
+    weights = surface['bone_weights']
+    indices = surface['indices']
+    ret = {}
+    for t in range(0, len(indices) - 2, 3):
+        bones = set()
+        for v in indices[t:t + 3]:
+            for i in range(v * 4, v * 4 + 4):
+                if weights[i]:
+                    bones.add(indexes[i])
+        ret.setdefault(frozenset(bones), []).append(t)
+    return ret
+
+
+def surface_bones(surface):
+    ret = set()
+    for bones in triangle_bone_groups(surface).keys():
+        ret |= bones
+    return ret
+
+
+def split_groups(groups, max_bones):
+    """
+    Greedily packs bone groups to partitions, returns list of
+    (palette, triangle offsets). A group having more bones than
+    max_bones can't be split and gets a partition of its own,
+    see over_budget
+    """
+    left = dict(groups)
+    ret = []
+    while left:
+        bones = set()
+        triangles = []
+        while left:
+            best = None
+            for key in left.keys():
+                added = len(key - bones)
+                if len(bones) + added > max_bones and (bones or triangles):
+                    continue
+                if best is None or added < best[0]:
+                    best = (added, key)
+                    if not added:
+                        break
+            if best is None:
+                break
+            key = best[1]
+            bones |= key
+            triangles.extend(left.pop(key))
+        ret.append((sorted(bones), sorted(triangles)))
+    return ret
+
+
+def make_partition(surface, palette, triangles):
+    indices = surface['indices']
+    vertex_count = len(surface['vertices']) // 3
+
+    remap = {}
+    order = array('I')
+    new_indices = array('I')
+    for t in triangles:
+        for v in indices[t:t + 3]:
+            idx = remap.get(v)
+            if idx is None:
+                idx = len(order)
+                remap[v] = idx
+                order.append(v)
+            new_indices.append(idx)
+
+    ret = dict(surface)
+    ret['indices'] = new_indices
+    for key, data in surface.items():
+        if not isinstance(data, array) or key in ['indices', 'strip'] or not data:
+            continue
+        elements = len(data) // vertex_count
+        out = array(data.typecode)
+        for v in order:
+            out.extend(data[v * elements:v * elements + elements])
+        ret[key] = out
+
+    local = dict([(b, i) for i, b in enumerate(palette)])
+    indexes = ret['bone_indexes']
+    weights = ret['bone_weights']
+    for i in range(0, len(indexes)):
+        indexes[i] = local[indexes[i]] if weights[i] else 0
+    ret['bones'] = palette
+    return ret
+
+
+def partition_surface(surface, max_bones):
+    """
+    Returns list of surfaces, the surface itself if it fits the budget
+    """
+    groups = triangle_bone_groups(surface)
+    bones = set()
+    for key in groups.keys():
+        bones |= key
+    if len(bones) <= max_bones:
+        return [surface]
+    return [
+        make_partition(surface, palette, triangles)
+        for palette, triangles in split_groups(groups, max_bones)
+    ]
+
+
+def over_budget(surfaces, max_bones):
+    """
+    Partitioned surfaces whose palette is still above max_bones
+    """
+    return [s for s in surfaces if len(s.get('bones') or []) > max_bones]
+
+
+def histogram(surfaces):
+    """
+    Sorted list of (bones count, surfaces count)
+    """
+    ret = {}
+    for s in surfaces:
+        ct = len(s['bones']) if 'bones' in s else len(surface_bones(s))
+        ret[ct] = ret.get(ct, 0) + 1
+    return sorted(ret.items())
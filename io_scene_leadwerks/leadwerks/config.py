@@ -1,9 +1,13 @@
 # <pep8 compliant>
 
+from types import MappingProxyType
+
 
 class CONFIG(object):
     """
-    This values are managed by user from GUI
+    Default export options. Kept for compatibility with scripts,
+    the exporter itself reads ExportOptions made of DEFAULTS
+    and the values managed by user from GUI
     """
     file_version = 2
     file_extension = '.mdl'
@@ -11,10 +15,34 @@ class CONFIG(object):
     export_animation = True
     export_materials = True
     overwrite_textures = False
+    texture_format = 'png'
+    texture_compression = 'NONE'
+    mipmap_filter = 'BOX'
     export_specular_color = False
     write_debug_xml = True
     anim_baking_step = 1
     export_all_actions = False
+    action_name_prefix = ''
+    action_marker = ''
+    split_animations = False
+    export_aabb = False
+    export_cache_dir = ''
+    export_cache_size = 1024
+    weld_vertices = False
+    weld_position_epsilon = 0.00001
+    weld_normal_epsilon = 0.001
+    weld_uv_epsilon = 0.00001
+    export_triangle_strips = False
+    max_bones_per_surface = 0
+    write_stats_report = True
+    budget_action = 'WARN'
+    budget_triangles = 0
+    budget_vertices = 0
+    budget_bones = 0
+    budget_actions = 0
+    budget_keyframes = 0
+    budget_texture_memory = 0
+    budget_file_size = 0
 
 
     @classmethod
@@ -35,3 +63,31 @@ class CONFIG(object):
                 continue
             vals[k] = v
         return vals
+
+
+# Taken once, so CONFIG.update called by a script doesn't change
+# options of exports already running
+DEFAULTS = MappingProxyType(CONFIG.values())
+
+
+class ExportOptions(object):
+    """
+    Read only options of a single export, passed to everything the
+    exporter creates, so several exports may run at the same time
+    """
+    def __init__(self, options=None):
+        options = options or {}
+        for k, default in DEFAULTS.items():
+            object.__setattr__(self, k, options.get(k, default))
+        if self.file_extension == '.gmf':
+            object.__setattr__(self, 'file_version', 1)
+        object.__setattr__(self, '_keys', sorted(DEFAULTS.keys()))
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Export options are read only')
+
+    def __delattr__(self, key):
+        raise AttributeError('Export options are read only')
+
+    def values(self):
+        return dict([(k, getattr(self, k)) for k in self._keys])
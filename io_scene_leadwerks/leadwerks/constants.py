@@ -42,4 +42,16 @@ MDL_QUAD_STRIP = 8
 MDL_QUADS = 9
 MDL_POLYGON = 10
 
-MDL_VERSION = 2
\ No newline at end of file
+MDL_VERSION = 2
+
+TEX_SIGNATURE = 0x00584554  # "TEX\0"
+TEX_VERSION = 1
+
+TEX_RGBA = 1
+TEX_DXT1 = 2
+TEX_DXT5 = 4
+
+TEX_TARGET_2D = 2
+
+TEX_FILTER_PIXEL = 0
+TEX_FILTER_SMOOTH = 1
@@ -0,0 +1,66 @@
+"""
+Generation of debug XML dumps off the export critical path.
+Compiled .mdl files are dumped back to XML by a background worker
+with the xml_tool dumper, so the operator does not wait for it
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from xml_tool.dumper import MdlDumper
+
+
+_executor = None
+_pending = []
+_lock = threading.Lock()
+
+
+def _dump(mdl_path):
+    xml_path = '%s.xml' % mdl_path
+    tmp_path = '%s.tmp' % xml_path
+    try:
+        with open(tmp_path, 'w') as f:
+            MdlDumper(mdl_path).dump(f)
+        os.replace(tmp_path, xml_path)
+    except Exception as e:
+        print('Debug XML for "%s" not written: %s' % (mdl_path, e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def schedule(mdl_path):
+    """
+    Queues XML dump of already written .mdl file
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1)
+        _pending[:] = [f for f in _pending if not f.done()]
+        _pending.append(_executor.submit(_dump, mdl_path))
+
+
+def flush():
+    """
+    Waits until all queued dumps are written
+    """
+    with _lock:
+        pending = list(_pending)
+    for f in pending:
+        f.result()
+
+
+def cancel():
+    """
+    Drops dumps which are not started yet and stops the worker
+    """
+    global _executor
+    with _lock:
+        pending = list(_pending)
+        del _pending[:]
+        executor = _executor
+        _executor = None
+    for f in pending:
+        f.cancel()
+    if executor is not None:
+        executor.shutdown(wait=True)
@@ -0,0 +1,126 @@
+"""
+Content-addressed cache of exported files.
+
+Entries are keyed by hash of normalized exporter inputs and versions
+of the writers producing them, and may live on a shared filesystem, so
+unchanged assets exported on another machine are copied instead of
+being encoded again. Files are written to the cache atomically, last
+use is tracked with modification time and the least recently used
+entries are evicted when a store takes the cache over its size limit.
+Size of the cache is counted once per instance, on its first store,
+and kept up to date with stored and evicted entries.
+
+Layout: <cache dir>/<first 2 key chars>/<key><extension>
+"""
+import os
+import shutil
+import hashlib
+
+
+# Bump on changes of key parts or entry layout
+CACHE_VERSION = 3
+
+# Eviction frees space below the limit, so following stores don't evict again
+EVICT_TO = 0.9
+
+
+class ExportCache(object):
+    def __init__(self, path, max_size):
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        # Bytes of all entries, None until counted
+        self.size = None
+
+    def make_key(self, *parts):
+        h = hashlib.sha1()
+        for p in (CACHE_VERSION, ) + parts:
+            if not isinstance(p, bytes):
+                p = str(p).encode('utf-8')
+            h.update(p)
+            h.update(b'\x00')
+        return h.hexdigest()
+
+    def entry_path(self, key, ext):
+        return os.path.join(self.path, key[0:2], '%s%s' % (key, ext))
+
+    def fetch(self, key, out_path):
+        """
+        Copies cached entry to out_path, returns False on a miss
+        """
+        ext = os.path.splitext(out_path)[1]
+        path = self.entry_path(key, ext)
+        try:
+            tmp_path = '%s.tmp' % out_path
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, out_path)
+            # Marks entry as recently used
+            os.utime(path, None)
+        except (IOError, OSError):
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key, src_path):
+        ext = os.path.splitext(src_path)[1]
+        path = self.entry_path(key, ext)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Unique name, other machines may store the same entry
+            tmp_path = '%s.%s.%s.tmp' % (path, os.getpid(), id(self))
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+        except (IOError, OSError) as e:
+            print('Export cache: "%s" not stored: %s' % (src_path, e))
+            return
+
+        if self.size is None:
+            self.size = sum([size for mtime, size, p in self.entries()])
+        else:
+            self.size += os.path.getsize(src_path)
+        if self.size > self.max_size:
+            self.evict()
+
+    def entries(self):
+        """
+        (last use, size, path) of all entries
+        """
+        ret = []
+        for root, dirs, files in os.walk(self.path):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                ret.append((st.st_mtime, st.st_size, path))
+        return ret
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache takes
+        EVICT_TO of its size limit, returns number of removed entries
+        """
+        entries = self.entries()
+        # Other machines sharing the cache may have stored entries too
+        self.size = sum([size for mtime, size, path in entries])
+
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if self.size <= self.max_size * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+            removed += 1
+        self.evicted += removed
+        return removed
@@ -1,17 +1,26 @@
 # <pep8 compliant>
 
 import os
+import re
+import json
+import shutil
+import tempfile
 
-from xml.dom import minidom
-
+import bpy
 from mathutils import Vector, Matrix, Euler
 
 from . import constants
 from . import utils
 from . import templates
+from . import debug_xml
+from . import tex
+from . import stats
+from . import signature
 
-from .mesh import Mesh
-from .config import CONFIG
+from .mesh import Mesh, MeshCache
+from .material import MaterialCache
+from .export_cache import ExportCache
+from .config import ExportOptions
 
 from xml_tool import compiler
 
@@ -21,22 +30,43 @@ class LeadwerksExporter(object):
         # Changes Blender to "object" mode
         # bpy.ops.object.mode_set(mode='OBJECT')
         self.options = kwargs
+        self.config = ExportOptions(kwargs)
         self.context = kwargs.get('context')
         self.materials = {}
+        self.export_cache = None
+        if self.config.export_cache_dir:
+            self.export_cache = ExportCache(
+                self.config.export_cache_dir,
+                self.config.export_cache_size * 1024 * 1024
+            )
+        self.material_cache = MaterialCache(self.config, self.export_cache)
+        self.mesh_cache = MeshCache()
+        # Rendered surfaces and bones of shared meshes by Mesh.cache_key
+        self.formatted_meshes = {}
+        # Names of actions written to ANIMATIONKEYS, None for all of them
+        self.animation_filter = None
+        self.animated_meshes = []
+        # Scene traversal results by object pointer
+        self._children = None
+        self._meshables = {}
+        self._has_meshables = {}
+        # Statistics of written models, see stats.AssetStats
+        self.assets = []
+        self.asset_stats = None
+        # (staged path, output path, is model) of files waiting for budget checks
+        self.staged = []
+        self.staging_dir = None
+        self.staging_count = 0
         self.out_xml = ''
-        CONFIG.update(self.options)
-
-    def update_config(self):
-        for k, v in dict(CONFIG.__dict__).items():
-            default = v
-            val = self.options.get(k, default)
-            setattr(CONFIG, k, val)
 
     def export(self):
         """
         Entry point
         """
 
+        # Previous export may still be dumping files we are about to overwrite
+        debug_xml.flush()
+
         exportables = self.get_exportables()
 
         if not exportables:
@@ -46,104 +76,366 @@ class LeadwerksExporter(object):
             )
             return {'CANCELLED'}
 
-        for e in exportables:
-            wanted_name = os.path.basename(self.options['filepath'])
-            name = wanted_name[0:-4]
-            if len(exportables) > 1:
-                name = '%s_%s' % (name, e['object'].name.lower())
-            self.save_exportable(e, name)
+        # Files are written to a staging directory first and moved
+        # to the output one only if assets fit their budgets
+        self.staging_dir = tempfile.mkdtemp(prefix='leadwerks_export_')
+        try:
+            for e in exportables:
+                wanted_name = os.path.basename(self.options['filepath'])
+                name = wanted_name[0:-4]
+                if len(exportables) > 1:
+                    name = '%s_%s' % (name, e['object'].name.lower())
+                self.save_exportable(e, name)
+
+            if not self.check_budgets():
+                return {'CANCELLED'}
+            self.commit_files()
+        finally:
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+            self.staging_dir = None
 
         self.export_materials()
+
+        if self.export_cache:
+            self.options['operator'].report(
+                {'INFO'},
+                'Export cache: %s hits, %s misses, %s entries evicted' % (
+                    self.export_cache.hits, self.export_cache.misses,
+                    self.export_cache.evicted
+                )
+            )
         return {'FINISHED'}
 
     def save_exportable(self, e, name=None):
-        context = {
-            'code': constants.MDL_FILE,
-            'version': CONFIG.file_version,
-            'childs': self.format_block(e)
-        }
-        res = templates.render('FILE', context)
-
         out_path = self.options['filepath']
         if name:
-            name = '%s%s' % (name, CONFIG.file_extension)
+            name = '%s%s' % (name, self.config.file_extension)
             out_path = os.path.join(os.path.dirname(out_path), name)
 
-        doc = minidom.parseString(res)
-        res = doc.toprettyxml()
+        self.asset_stats = stats.AssetStats(os.path.basename(out_path))
+        self.assets.append(self.asset_stats)
+
+        # Keyed by scene inputs, so hits skip parsing, baking and formatting
+        key = None
+        if self.export_cache:
+            key = self.export_cache.make_key(
+                'exportable', compiler.COMPILER_VERSION, os.path.basename(out_path),
+                *signature.exportable_parts(e, self.config)
+            )
+            if self.fetch_exportable(key, out_path):
+                return
+        first_staged = len(self.staged)
+
+        split_animations = self.config.split_animations and self.config.export_animation
+        self.animated_meshes = []
+        # Base model of animation library keeps bind pose only
+        self.animation_filter = [] if split_animations else None
+        self.save_file(self.format_block(e), out_path)
+
+        if split_animations:
+            self.save_animation_library(out_path)
+        self.animation_filter = None
 
-        if CONFIG.write_debug_xml:
-            with open('%s.xml' % out_path, 'w') as f:
-                f.write(res)
+        if key:
+            self.store_exportable(key, first_staged)
+
+    def fetch_exportable(self, key, out_path):
+        """
+        Stages files of exportable taken from ExportCache and takes over
+        its statistics and materials, returns False if any file is missing
+        """
+        index_path = os.path.join(self.staging_dir, '%s.json' % key)
+        if not self.export_cache.fetch(key, index_path):
+            return False
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+
+        fetched = []
+        for name, file_key, is_model in index['files']:
+            file_out_path = os.path.join(os.path.dirname(out_path), name)
+            path = self.staging_path(file_out_path)
+            if not self.export_cache.fetch(file_key, path):
+                for path, file_out_path, is_model in fetched:
+                    os.remove(path)
+                return False
+            fetched.append((path, file_out_path, is_model))
+
+        self.asset_stats.restore(index['stats'])
+        for name, is_animated in sorted(self.asset_stats.materials.items()):
+            mat = self.material_cache.get(bpy.data.materials.get(name))
+            mat.is_animated = mat.is_animated or is_animated
+            self.materials.setdefault(mat.name, mat)
+            self.asset_stats.add_textures([mat])
+        for w in self.asset_stats.warnings:
+            print(w)
+            self.options['operator'].report({'WARNING'}, w)
+        for path, file_out_path, is_model in fetched:
+            self.stage(path, file_out_path, is_model)
+        return True
+
+    def store_exportable(self, key, first_staged):
+        """
+        Stores files staged for exportable since first_staged and an
+        index of them with statistics under the key
+        """
+        files = []
+        for idx, (path, out_path, is_model) in enumerate(self.staged[first_staged:]):
+            file_key = self.export_cache.make_key(key, idx)
+            self.export_cache.store(file_key, path)
+            files.append([os.path.basename(out_path), file_key, is_model])
+
+        # Stored last, so partially stored entries are never fetched
+        index_path = os.path.join(self.staging_dir, '%s.json' % key)
+        with open(index_path, 'w') as f:
+            json.dump({'files': files, 'stats': self.asset_stats.counters()}, f)
+        self.export_cache.store(key, index_path)
+
+    def save_file(self, childs, out_path):
+        context = {
+            'code': constants.MDL_FILE,
+            'version': self.config.file_version,
+            'childs': childs
+        }
+        res = templates.render('FILE', context).strip()
 
-        cc = compiler.MdlCompiler(res, out_path)
+        path = self.staging_path(out_path)
+        cc = compiler.MdlCompiler(res, path)
         cc.compile()
+        self.stage(path, out_path, True)
+
+    def staging_path(self, out_path):
+        self.staging_count += 1
+        return os.path.join(
+            self.staging_dir,
+            '%s_%s' % (self.staging_count, os.path.basename(out_path))
+        )
+
+    def stage(self, path, out_path, is_model=False):
+        self.staged.append((path, out_path, is_model))
+        self.asset_stats.add_file(os.path.basename(out_path), os.path.getsize(path))
+
+    def check_budgets(self):
+        """
+        Reports assets over budget and writes statistics report,
+        returns False if export has to be cancelled
+        """
+        violations = stats.check_budgets(self.assets, self.config)
+        cancel = bool(violations) and self.config.budget_action == 'CANCEL'
+        for v in violations:
+            print('Budget exceeded: %s' % v)
+            self.options['operator'].report({'ERROR' if cancel else 'WARNING'}, v)
+
+        # Like the models, report of a cancelled export isn't written
+        if self.config.write_stats_report and not cancel:
+            stats.write_report(
+                '%s.stats.json' % os.path.splitext(self.options['filepath'])[0],
+                self.assets, violations
+            )
+        return not cancel
+
+    def commit_files(self):
+        """
+        Moves staged files to the output directory
+        """
+        for path, out_path, is_model in self.staged:
+            tmp_path = '%s.tmp' % out_path
+            shutil.move(path, tmp_path)
+            os.replace(tmp_path, out_path)
+            if is_model and self.config.write_debug_xml:
+                # Dumped from the compiled binary in background
+                debug_xml.schedule(out_path)
+        self.staged = []
+
+    def save_animation_library(self, model_path):
+        """
+        Writes every action of exported armatures to its own file
+        (bones with keys of that action only) and a manifest
+        mapping action names to these files
+        """
+        actions = []
+        for m in self.animated_meshes:
+            for a in m.armature.bones[0].animations:
+                if not a['name'] in actions:
+                    actions.append(a['name'])
+        if not actions:
+            return
+
+        base = os.path.splitext(model_path)[0]
+        manifest = {
+            'model': os.path.basename(model_path),
+            'animations': {}
+        }
+        slugs = set()
+        for action in actions:
+            self.animation_filter = [action]
+            slug = re.sub(r'[^\w\-]+', '_', action).lower()
+            # Names differing in case or punctuation only get a suffix
+            unique = slug
+            suffix = 2
+            while unique in slugs:
+                unique = '%s_%s' % (slug, suffix)
+                suffix += 1
+            slugs.add(unique)
+            path = '%s_%s%s' % (base, unique, self.config.file_extension)
+            self.save_file(
+                utils.join_map(self.format_animation_mesh, self.animated_meshes),
+                path
+            )
+            manifest['animations'][action] = os.path.basename(path)
+
+        out_path = '%s.animations.json' % base
+        path = self.staging_path(out_path)
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=4, sort_keys=True)
+        self.stage(path, out_path)
+
+    def format_tree(self, roots, get_children, get_context):
+        """
+        Renders items with their descendants in the same order as nested
+        formatting calls would, but with an explicit stack, so depth of
+        hierarchies isn't limited by the recursion limit.
+        get_context returns template name and context of an item before its
+        children are formatted, rendered children go to 'childs' of it
+        """
+        ret = []
+        stack = [(item, None, ret) for item in reversed(roots)]
+        while stack:
+            item, rendering, out = stack.pop()
+            if rendering:
+                template, context, childs = rendering
+                context['childs'] = ''.join(childs)
+                out.append(templates.render(template, context))
+                continue
+            template, context = get_context(item)
+            childs = []
+            stack.append((item, (template, context, childs), out))
+            stack.extend([(c, None, childs) for c in reversed(get_children(item))])
+        return ''.join(ret)
 
     def format_block(self, exportable):
+        return self.format_tree([exportable], lambda e: e['children'], self.block_context)
+
+    def format_bones(self, bones):
+        return self.format_tree(bones, lambda b: b.children, self.bone_context)
+
+    def block_context(self, exportable):
         if not exportable['parent']:
             matrix = exportable['object'].matrix_world.copy()
         else:
             matrix = exportable['object'].matrix_local.copy()
         matrix = utils.convert_to_lw_matrix(matrix)
         if exportable['type'] == 'MESH':
-            return self.format_mesh(exportable, matrix)
+            return 'MESH', self.mesh_context(exportable, matrix)
         else:
-            return self.format_node(exportable, matrix)
+            return 'NODE', self.node_context(exportable, matrix)
 
     def export_materials(self):
-        if not CONFIG.export_materials:
+        if not self.config.export_materials:
             return
+        skipped = 0
+        # Texture conversions of this export only, others may run
+        # in the same worker pool
+        jobs = {}
         for m in self.materials.values():
             dir = os.path.dirname(self.options['filepath'])
-            m.save(dir)
+            if not m.save(dir, jobs=jobs):
+                skipped += 1
+
+        failed = tex.wait(jobs)
+        if failed:
+            self.options['operator'].report(
+                {'WARNING'},
+                '%s textures not exported, see console' % len(failed)
+            )
+
+        self.options['operator'].report(
+            {'INFO'},
+            'Materials: %s written, %s unchanged' % (
+                len(self.materials) - skipped, skipped
+            )
+        )
 
     def append(self, data):
         self.out_xml = '%s%s' % (self.out_xml, data)
 
     def get_exportables(self, target=None):
         """
-        Collect exportable objects in current scene
+        Collect exportable objects in current scene.
+        Meshability of every object is computed once bottom-up and
+        the tree is built with an explicit stack, so deep hierarchies
+        are walked a fixed number of times without recursion
         """
-        exportables = []
-        items = []
         if not target:
-            if CONFIG.export_selection:
+            if self.config.export_selection:
                 objs = self.context.selected_objects
             else:
                 objs = self.context.scene.objects
 
-            for o in objs:
-                if o.parent:
-                    continue
-                items.append(o)
+            items = [o for o in objs if not o.parent]
         else:
-            items = list(target.children)
+            items = self.get_children(target)
+
+        self.scan_meshables(items)
 
-        for ob in items:
-            is_meshable = self.is_meshable(ob)
+        exportables = []
+        stack = [(ob, target, exportables) for ob in reversed(items)]
+        while stack:
+            ob, parent, out = stack.pop()
+            is_meshable = self._meshables[ob.as_pointer()]
             if not is_meshable and not self.has_meshables(ob):
                 continue
+
+            children = self.get_children(ob)
             if ob.type == 'ARMATURE':
-                exportables.extend(
-                    self.get_exportables(ob)
-                )
+                # Armature itself is skipped, its children take its place
+                stack.extend([(c, ob, out) for c in reversed(children)])
                 continue
-            elif is_meshable:
-                    item = {
-                        'type': 'MESH',
-                        'object': ob,
-                        'parent': target
-                    }
-            else:
-                item = {
-                    'type': 'NODE',
-                    'object': ob,
-                    'parent': target
-                }
-            item['children'] = self.get_exportables(ob)
-            exportables.append(item)
+
+            item = {
+                'type': 'MESH' if is_meshable else 'NODE',
+                'object': ob,
+                'parent': parent,
+                'children': []
+            }
+            out.append(item)
+            stack.extend([(c, ob, item['children']) for c in reversed(children)])
         return exportables
 
+    def get_children(self, obj):
+        """
+        Children of the object ordered by name like Object.children,
+        which scans all objects on every access
+        """
+        if self._children is None:
+            self._children = {}
+            for o in self.context.scene.objects:
+                if o.parent:
+                    self._children.setdefault(o.parent.as_pointer(), []).append(o)
+            for children in self._children.values():
+                children.sort(key=lambda o: o.name)
+        return self._children.get(obj.as_pointer(), [])
+
+    def scan_meshables(self, roots):
+        """
+        Fills meshability of objects and their subtrees, every object
+        is visited once in post order
+        """
+        stack = [(ob, False) for ob in roots]
+        while stack:
+            ob, visited = stack.pop()
+            key = ob.as_pointer()
+            if visited:
+                self._has_meshables[key] = any([
+                    self._meshables[c.as_pointer()] or self._has_meshables[c.as_pointer()]
+                    for c in self.get_children(ob)
+                ])
+                continue
+            if key in self._meshables:
+                continue
+            self._meshables[key] = self.is_meshable(ob)
+            stack.append((ob, True))
+            stack.extend([(c, False) for c in self.get_children(ob)])
+
     def is_meshable(self, obj):
         """
         Detects if exporter can convert this type of object into mesh
@@ -163,10 +455,10 @@ class LeadwerksExporter(object):
         return False
 
     def has_meshables(self, obj):
-        for ob in obj.children:
-            if self.is_meshable(ob) or self.has_meshables(ob):
-                return True
-        return False
+        key = obj.as_pointer()
+        if not key in self._has_meshables:
+            self.scan_meshables([obj])
+        return self._has_meshables[key]
 
     def format_props(self, props):
         """
@@ -195,7 +487,7 @@ class LeadwerksExporter(object):
                     'elements_count': 3,
                     'data_type': ['POSITION', constants.MDL_POSITION],
                     'variable_type': ['FLOAT', constants.MDL_FLOAT],
-                    'data': ','.join(surface['vertices'])
+                    'data': ','.join(utils.to_str_list(surface['vertices']))
 
                 },
             ),
@@ -208,7 +500,7 @@ class LeadwerksExporter(object):
                     'elements_count': 3,
                     'data_type': ['NORMAL', constants.MDL_NORMAL],
                     'variable_type': ['FLOAT', constants.MDL_FLOAT],
-                    'data': ','.join(surface['normals'])
+                    'data': ','.join(utils.to_str_list(surface['normals']))
 
                 },
             ),
@@ -224,7 +516,7 @@ class LeadwerksExporter(object):
                         'elements_count': 2,
                         'data_type': ['TEXTURE_COORD', constants.MDL_TEXTURE_COORD],
                         'variable_type': ['FLOAT', constants.MDL_FLOAT],
-                        'data': ','.join(surface['texture_coords'])
+                        'data': ','.join(utils.to_str_list(surface['texture_coords']))
 
                     },
                 ),
@@ -240,7 +532,7 @@ class LeadwerksExporter(object):
                         'elements_count': 3,
                         'data_type': ['TANGENT', constants.MDL_TANGENT],
                         'variable_type': ['FLOAT', constants.MDL_FLOAT],
-                        'data': ','.join(surface['tangents'])
+                        'data': ','.join(utils.to_str_list(surface['tangents']))
                     },
                 ),
                 templates.render(
@@ -251,12 +543,12 @@ class LeadwerksExporter(object):
                         'elements_count': 3,
                         'data_type': ['BINORMAL', constants.MDL_BINORMAL],
                         'variable_type': ['FLOAT', constants.MDL_FLOAT],
-                        'data': ','.join(surface['binormals'])
+                        'data': ','.join(utils.to_str_list(surface['binormals']))
                     },
                 ),
             ])
 
-        if CONFIG.export_animation:
+        if self.config.export_animation:
             vertexarray.extend([
                 templates.render(
                     # Bone indexes
@@ -266,7 +558,7 @@ class LeadwerksExporter(object):
                         'elements_count': 4,
                         'data_type': ['BONEINDICE', constants.MDL_BONEINDICE],
                         'variable_type': ['BYTE', constants.MDL_UNSIGNED_BYTE],
-                        'data': ','.join(surface['bone_indexes'])
+                        'data': ','.join(map(str, surface['bone_indexes']))
 
                     },
                 ),
@@ -278,7 +570,7 @@ class LeadwerksExporter(object):
                         'elements_count': 4,
                         'data_type': ['BONEWEIGHT', constants.MDL_BONEWEIGHT],
                         'variable_type': ['BYTE', constants.MDL_UNSIGNED_BYTE],
-                        'data': ','.join(surface['bone_weights'])
+                        'data': ','.join(map(str, surface['bone_weights']))
 
                     },
                 )
@@ -288,41 +580,75 @@ class LeadwerksExporter(object):
         if not mat.name in self.materials.keys():
             self.materials[mat.name] = mat
 
+        props = [['material', mat.name]]
+        if 'bones' in surface:
+            # Palette of partitioned skinned surface
+            props.append(['bones', ','.join(map(str, surface['bones']))])
+
         context = {
             'code': constants.MDL_SURFACE,
-            'props': self.format_props([['material', mat.name]]),
+            'props': self.format_props(props),
             'vertexarray': vertexarray,
-            'num_kids': len(vertexarray) + 1
+            'num_kids': len(vertexarray) + 1,
+            'aabb': self.format_aabb(surface.get('aabb'))
         }
+        if context['aabb']:
+            context['num_kids'] += 1
 
 
 
         # Vertex indexes (faces)
+        indices = surface['indices']
+        primitive_type = constants.MDL_TRIANGLES
+        if surface.get('strip'):
+            indices = surface['strip']
+            primitive_type = constants.MDL_TRIANGLE_STRIP
+
         context['indice_array'] = templates.render(
             'INDICEARRAY',
             {
                 'code': constants.MDL_INDICEARRAY,
-                'number_of_indexes': len(surface['indices']),
-                'primitive_type': constants.MDL_TRIANGLES,
+                'number_of_indexes': len(indices),
+                'primitive_type': primitive_type,
                 'data_type': ['TEXTURE_COORD', constants.MDL_TEXTURE_COORD],
                 'variable_type': ['SHORT', constants.MDL_SHORT],
-                'data': ','.join(map(str, surface['indices']))
+                'data': ','.join(map(str, indices))
 
             },
         )
 
         return templates.render('SURFACE', context)
 
-    def format_mesh(self, exportable, matrix):
+    def mesh_context(self, exportable, matrix):
 
-        m = Mesh(exportable['object'])
+        m = Mesh(exportable['object'], self.material_cache, self.mesh_cache, self.config)
+        self.asset_stats.add_mesh(m, self.config.export_animation)
         surfaces = m.surfaces
         num_kids = len(surfaces)+len(exportable['children'])+1
 
-        bones = ''
+        aabb = self.format_aabb(m.aabb)
+        if aabb:
+            num_kids += 1
+
+        formatted = self.formatted_meshes.get(m.cache_key)
+        if formatted is None:
+            for w in m.warnings:
+                print(w)
+                self.options['operator'].report({'WARNING'}, w)
+                self.asset_stats.warnings.append(w)
+            formatted = {
+                'surfaces': utils.join_map(self.format_surface, surfaces),
+                'bones': ''
+            }
+            if m.armature and self.config.export_animation:
+                formatted['bones'] = self.format_bones(m.armature.bones)
+            if m.cache_key is not None:
+                self.formatted_meshes[m.cache_key] = formatted
+
+        bones = formatted['bones']
         arm = m.armature
-        if arm and CONFIG.export_animation:
-            bones = utils.join_map(self.format_bone, arm.bones)
+        if arm and self.config.export_animation:
+            self.animated_meshes.append(m)
             if bones:
                 num_kids += len(arm.bones)
             matrix = Matrix.Identity(4)
@@ -332,39 +658,67 @@ class LeadwerksExporter(object):
             'num_kids': num_kids,
             'matrix': utils.format_floats_box(matrix),
             'props': self.format_props([['name', m.name]]),
-            'surfaces': utils.join_map(self.format_surface, surfaces),
+            'aabb': aabb,
+            'surfaces': formatted['surfaces'],
             'bones': bones,
-            'childs': utils.join_map(self.format_block, exportable['children'])
         }
+        return context
 
-        return templates.render('MESH', context)
+    def format_aabb(self, aabb):
+        if not aabb:
+            return ''
+        return templates.render(
+            'AABB',
+            {
+                'code': constants.MDL_AABB,
+                'min': ','.join(utils.to_str_list(aabb[0])),
+                'max': ','.join(utils.to_str_list(aabb[1]))
+            }
+        )
 
-    def format_node(self, exportable, matrix):
-        context = {
+    def node_context(self, exportable, matrix):
+        return {
             'code': constants.MDL_NODE,
             'num_kids': len(exportable['children'])+1,
             'matrix': utils.format_floats_box(matrix),
             'props': self.format_props([['name', exportable['object'].name]]),
-            'childs': utils.join_map(self.format_block, exportable['children'])
         }
-        return templates.render('NODE', context)
 
-    def format_bone(self, bone):
+    def format_animation_mesh(self, mesh):
+        """
+        Mesh block of animation library file, bones with no geometry
+        """
+        bones = mesh.armature.bones
+        context = {
+            'code': constants.MDL_MESH,
+            'num_kids': len(bones)+1,
+            'matrix': utils.format_floats_box(Matrix.Identity(4)),
+            'props': self.format_props([['name', mesh.name]]),
+            'aabb': '',
+            'surfaces': '',
+            'bones': self.format_bones(bones),
+            'childs': ''
+        }
+        return templates.render('MESH', context)
+
+    def bone_context(self, bone):
+        animations = bone.animations
+        if self.animation_filter is not None:
+            animations = [a for a in animations if a['name'] in self.animation_filter]
         context = {
             'code': constants.MDL_BONE,
-            'num_kids': len(bone.children)+len(bone.animations)+1,
+            'num_kids': len(bone.children)+len(animations)+1,
             'bone_id': bone.index,
             'matrix': utils.format_floats_box(bone.matrix_basis),
             'props': self.format_props([['name', bone.name]]),
-            'animations': utils.join_map(self.format_animation_keys, bone.animations),
-            'childs': utils.join_map(self.format_bone, bone.children)
+            'animations': utils.join_map(self.format_animation_keys, animations),
         }
-        return templates.render('BONE', context)
+        return 'BONE', context
 
     def format_animation_keys(self, data):
         context = {
             'code': constants.MDL_ANIMATIONKEYS,
-            'keyframes': list(map(utils.format_floats_box, data['keyframes'])),
-            'animation_name': data['name'] if int(CONFIG.file_version) > 1 else ''
+            'keyframes': [','.join(utils.to_str_list(k)) for k in data['keyframes']],
+            'animation_name': data['name'] if int(self.config.file_version) > 1 else ''
         }
         return templates.render('ANIMATIONKEYS', context)
\ No newline at end of file
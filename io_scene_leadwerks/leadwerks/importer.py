@@ -0,0 +1,306 @@
+# <pep8 compliant>
+"""
+Import of .mdl files into the current scene.
+
+Files are decoded by xml_tool.loader into typed arrays, which are
+reindexed with numpy and passed to Blender in bulk with foreach_set,
+so no Python loop runs per vertex while mesh data is created.
+Coordinate conversions of the exporter are undone, so exported and
+re-imported objects line up.
+"""
+import os
+from array import array
+from collections import defaultdict
+
+import bpy
+import numpy
+from mathutils import Vector, Matrix
+
+from xml_tool.loader import MdlScene
+from . import utils
+
+
+DEFAULT_BONE_LENGTH = 0.1
+
+
+def geometry_transform(skinned, matrix_local=None):
+    """
+    Inverse of transformation applied to vertices in Mesh.parse_surfaces,
+    skinned vertices were also moved by the inverse of matrix_local of
+    their object. It isn't written to .mdl files, so the one of the
+    imported object is used and exporting it again gives the same vertices
+    """
+    mul = 1
+    trans = Matrix.Scale(-1, 4, Vector((0.0, 0.0, 1.0)))
+    if skinned:
+        mul = 2
+        if matrix_local is not None:
+            trans = trans * matrix_local.inverted()
+    trans = trans * Matrix.Rotation(-1.5707963267948966, 4, 'X') * Matrix.Rotation(1.5707963267948966 * mul, 4, 'Z')
+    return trans.inverted()
+
+
+def to_matrix(floats):
+    return Matrix([floats[i:i + 4] for i in range(0, 16, 4)])
+
+
+def bone_pose_matrix(floats, parent_pose):
+    """
+    Armature space matrix of bone from its Leadwerks keyframe,
+    inverse of Armature.convert_pose
+    """
+    mtx = utils.magick_convert(to_matrix(floats))
+    mtx.transpose()
+    z90_inverted = utils.mtx4_z90.inverted()
+    if parent_pose is None:
+        return mtx * z90_inverted
+    return parent_pose * utils.mtx4_z90 * mtx * z90_inverted
+
+
+def iter_bones(bones, parent=None):
+    for b in bones:
+        yield b, parent
+        for item in iter_bones(b['children'], b):
+            yield item
+
+
+class LeadwerksImporter(object):
+    def __init__(self, **kwargs):
+        self.options = kwargs
+        self.context = kwargs.get('context')
+        self.objects = []
+
+    def import_file(self):
+        """
+        Entry point
+        """
+        path = self.options['filepath']
+        scene = MdlScene(path).load()
+
+        if not scene.nodes:
+            self.options['operator'].report(
+                {'ERROR'},
+                "Couldn't find any meshes in %s" % os.path.basename(path)
+            )
+            return {'CANCELLED'}
+
+        for node in scene.nodes:
+            self.create_node(node, None)
+
+        self.options['operator'].report(
+            {'INFO'},
+            'Imported %s objects' % len(self.objects)
+        )
+        return {'FINISHED'}
+
+    def link_object(self, name, data, parent):
+        obj = bpy.data.objects.new(name, data)
+        self.context.scene.objects.link(obj)
+        obj.parent = parent
+        self.objects.append(obj)
+        return obj
+
+    def create_node(self, node, parent):
+        data = None
+        weights = {}
+        skinned = bool(node['bones'])
+        if node['surfaces']:
+            data, weights = self.create_mesh(node, skinned)
+
+        if skinned:
+            # Topmost bone stands for the armature object itself
+            armature = self.create_armature(node['bones'][0], parent)
+            obj = self.link_object(node['name'], data, armature)
+            if data:
+                data.transform(geometry_transform(skinned, obj.matrix_local))
+            self.assign_weights(obj, armature, node['bones'][0], weights)
+        else:
+            obj = self.link_object(node['name'], data, parent)
+            if data:
+                data.transform(geometry_transform(skinned))
+            matrix = utils.convert_from_lw_matrix(to_matrix(node['matrix']))
+            if parent:
+                obj.matrix_local = matrix
+            else:
+                obj.matrix_world = matrix
+
+        for c in node['children']:
+            self.create_node(c, obj)
+        return obj
+
+    def create_mesh(self, node, skinned):
+        """
+        Merges surfaces into a single mesh with a material per surface,
+        vertices are left in Leadwerks space until the object is linked.
+        Returns the mesh and its vertices grouped by (bone id, weight)
+        """
+        mesh = bpy.data.meshes.new(node['name'])
+
+        positions = []
+        texture_coords = []
+        indices = []
+        material_indices = []
+        weights = defaultdict(list)
+        has_texture_coords = any(['texture_coords' in s for s in node['surfaces']])
+
+        offset = 0
+        for material_index, s in enumerate(node['surfaces']):
+            surface_positions = numpy.asarray(s['positions'], dtype=numpy.float32)
+            count = len(surface_positions) // 3
+            positions.append(surface_positions)
+            if has_texture_coords:
+                coords = s.get('texture_coords')
+                if coords:
+                    texture_coords.append(numpy.asarray(coords, dtype=numpy.float32))
+                else:
+                    texture_coords.append(numpy.zeros(count * 2, dtype=numpy.float32))
+
+            # Exporter reversed winding of mirrored geometry
+            tris = numpy.asarray(s['indices'], dtype=numpy.int32)
+            tris = tris[0:len(tris) // 3 * 3].reshape(-1, 3)
+            indices.append(tris[:, ::-1] + offset)
+            material_indices.append(numpy.full(len(tris), material_index, dtype=numpy.int32))
+
+            if skinned and 'bone_weights' in s:
+                self.group_weights(s, offset, weights)
+
+            name = s['material'] or 'default'
+            mesh.materials.append(bpy.data.materials.get(name) or bpy.data.materials.new(name))
+            offset += count
+
+        positions = numpy.concatenate(positions)
+        indices = numpy.concatenate(indices).ravel()
+        triangles = len(indices) // 3
+        mesh.vertices.add(len(positions) // 3)
+        mesh.vertices.foreach_set('co', positions)
+        mesh.loops.add(len(indices))
+        mesh.loops.foreach_set('vertex_index', indices)
+        mesh.polygons.add(triangles)
+        mesh.polygons.foreach_set('loop_start', numpy.arange(0, len(indices), 3, dtype=numpy.int32))
+        mesh.polygons.foreach_set('loop_total', numpy.full(triangles, 3, dtype=numpy.int32))
+        mesh.polygons.foreach_set('material_index', numpy.concatenate(material_indices))
+
+        if has_texture_coords:
+            mesh.uv_textures.new()
+            loop_uvs = numpy.concatenate(texture_coords).reshape(-1, 2)[indices]
+            loop_uvs[:, 1] = 1 - loop_uvs[:, 1]
+            mesh.uv_layers[-1].data.foreach_set('uv', loop_uvs.ravel())
+
+        mesh.validate()
+        mesh.update(calc_edges=True)
+        return mesh, weights
+
+    def group_weights(self, surface, offset, weights):
+        """
+        Adds vertices of the surface to weights grouped by
+        (bone id, weight), one Python step per group
+        """
+        bone_weights = numpy.asarray(surface['bone_weights'], dtype=numpy.uint8)
+        bone_ids = numpy.asarray(surface['bone_indexes'], dtype=numpy.int64)
+        if surface['bones']:
+            bone_ids = numpy.asarray(surface['bones'], dtype=numpy.int64)[bone_ids]
+
+        used = numpy.nonzero(bone_weights)[0]
+        keys = bone_ids[used] * 256 + bone_weights[used]
+        vertices = used // 4 + offset
+
+        order = numpy.argsort(keys, kind='stable')
+        groups, starts = numpy.unique(keys[order], return_index=True)
+        for key, group in zip(groups.tolist(), numpy.split(vertices[order], starts[1:])):
+            weights[(key // 256, key % 256)].extend(group.tolist())
+
+    def create_armature(self, topmost, parent):
+        data = bpy.data.armatures.new(topmost['name'])
+        obj = self.link_object(topmost['name'], data, parent)
+
+        bind_poses = {}
+        for b, p in iter_bones(topmost['children']):
+            bind_poses[b['name']] = bone_pose_matrix(
+                b['matrix'], bind_poses[p['name']] if p else None
+            )
+
+        self.context.scene.objects.active = obj
+        bpy.ops.object.mode_set(mode='EDIT')
+        for b, p in iter_bones(topmost['children']):
+            eb = data.edit_bones.new(b['name'])
+            length = DEFAULT_BONE_LENGTH
+            head = bind_poses[b['name']].to_translation()
+            for c in b['children']:
+                distance = (bind_poses[c['name']].to_translation() - head).length
+                if distance > 0.0001:
+                    length = distance
+                    break
+            eb.head = Vector((0.0, 0.0, 0.0))
+            eb.tail = Vector((0.0, length, 0.0))
+            eb.matrix = bind_poses[b['name']]
+            if p:
+                eb.parent = data.edit_bones[p['name']]
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+        if self.options.get('import_animations', True):
+            self.create_actions(obj, topmost)
+        return obj
+
+    def create_actions(self, obj, topmost):
+        bones = list(iter_bones(topmost['children']))
+        if not bones:
+            return
+        obj.animation_data_create()
+
+        for action_idx, (action_name, frames) in enumerate(bones[0][0]['animations']):
+            action = bpy.data.actions.new(action_name or obj.name)
+            frames_count = len(frames) // 16
+            poses = {}
+            for b, p in bones:
+                anim_frames = b['animations'][action_idx][1]
+                rest = obj.data.bones[b['name']].matrix_local
+                if p:
+                    rest = obj.data.bones[p['name']].matrix_local.inverted() * rest
+                rest_inverted = rest.inverted()
+
+                curves = defaultdict(lambda: array('f'))
+                poses[b['name']] = []
+                for f in range(0, frames_count):
+                    pose = bone_pose_matrix(
+                        anim_frames[f * 16:f * 16 + 16],
+                        poses[p['name']][f] if p else None
+                    )
+                    poses[b['name']].append(pose)
+                    if p:
+                        basis = rest_inverted * poses[p['name']][f].inverted() * pose
+                    else:
+                        basis = rest_inverted * pose
+                    loc, rot, scale = basis.decompose()
+                    for path, values in [('location', loc),
+                                         ('rotation_quaternion', rot),
+                                         ('scale', scale)]:
+                        for i, v in enumerate(values):
+                            curves[(path, i)].extend((f + 1, v))
+
+                for (path, i), co in curves.items():
+                    fc = action.fcurves.new(
+                        'pose.bones["%s"].%s' % (b['name'], path), i, b['name']
+                    )
+                    fc.keyframe_points.add(len(co) // 2)
+                    fc.keyframe_points.foreach_set('co', co)
+                    fc.update()
+            obj.animation_data.action = action
+
+    def assign_weights(self, obj, armature, topmost, weights):
+        if obj.type != 'MESH':
+            return
+        names = {}
+        for b, p in iter_bones(topmost['children']):
+            names[b['id']] = b['name']
+
+        groups = {}
+        for (bone_id, w), vertices in weights.items():
+            name = names.get(bone_id)
+            if not name:
+                continue
+            if not name in groups:
+                groups[name] = obj.vertex_groups.new(name)
+            groups[name].add(vertices, w / 255.0, 'REPLACE')
+
+        mod = obj.modifiers.new('Armature', 'ARMATURE')
+        mod.object = armature
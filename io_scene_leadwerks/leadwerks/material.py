@@ -3,12 +3,18 @@ Classes representing Leadwerks materials
 """
 import re
 import os
-from .config import CONFIG
+
+import numpy
+
+from .config import ExportOptions
+from . import tex
 
 
 class Texture(object):
 
-    def __init__(self, blender_texture_slot):
+    def __init__(self, blender_texture_slot, config=None, export_cache=None):
+        self.config = config or ExportOptions()
+        self.export_cache = export_cache
         self.name = ''
         self.blender_data = None
         self.filename = ''
@@ -31,7 +37,23 @@ class Texture(object):
                     self.slot = slot
                     return
 
-    def save(self, dir_name):
+    def memory_size(self):
+        """
+        Estimated memory of the texture with mipmaps once exported,
+        0 if image can't be read
+        """
+        try:
+            width, height = self.blender_data.texture.image.size
+        except Exception:
+            return 0
+        compression = 'NONE'
+        if self.config.texture_format == 'tex':
+            compression = self.config.texture_compression
+        return tex.memory_size(width, height, compression)
+
+    def save(self, dir_name, jobs=None):
+        if self.config.texture_format == 'tex':
+            return self.save_tex(dir_name, jobs)
 
         save_path = os.path.abspath(
             os.path.join(dir_name, '%s.png' % self.name)
@@ -43,6 +65,39 @@ class Texture(object):
             except:
                 print('Texture "%s" not exported sorry' % img)
 
+    def save_tex(self, dir_name, jobs=None):
+        """
+        Queues conversion to native .tex with mipmaps. Its future is
+        added to jobs, pass them to tex.wait() to make sure all files
+        are written
+        """
+        save_path = os.path.abspath(
+            os.path.join(dir_name, '%s.tex' % self.name)
+        )
+        if os.path.exists(save_path) and not self.config.overwrite_textures:
+            return
+
+        img = self.blender_data.texture.image
+        if img is None:
+            print('Texture "%s" has no image, not exported' % self.name)
+            return
+        width, height = img.size
+        if not width or not height:
+            print('Image "%s" has no pixels, not exported' % img.name)
+            return
+
+        # Pixels can only be read from the main thread, slicing is
+        # the fastest bulk read of bpy_prop_array available in 2.7x
+        pixels = numpy.array(img.pixels[:], dtype=numpy.float32)
+
+        future = tex.schedule(
+            save_path, pixels, width, height,
+            self.config.texture_compression, self.config.mipmap_filter,
+            self.export_cache
+        )
+        if jobs is not None:
+            jobs[save_path] = future
+
 
 class Material(object):
 
@@ -63,11 +118,16 @@ class Material(object):
         self.specular = '0.0,0.0,0.0,1.0'
         self.shader = ''
         self.textures = []
+        self.exported_textures = []
+        self.config = None
+        self.export_cache = None
 
         for k, v in kwargs.items():
             if hasattr(self, k):
                 setattr(self, k, v)
 
+        self.config = self.config or ExportOptions()
+
         if not self.blender_data:
             return
 
@@ -76,17 +136,40 @@ class Material(object):
         for i, ts in enumerate(self.blender_data.texture_slots):
             if not ts or ts.texture.type != 'IMAGE':
                 continue
-            self.textures.append(Texture(ts))
+            self.textures.append(Texture(ts, self.config, self.export_cache))
 
         self.diffuse = '%s,1.0' % ','.join(map(str, self.blender_data.diffuse_color))
-        if CONFIG.export_specular_color:
+        if self.config.export_specular_color:
             self.specular = '%s,1.0' % ','.join(map(str, self.blender_data.specular_color))
 
 
-    def save(self, base_dir, save_textures=True):
+    def save(self, base_dir, save_textures=True, jobs=None):
         """
-        Saves material to a .mat file in given directory
-        overwrites existing
+        Saves material to a .mat file in given directory.
+        Existing file is overwritten only if its content differs,
+        returns True if the file was written.
+        Futures of queued texture conversions are added to jobs
+        """
+        content = self.render()
+
+        if save_textures:
+            for tx in self.exported_textures:
+                tx.save(base_dir, jobs)
+
+        path = os.path.abspath(os.path.join(base_dir, '%s.mat' % self.name))
+
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                if f.read() == content:
+                    return False
+
+        with open(path, 'w') as f:
+            f.write(content)
+        return True
+
+    def render(self):
+        """
+        Content of the .mat file
         """
         direct_props = [
             'blendmode',
@@ -120,6 +203,7 @@ class Material(object):
         else:
             out.append('shader1="Shaders/Model/Shadow/shadow.shader"')
 
+        self.exported_textures = []
         if self.textures:
             still_used = []
             order = ['diffuse', 'normal', 'specular', 'displacement']
@@ -134,16 +218,11 @@ class Material(object):
                 if not tx.name in still_used:
                     out.append('texture%s=./%s.tex' % (next_idx, tx.name))
                     next_idx +=1
-                if save_textures:
-                    tx.save(base_dir)
+                self.exported_textures.append(tx)
                 if next_idx > 8:
                     break
 
-
-        path = os.path.abspath(os.path.join(base_dir, '%s.mat' % self.name))
-
-        with open(path, 'w') as f:
-            f.write('\n'.join(out))
+        return '\n'.join(out)
 
     def make_shader_path(self, shader_name):
         base_path = 'Shaders/Model/'
@@ -181,3 +260,28 @@ class Material(object):
             if t.slot == slot_name:
                 return t
 
+
+class MaterialCache(object):
+    """
+    Materials resolved once per export and shared by all meshes,
+    keyed by Blender material datablock
+    """
+    def __init__(self, config=None, export_cache=None):
+        self.config = config or ExportOptions()
+        self.export_cache = export_cache
+        self._materials = {}
+
+    def get(self, blender_material=None):
+        key = blender_material.as_pointer() if blender_material else None
+        mat = self._materials.get(key)
+        if mat is None:
+            if blender_material:
+                mat = Material(
+                    blender_data=blender_material,
+                    config=self.config,
+                    export_cache=self.export_cache
+                )
+            else:
+                mat = Material(name='default', config=self.config)
+            self._materials[key] = mat
+        return mat
@@ -1,11 +1,14 @@
-from copy import copy
+import tracemalloc
+from array import array
 
+import numpy
 from mathutils import Vector, Matrix
 
 from .armature import Armature
-from .config import CONFIG
-from .material import Material
-from . import utils, texspace
+from .config import ExportOptions
+from .material import MaterialCache
+from .vertex_store import VertexStore, DEFAULT_BONE_INDEXES, DEFAULT_BONE_WEIGHTS
+from . import utils, texspace, weld, stripify, bone_palette
 import bpy
 
 
@@ -13,22 +16,46 @@ class Mesh(object):
     """
     Helper class for Mesh data extraction and decomposition it to surfaces
     """
-    def __init__(self, blender_data):
+    def __init__(self, blender_data, material_cache=None, mesh_cache=None, config=None):
         self.name = blender_data.name
+        self.config = config or ExportOptions()
+        self.material_cache = material_cache or MaterialCache(self.config)
         self.is_animated = False
         self.blender_data = blender_data
+
+        self.cache_key = None
+        if mesh_cache is not None:
+            self.cache_key = mesh_cache.make_key(blender_data)
+            shared = mesh_cache.get(self.cache_key)
+            if shared:
+                # Linked duplicate of already parsed geometry
+                self.armature = shared.armature
+                self.aabb = shared.aabb
+                self.is_animated = shared.is_animated
+                self.materials = shared.materials
+                self.surfaces = shared.surfaces
+                self.stats = shared.stats
+                self.warnings = shared.warnings
+                return
+
         self.armature = self.parse_armature()
 
-        self.__verts = {}
         self.materials = {}
+        self.aabb = None
+        self.stats = {}
+        # Problems to report to user, see LeadwerksExporter.mesh_context
+        self.warnings = []
         self.surfaces = self.parse_surfaces()
 
+        if mesh_cache is not None:
+            mesh_cache.add(self.cache_key, self)
+
     def parse_armature(self):
         # Getting first available Armature of object
         # No multiple armatures supported
         for mod in self.blender_data.modifiers:
             if mod.type == 'ARMATURE' and mod.object and mod.object.animation_data:
-                return Armature(mod.object, self.blender_data)
+                return Armature(mod.object, self.blender_data, self.config)
 
     def parse_bone_weights(self, mesh):
         weights = {}
@@ -72,7 +99,7 @@ class Mesh(object):
                 # print('Fallback for', v.index, iws)
                 iws = [[bone_index, 255]]
 
-            weights[str(v.index)] = iws
+            weights[v.index] = iws
 
         return weights
 
@@ -83,14 +110,12 @@ class Mesh(object):
 
         mesh = self.blender_data
 
-        materials = [Material(
-            name='default'
-        )]
+        materials = [self.material_cache.get()]
 
         for idx, m in enumerate(mesh.data.materials):
-            materials.append(Material(blender_data=m))
+            materials.append(self.material_cache.get(m))
 
-        mesh = utils.triangulate_mesh(mesh)
+        mesh, triangles = utils.triangulate_mesh(mesh)
         
         # Transforming the mesh to match Leadwerks coordinate system
         trans = Matrix.Scale(-1, 4, Vector((0.0, 0.0, 1.0)))
@@ -101,176 +126,109 @@ class Mesh(object):
         trans = trans * Matrix.Rotation(-1.5707963267948966, 4, 'X') * Matrix.Rotation(1.5707963267948966 * mul, 4, 'Z')
         mesh.transform(trans)
 
+        self.transform = trans
         self.triangulated_mesh = mesh
 
-        verts = {}
         mesh.calc_normals_split()
-        for vert in mesh.vertices:
-            verts[str(vert.index)] = {
-                'position': utils.to_str_list(list(vert.co)),
-                'normals': utils.to_str_list(
-                    [-vert.normal.x, -vert.normal.y, -vert.normal.z]
-                ),
-                'bone_indexes': ['1', '1', '1', '1'],
-                'bone_weights': ['255', '0', '0', '0'],
-            }
-
-        tcoords = {}
-        for l in mesh.tessface_uv_textures:
-            for face_idx, coords in l.data.items():
-                ic = []
-                for uv in [coords.uv1, coords.uv2, coords.uv3]:
-                    ic.append([uv[0], 1 - uv[1]])
-                tcoords[str(face_idx)] = list(map(utils.to_str_list, ic))
-            break
+        has_texture_coords = triangles.loop_uvs is not None and len(triangles) > 0
 
+        store = VertexStore(len(mesh.vertices), has_texture_coords)
+        mesh.vertices.foreach_get('co', store.positions)
+        mesh.vertices.foreach_get('normal', store.normals)
+        store.negate('normals')
 
-
-
-        faces_map = {}
-        verts_by_tc = {}
-        has_texture_coords = False
-        for i, face in enumerate(mesh.tessfaces):
-            idx = face.index
-            k = str(face.material_index)
-
-            if not k in faces_map:
-                faces_map[k] = []
-
-            f_verts = list(map(str, list(face.vertices)))
-
-            coords = tcoords.get(str(idx))
-
-            if coords:
-                for vpos, vert_idx in enumerate(f_verts):
-                    icoords = coords[vpos]
-                    hash = '%s_%s' % (vert_idx, '_'.join(icoords))
-
-                    v = verts.get(vert_idx)
-
-                    if v.get('texture_coords'):
-                        has_texture_coords = True
-                        hash = '%s_%s' % (vert_idx, '_'.join(coords[vpos]))
-                        if verts_by_tc.get(hash):
-                            continue
-
-                        new_vert = copy(v)
-                        new_vert['texture_coords'] = icoords
-                        new_vert['original_index'] = vert_idx
-                        new_idx = str(len(verts.keys()))
-                        new_hash = '%s_%s' % (new_idx, '_'.join(icoords))
-                        verts_by_tc[new_hash] = new_idx
-                        verts[new_idx] = new_vert
-                        f_verts[vpos] = new_idx
-                    else:
-                        verts_by_tc[hash] = vert_idx
-                        verts[vert_idx]['texture_coords'] = icoords
-
-            faces_map[k].append({
-                'material_index': face.material_index,
-                'vertex_indices': list(reversed(f_verts)),
-            })
-
-        self.__verts = verts
-
-        # Calculating Tangents and Binormals
-        if has_texture_coords:
-            for faces in faces_map.values():
-                for face in faces:
-                    iverts = utils.mget(verts, face['vertex_indices'])
-                    texspace.update_tangents_and_binormals(iverts)
-
-        if CONFIG.export_animation:
-            # Extracting bone weights
+        if self.config.export_animation:
+            # Extracting bone weights, vertices split below inherit them
             weights = self.parse_bone_weights(mesh)
             if weights:
                 self.is_animated = True
-                for k, v in verts.items():
-                    if 'original_index' in v:
-                        idata = weights.get(v['original_index'], [])
-                    else:
-                        idata = weights.get(k, [])
-
-                    if not idata:
-                        print('Empty weights:', k)
-
-
-                    ivw = copy(v['bone_weights'])
-                    ivi = copy(v['bone_indexes'])
-                    pos = 0
-
-                    for i, w in idata:
-                        ivw[pos] = str(w)
-                        ivi[pos] = str(i)
-                        pos += 1
+                self.apply_bone_weights(store, weights)
 
-                    if ''.join(ivw) == '0000':
-                        print('-'*50)
-                        print(k, v)
-                        print(idata)
-                        raise Exception('Empty weights detected')
-
-                    verts[k].update({
-                        'bone_indexes': ivi,
-                        'bone_weights': ivw
-                    })
+        faces_map = self.split_by_texture_coords(store, triangles)
 
+        # Calculating Tangents and Binormals
+        if has_texture_coords:
+            for indices in faces_map.values():
+                texspace.update_tangents_and_binormals(store, indices)
 
         surfaces = []
         # Splitting up mesh to multiple surfaces by material
         # because only one material per surface if allowed
-        for mat_idx, surface_data in faces_map.items():
+        # Ordered by material index, so equal input gives equal output
+        for mat_idx in sorted(faces_map.keys()):
+            face_indices = faces_map[mat_idx]
             vertices_map = {}
+            order = array('I')
+            indices = array('I')
 
-            vertices = []
-            normals = []
-            texture_coords = []
-            indices = []
-            bone_weights = []
-            bone_indexes = []
-            tangents = []
-            binormals = []
-
-            for face in surface_data:
-                for v in face['vertex_indices']:
-                    idx = vertices_map.get(str(v))
-                    if idx is None:
-                        real_vert = verts[v]
-                        idx = len(vertices_map.values())
-                        vertices_map[str(v)] = idx
-
-                        # Distributing texture coordinates
-
-                        texture_coords.extend(real_vert.get('texture_coords', []))
-                        orig_vert = verts.get(str(v))
-                        vertices.extend(orig_vert['position'])
-                        normals.extend(orig_vert['normals'])
-                        bone_weights.extend(orig_vert['bone_weights'])
-                        bone_indexes.extend(orig_vert['bone_indexes'])
-                        if 'tangent' in orig_vert:
-                            tangents.extend(utils.to_str_list(list(orig_vert['tangent'])))
-                            binormals.extend(utils.to_str_list(list(orig_vert['binormal'])))
-
-
-
-                    indices.append(idx)
+            for v in face_indices:
+                idx = vertices_map.get(v)
+                if idx is None:
+                    idx = len(order)
+                    vertices_map[v] = idx
+                    order.append(v)
+                indices.append(idx)
 
             try:
                 mat = materials[int(mat_idx)+1]
             except IndexError:
                 mat = materials[0]
-            surf = {
-                'material': mat,
-                'vertices': vertices,
-                'normals': normals,
-                'indices': indices,
-                'texture_coords': texture_coords,
-                'bone_weights': bone_weights,
-                'bone_indexes': bone_indexes,
-                'tangents': tangents,
-                'binormals': binormals
-            }
-            surfaces.append(surf)
+            surfaces.append(self.make_surface(store.gather(order), indices, mat))
+
+        if self.config.weld_vertices:
+            for s in surfaces:
+                before, after = weld.weld_surface(
+                    s,
+                    self.config.weld_position_epsilon,
+                    self.config.weld_normal_epsilon,
+                    self.config.weld_uv_epsilon
+                )
+                print('Mesh "%s", material "%s": welded %s vertices to %s' % (
+                    self.name, s['material'].name, before, after
+                ))
+
+        if self.is_animated and self.config.max_bones_per_surface:
+            partitioned = []
+            for s in surfaces:
+                partitioned.extend(
+                    bone_palette.partition_surface(s, self.config.max_bones_per_surface)
+                )
+            print('Mesh "%s": %s skinned surfaces split to %s' % (
+                self.name, len(surfaces), len(partitioned)
+            ))
+            surfaces = partitioned
+            print('Bones per surface: %s' % ', '.join([
+                '%s bones x %s' % item for item in bone_palette.histogram(surfaces)
+            ]))
+            over = bone_palette.over_budget(surfaces, self.config.max_bones_per_surface)
+            if over:
+                self.warnings.append(
+                    'Mesh "%s": %s surfaces use up to %s bones, above the limit of %s, '
+                    'their triangles are weighted to too many bones to be split' % (
+                        self.name, len(over), max([len(s['bones']) for s in over]),
+                        self.config.max_bones_per_surface
+                    )
+                )
+
+        if self.config.export_triangle_strips:
+            for s in surfaces:
+                s['strip'] = stripify.stripify(s['indices'])
+
+        self.stats = {
+            'surfaces': len(surfaces),
+            'triangles': sum([len(s['indices']) // 3 for s in surfaces]),
+            'vertices': sum([len(s['original']) for s in surfaces]),
+            # Vertices added by splitting ones having several UVs
+            'uv_seam_vertices': len(store) - len(mesh.vertices),
+        }
+        self.report_memory(store, surfaces)
+
+        if self.config.export_aabb:
+            for s in surfaces:
+                s['aabb'] = utils.calc_aabb(s['vertices'])
+                self.aabb = utils.merge_aabb(self.aabb, s['aabb'])
+            if self.is_animated:
+                self.aabb = utils.merge_aabb(self.aabb, self.calc_animated_aabb(surfaces))
 
         for s in surfaces:
             m = s['material']
@@ -280,3 +238,206 @@ class Mesh(object):
                 self.materials[m.name] = m
         bpy.data.meshes.remove(mesh)
         return surfaces
+
+    def split_by_texture_coords(self, store, triangles):
+        """
+        Assigns loop texture coordinates to vertices, splitting vertices
+        having several of them. Triangles are read straight from their
+        arrays, returns {material index: vertex indices}
+        """
+        faces_map = {}
+        loops = triangles.loops
+        loop_vertices = triangles.loop_vertices
+        uvs = triangles.loop_uvs if store.has_texture_coords else None
+        tc = store.texture_coords
+        tc_assigned = array('B', [0]) * len(store)
+        # Seam vertices only, (vertex, u, v) -> split vertex
+        seams = {}
+        for t, material_index in enumerate(triangles.material_indices):
+            indices = faces_map.get(material_index)
+            if indices is None:
+                indices = faces_map[material_index] = array('I')
+
+            f_loops = loops[t * 3:t * 3 + 3]
+            f_verts = [loop_vertices[l] for l in f_loops]
+            if uvs is not None:
+                for vpos, l in enumerate(f_loops):
+                    vert_idx = f_verts[vpos]
+                    coords = array('f', (uvs[l * 2], 1 - uvs[l * 2 + 1]))
+                    if not tc_assigned[vert_idx]:
+                        tc_assigned[vert_idx] = 1
+                        tc[vert_idx * 2:vert_idx * 2 + 2] = coords
+                    elif tc[vert_idx * 2:vert_idx * 2 + 2] != coords:
+                        key = (vert_idx, coords[0], coords[1])
+                        idx = seams.get(key)
+                        if idx is None:
+                            idx = seams[key] = store.split(vert_idx, coords)
+                        f_verts[vpos] = idx
+
+            indices.extend(reversed(f_verts))
+        return faces_map
+
+    def apply_bone_weights(self, store, weights):
+        for k in range(0, len(store)):
+            idata = weights.get(k, [])
+            if not idata:
+                print('Empty weights:', k)
+
+            ivi = list(DEFAULT_BONE_INDEXES)
+            ivw = list(DEFAULT_BONE_WEIGHTS)
+            for pos, iw in enumerate(idata):
+                ivi[pos], ivw[pos] = iw
+
+            if not any(ivw):
+                print('-'*50)
+                print(k, idata)
+                raise Exception('Empty weights detected')
+
+            store.set_bone_data(k, ivi, ivw)
+
+    def make_surface(self, store, indices, material):
+        return {
+            'material': material,
+            'vertices': store.positions,
+            'normals': store.normals,
+            'indices': indices,
+            'texture_coords': store.texture_coords,
+            'bone_weights': store.bone_weights,
+            'bone_indexes': store.bone_indexes,
+            'tangents': store.tangents,
+            'binormals': store.binormals,
+            'original': store.original,
+        }
+
+    def report_memory(self, store, surfaces):
+        """
+        Prints size of vertex buffers only, Blender mesh data and
+        temporary objects aren't counted. Peak memory is added when
+        Python runs with tracemalloc enabled
+        """
+        count = sum([len(s['original']) for s in surfaces])
+        nbytes = sum([
+            sum([v.itemsize * len(v) for k, v in s.items()
+                 if isinstance(v, array) and k not in ['indices', 'strip']])
+            for s in surfaces
+        ])
+        print('Mesh "%s": %s vertices, vertex buffers %.1f bytes per vertex (%.1f while parsing)' % (
+            self.name, count, nbytes / float(count or 1), store.bytes_per_vertex()
+        ))
+        if tracemalloc.is_tracing():
+            print('Mesh "%s": peak traced memory %.1f MB' % (
+                self.name, tracemalloc.get_traced_memory()[1] / 1048576.0
+            ))
+
+    def calc_animated_aabb(self, surfaces):
+        """
+        Conservative bounds of skinned mesh over all baked frames.
+        Rest pose bounds of vertices influenced by each bone are moved
+        with that bone, so no per-vertex skinning is needed
+        """
+        bone_names = {}
+        for name, bone in self.armature.get_bones_map().items():
+            bone_names[bone.index] = name
+        if not bone_names:
+            return None
+
+        # Rest pose bounds per bone index, vertices are repeated
+        # for each of their 4 influences
+        count = max(bone_names.keys()) + 1
+        mins = numpy.full((count, 3), numpy.inf)
+        maxs = numpy.full((count, 3), -numpy.inf)
+        for s in surfaces:
+            positions = numpy.asarray(s['vertices'], dtype=numpy.float64).reshape(-1, 3)
+            indexes = numpy.asarray(s['bone_indexes'], dtype=numpy.intp)
+            # Indexes of partitioned surfaces point to their palette
+            palette = s.get('bones')
+            if palette:
+                indexes = numpy.asarray(palette, dtype=numpy.intp)[indexes]
+            used = (numpy.asarray(s['bone_weights']) > 0) & (indexes < count)
+            points = numpy.repeat(positions, 4, axis=0)[used]
+            numpy.minimum.at(mins, indexes[used], points)
+            numpy.maximum.at(maxs, indexes[used], points)
+
+        bone_boxes = {}
+        for idx, name in bone_names.items():
+            if mins[idx][0] <= maxs[idx][0]:
+                bone_boxes[name] = [mins[idx].tolist(), maxs[idx].tolist()]
+
+        # Skin matrices are baked in armature space
+        to_mesh = self.transform * self.blender_data.matrix_world.inverted() * \
+            self.armature.blender_data.matrix_world
+        from_mesh = to_mesh.inverted()
+
+        to_mesh = numpy.array(to_mesh)
+        from_mesh = numpy.array(from_mesh)
+
+        skin_frames = self.armature.skin_frames
+        ret = None
+        if not len(skin_frames):
+            return ret
+        for name, box in bone_boxes.items():
+            slot = self.armature.bone_slots.get(name)
+            if slot is None:
+                continue
+            # All frames of the bone at once
+            mtx = numpy.einsum('ij,fjk,kl->fil', to_mesh, skin_frames[:, slot], from_mesh)
+            points = numpy.array([list(p) + [1.0] for p in utils.aabb_corners(box)])
+            moved = numpy.einsum('fij,pj->fpi', mtx, points)[:, :, 0:3]
+            ret = utils.merge_aabb(ret, [
+                moved.min(axis=(0, 1)).tolist(),
+                moved.max(axis=(0, 1)).tolist()
+            ])
+        return ret
+
+
+class MeshCache(object):
+    """
+    Export scoped cache of parsed geometry, so objects sharing the same
+    mesh datablock (linked duplicates) are triangulated and split into
+    surfaces only once
+    """
+    def __init__(self):
+        self._meshes = {}
+
+    def make_key(self, obj):
+        armature = None
+        for mod in obj.modifiers:
+            if mod.type == 'ARMATURE' and mod.object:
+                armature = mod.object
+                break
+
+        key = [obj.data.as_pointer(), self.modifiers_signature(obj)]
+        if armature:
+            # Skinned geometry is baked relative to the object and
+            # bone weights come from object level vertex groups
+            key.extend([
+                armature.as_pointer(),
+                tuple([vg.name for vg in obj.vertex_groups]),
+                tuple(map(tuple, obj.matrix_local)),
+            ])
+        return tuple(key)
+
+    def modifiers_signature(self, obj):
+        ret = []
+        depends_on_transform = False
+        for mod in obj.modifiers:
+            props = [mod.type]
+            for p in mod.bl_rna.properties:
+                if p.identifier == 'rna_type':
+                    continue
+                v = getattr(mod, p.identifier)
+                if hasattr(v, 'matrix_world') and mod.type != 'ARMATURE':
+                    # Result depends on placement of the other object
+                    depends_on_transform = True
+                    v = (v.name, tuple(map(tuple, v.matrix_world)))
+                props.append(repr(v))
+            ret.append(tuple(props))
+        if depends_on_transform:
+            ret.append(tuple(map(tuple, obj.matrix_world)))
+        return tuple(ret)
+
+    def get(self, key):
+        return self._meshes.get(key)
+
+    def add(self, key, mesh):
+        self._meshes[key] = mesh
@@ -0,0 +1,200 @@
+"""
+Signatures of exporter inputs used as ExportCache keys.
+
+Everything the exporter reads from the scene for an exportable is
+turned into key parts without triangulation, baking or formatting, so
+unchanged assets are taken from the cache before any of that work.
+Evaluated mesh arrays are read in bulk with foreach_get and actions are
+hashed from their F-curve keys instead of being baked.
+"""
+import numpy
+import bpy
+
+from . import utils
+
+
+# Options which don't change bytes of exported files
+IGNORED_OPTIONS = [
+    'export_cache_dir',
+    'export_cache_size',
+    'write_debug_xml',
+    'write_stats_report',
+]
+
+
+def bulk(collection, attr, count, dtype=numpy.float32):
+    ret = numpy.zeros(count, dtype=dtype)
+    if count:
+        collection.foreach_get(attr, ret)
+    return ret.tobytes()
+
+
+def matrix(m):
+    return numpy.array(m, dtype=numpy.float64).tobytes()
+
+
+def rna_values(data):
+    """
+    Settings of a constraint or F-curve modifier, objects are referred
+    to by name and placement
+    """
+    ret = [data.type]
+    for p in data.bl_rna.properties:
+        if p.identifier == 'rna_type':
+            continue
+        v = getattr(data, p.identifier)
+        if hasattr(v, 'matrix_world'):
+            v = (v.name, tuple(map(tuple, v.matrix_world)))
+        ret.append(repr(v))
+    return repr(ret)
+
+
+def options_parts(config):
+    values = config.values()
+    return [repr(sorted([
+        (k, v) for k, v in values.items()
+        if not k in IGNORED_OPTIONS and not k.startswith('budget_')
+    ]))]
+
+
+def mesh_armature(obj):
+    """
+    Armature Mesh bakes bones of, see Mesh.parse_armature
+    """
+    for mod in obj.modifiers:
+        if mod.type == 'ARMATURE' and mod.object and mod.object.animation_data:
+            return mod.object
+
+
+def dopesheet_action():
+    """
+    Name of the action Armature bakes when not exporting all of them
+    """
+    area = bpy.context.area
+    current = area.type
+    area.type = 'DOPESHEET_EDITOR'
+    try:
+        action = area.spaces.active.action
+    finally:
+        area.type = current
+    return action.name if action else ''
+
+
+def fcurve_parts(fc):
+    count = len(fc.keyframe_points) * 2
+    return [
+        repr((
+            fc.data_path, fc.array_index, fc.extrapolation, fc.mute,
+            [k.interpolation for k in fc.keyframe_points],
+            [rna_values(m) for m in fc.modifiers]
+        )),
+        bulk(fc.keyframe_points, 'co', count),
+        bulk(fc.keyframe_points, 'handle_left', count),
+        bulk(fc.keyframe_points, 'handle_right', count),
+    ]
+
+
+def actions_parts():
+    ret = [dopesheet_action()]
+    for action in bpy.data.actions:
+        ret.append(repr((
+            action.name,
+            tuple(action.frame_range),
+            [m.name for m in action.pose_markers]
+        )))
+        for fc in action.fcurves:
+            ret.extend(fcurve_parts(fc))
+    return ret
+
+
+def armature_parts(arm):
+    ret = [arm.name, matrix(arm.matrix_world)]
+    for b in arm.data.bones:
+        ret.append(repr((b.name, b.parent.name if b.parent else '', b.use_deform)))
+        ret.append(matrix(b.matrix_local))
+
+    # Channels without keys keep their current values while baking
+    pose_bones = arm.pose.bones
+    ret.append(bulk(pose_bones, 'matrix_basis', len(pose_bones) * 16))
+    for pb in pose_bones:
+        ret.append(repr((pb.name, pb.rotation_mode)))
+        ret.extend([rna_values(c) for c in pb.constraints])
+
+    for d in arm.animation_data.drivers:
+        ret.extend(fcurve_parts(d))
+        ret.append(repr((d.driver.type, d.driver.expression, [
+            (v.name, v.type, [
+                (t.id.name if t.id else '', t.data_path, t.bone_target)
+                for t in v.targets
+            ])
+            for v in d.driver.variables
+        ])))
+    return ret
+
+
+def mesh_parts(obj, config, armatures):
+    """
+    Inputs of Mesh: evaluated geometry, material slots, placement and
+    with animation export, bone weights and the armature baked
+    """
+    ret = [
+        matrix(obj.matrix_local),
+        matrix(obj.matrix_world),
+        repr([m.name if m else '' for m in obj.data.materials]),
+    ]
+
+    armature = mesh_armature(obj)
+    mesh = utils.evaluated_mesh(obj)
+    try:
+        vc = len(mesh.vertices)
+        lc = len(mesh.loops)
+        pc = len(mesh.polygons)
+        ret.extend([
+            repr((vc, lc, pc)),
+            bulk(mesh.vertices, 'co', vc * 3),
+            bulk(mesh.vertices, 'normal', vc * 3),
+            bulk(mesh.polygons, 'loop_start', pc, numpy.int32),
+            bulk(mesh.polygons, 'loop_total', pc, numpy.int32),
+            bulk(mesh.polygons, 'material_index', pc, numpy.int32),
+            bulk(mesh.loops, 'vertex_index', lc, numpy.int32),
+        ])
+        if mesh.uv_layers.active:
+            ret.append(bulk(mesh.uv_layers.active.data, 'uv', lc * 2))
+
+        if armature:
+            ret.append(armature.name)
+        if armature and config.export_animation:
+            ret.append(repr([vg.name for vg in obj.vertex_groups]))
+            ret.append(repr([
+                [(g.group, g.weight) for g in v.groups] for v in mesh.vertices
+            ]))
+    finally:
+        bpy.data.meshes.remove(mesh)
+
+    if armature and config.export_animation and not armature.name in armatures:
+        armatures[armature.name] = armature_parts(armature)
+    return ret
+
+
+def exportable_parts(exportable, config):
+    """
+    Key parts of an exportable item and its children,
+    see LeadwerksExporter.get_exportables
+    """
+    ret = options_parts(config)
+    armatures = {}
+    stack = [exportable]
+    while stack:
+        e = stack.pop()
+        ob = e['object']
+        ret.append(repr((e['type'], ob.name, len(e['children']))))
+        ret.append(matrix(ob.matrix_local if e['parent'] else ob.matrix_world))
+        if e['type'] == 'MESH':
+            ret.extend(mesh_parts(ob, config, armatures))
+        stack.extend(reversed(e['children']))
+
+    for name in sorted(armatures.keys()):
+        ret.extend(armatures[name])
+    if armatures:
+        ret.extend(actions_parts())
+    return ret
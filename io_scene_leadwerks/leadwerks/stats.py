@@ -0,0 +1,147 @@
+"""
+Statistics of exported assets and budgets checked against them.
+
+Statistics are collected per written model (with its animation library
+files) while surfaces and bones are formatted, so budgets are checked
+before any file reaches the output directory. Models taken from
+ExportCache restore the counters stored along with their files.
+"""
+import json
+
+
+# (statistic, option holding its budget, units of the option in bytes)
+BUDGETS = [
+    ('triangles', 'budget_triangles', 1),
+    ('vertices', 'budget_vertices', 1),
+    ('bones', 'budget_bones', 1),
+    ('actions', 'budget_actions', 1),
+    ('keyframes', 'budget_keyframes', 1),
+    ('texture_memory', 'budget_texture_memory', 1024 * 1024),
+    ('file_size', 'budget_file_size', 1024 * 1024),
+]
+
+# Statistics of meshes and bones kept in ExportCache
+COUNTERS = ['meshes', 'surfaces', 'triangles', 'vertices', 'uv_seam_vertices', 'bones', 'keyframes']
+
+
+class AssetStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.meshes = 0
+        self.surfaces = 0
+        self.triangles = 0
+        self.vertices = 0
+        self.uv_seam_vertices = 0
+        self.bones = 0
+        self.actions = set()
+        self.keyframes = 0
+        # Material name -> used by skinned mesh
+        self.materials = {}
+        # Texture name -> estimated memory, shared textures count once
+        self.textures = {}
+        self.files = {}
+        self.warnings = []
+
+    @property
+    def texture_memory(self):
+        return sum(self.textures.values())
+
+    @property
+    def file_size(self):
+        return sum(self.files.values())
+
+    def add_mesh(self, mesh, with_bones=True):
+        self.meshes += 1
+        for k in ['surfaces', 'triangles', 'vertices', 'uv_seam_vertices']:
+            setattr(self, k, getattr(self, k) + mesh.stats.get(k, 0))
+
+        for name in mesh.materials.keys():
+            self.materials[name] = self.materials.get(name, False) or mesh.is_animated
+        self.add_textures(mesh.materials.values())
+
+        if not mesh.armature or not with_bones:
+            return
+        # Topmost bone stands for the armature object, it isn't counted
+        # but its keys are written like the ones of other bones
+        topmost = mesh.armature.bones
+        stack = list(topmost)
+        while stack:
+            bone = stack.pop()
+            if not bone in topmost:
+                self.bones += 1
+            for a in bone.animations:
+                self.actions.add(a['name'])
+                self.keyframes += len(a['keyframes'])
+            stack.extend(bone.children)
+
+    def add_textures(self, materials):
+        for m in materials:
+            for t in m.textures:
+                if not t.name in self.textures:
+                    self.textures[t.name] = t.memory_size()
+
+    def add_file(self, name, size):
+        self.files[name] = size
+
+    def counters(self):
+        ret = dict([(k, getattr(self, k)) for k in COUNTERS])
+        ret['actions'] = sorted(self.actions)
+        ret['materials'] = self.materials
+        ret['warnings'] = self.warnings
+        return ret
+
+    def restore(self, counters):
+        """
+        Takes over counters of the same asset exported before,
+        textures and files are added as usual
+        """
+        for k in COUNTERS:
+            setattr(self, k, counters[k])
+        self.actions = set(counters['actions'])
+        self.materials = dict(counters['materials'])
+        self.warnings = list(counters['warnings'])
+
+    def values(self):
+        return {
+            'name': self.name,
+            'meshes': self.meshes,
+            'surfaces': self.surfaces,
+            'triangles': self.triangles,
+            'vertices': self.vertices,
+            'uv_seam_vertices': self.uv_seam_vertices,
+            'bones': self.bones,
+            'actions': len(self.actions),
+            'keyframes': self.keyframes,
+            'materials': sorted(self.materials.keys()),
+            'texture_memory': self.texture_memory,
+            'textures': self.textures,
+            'file_size': self.file_size,
+            'files': self.files,
+            'warnings': self.warnings,
+        }
+
+
+def check_budgets(assets, config):
+    """
+    Returns list of messages on budgets exceeded by assets,
+    budgets set to 0 are not checked
+    """
+    ret = []
+    for asset in assets:
+        values = asset.values()
+        for key, option, unit in BUDGETS:
+            budget = getattr(config, option)
+            if budget and values[key] > budget * unit:
+                ret.append('"%s": %s %s over budget of %s' % (
+                    asset.name, values[key], key.replace('_', ' '), budget * unit
+                ))
+    return ret
+
+
+def write_report(path, assets, violations):
+    report = {
+        'assets': [a.values() for a in assets],
+        'over_budget': violations,
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=4, sort_keys=True)
@@ -0,0 +1,95 @@
+"""
+Conversion of indexed triangle lists to a single triangle strip.
+
+Strips are grown greedily over shared edges keeping the winding of
+every triangle: triangle i of a strip is (s[i], s[i+1], s[i+2]) for
+even i and (s[i+1], s[i], s[i+2]) for odd i. Separate strips are joined
+with degenerate triangles, padded so the next strip starts on even
+parity.
+"""
+from array import array
+
+
+def strip_to_triangles(strip):
+    """
+    Triangle list of a strip with degenerate triangles left out
+    """
+    ret = array('I')
+    for i in range(0, len(strip) - 2):
+        a, b, c = strip[i], strip[i + 1], strip[i + 2]
+        if a == b or b == c or a == c:
+            continue
+        if i % 2:
+            a, b = b, a
+        ret.extend((a, b, c))
+    return ret
+
+
+class Stripifier(object):
+    def __init__(self, indices):
+        self.triangles = [tuple(indices[i:i + 3]) for i in range(0, len(indices) - 2, 3)]
+        self.used = [False] * len(self.triangles)
+        # Directed edge -> triangles having it in their winding order
+        self.edges = {}
+        for t, (a, b, c) in enumerate(self.triangles):
+            for edge, opposite in (((a, b), c), ((b, c), a), ((c, a), b)):
+                self.edges.setdefault(edge, []).append((t, opposite))
+
+    def next_triangle(self, a, b):
+        for t, opposite in self.edges.get((a, b), ()):
+            if not self.used[t]:
+                return t, opposite
+        return None, None
+
+    def grow(self, strip, mark=False):
+        used = []
+        while True:
+            i = len(strip) - 2
+            if i % 2:
+                t, r = self.next_triangle(strip[-1], strip[-2])
+            else:
+                t, r = self.next_triangle(strip[-2], strip[-1])
+            if t is None:
+                break
+            self.used[t] = True
+            used.append(t)
+            strip.append(r)
+        if not mark:
+            for t in used:
+                self.used[t] = False
+        return strip
+
+    def strips(self):
+        for t, (a, b, c) in enumerate(self.triangles):
+            if self.used[t]:
+                continue
+            self.used[t] = True
+            # Starting edge is chosen by the longest resulting strip
+            best = max(
+                [[a, b, c], [b, c, a], [c, a, b]],
+                key=lambda s: len(self.grow(list(s)))
+            )
+            yield self.grow(best, mark=True)
+
+
+def join_strips(strips):
+    ret = array('I')
+    for s in strips:
+        if ret:
+            ret.extend((ret[-1], s[0]))
+            if len(ret) % 2:
+                ret.append(s[0])
+        ret.extend(s)
+    return ret
+
+
+def stripify(indices):
+    """
+    Returns strip of the triangle list or None if the list is shorter
+    """
+    if not indices:
+        return None
+    strip = join_strips(Stripifier(indices).strips())
+    if len(strip) < len(indices):
+        return strip
+    return None
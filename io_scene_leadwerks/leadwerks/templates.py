@@ -58,6 +58,7 @@ sources = {
         {{ v }}
         {% endfor %}
         {{ indice_array }}
+        {{ aabb }}
     </subblocks>
 </block>
 ''',
@@ -80,6 +81,15 @@ sources = {
 </block>
 ''',
 
+'AABB':
+'''
+<block name="AABB" code="{{ code }}">
+    <num_kids>0</num_kids>
+    <min>{{ min }}</min>
+    <max>{{ max }}</max>
+</block>
+''',
+
 'BONE':
 '''
 <block name="BONE" code="{{ code }}">
@@ -119,6 +129,7 @@ sources = {
     </matrix>
     <subblocks>
         {{ props }}
+        {{ aabb }}
         {{ surfaces }}
         {{ bones }}
         {{ childs }}
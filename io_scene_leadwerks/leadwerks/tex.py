@@ -0,0 +1,288 @@
+"""
+Native Leadwerks .tex writer.
+
+Mip chain is built from Blender image pixel buffers with vectorized
+box or Kaiser filtering and optionally block compressed (DXT1/DXT5).
+Conversion runs in a worker pool, pixels have to be fetched from
+Blender in the main thread beforehand.
+
+Layout of written file (all values are 32 bit integers):
+    signature, version, format, target, width, height, depth,
+    filter, clamp u, clamp v, clamp w, mipmaps count
+    and then for every mipmap: width, height, data size, data
+"""
+import os
+import struct
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+import numpy
+
+from . import constants
+
+
+COMPRESSION_FORMATS = {
+    'NONE': constants.TEX_RGBA,
+    'DXT1': constants.TEX_DXT1,
+    'DXT5': constants.TEX_DXT5,
+}
+
+# Bump on any change of bytes written for the same pixels and settings,
+# files of other versions are not taken from ExportCache
+WRITER_VERSION = 1
+
+KAISER_RADIUS = 3
+KAISER_BETA = 4.0
+
+_executor = None
+# Output path -> (input signature, future) of the last queued conversion
+_scheduled = {}
+_lock = threading.Lock()
+
+
+def from_blender_pixels(pixels, width, height):
+    """
+    Blender stores RGBA floats bottom row first
+    """
+    img = numpy.asarray(pixels, dtype=numpy.float32).reshape(height, width, 4)
+    return img[::-1]
+
+
+def filter_taps(mip_filter):
+    """
+    Weights of input pixels 2i-r+1 .. 2i+r for output pixel i
+    """
+    if mip_filter == 'KAISER':
+        x = numpy.arange(-KAISER_RADIUS + 1, KAISER_RADIUS + 1) - 0.5
+        window = numpy.i0(KAISER_BETA * numpy.sqrt(1 - (x / KAISER_RADIUS) ** 2))
+        taps = numpy.sinc(x / 2) * window / numpy.i0(KAISER_BETA)
+    else:
+        taps = numpy.array([0.5, 0.5])
+    return taps / taps.sum()
+
+
+def downsample(img, axis, taps):
+    n = img.shape[axis]
+    if n == 1:
+        return img
+    out_n = n // 2
+    first = 1 - len(taps) // 2
+    base = numpy.arange(out_n) * 2
+    ret = None
+    for j, w in enumerate(taps):
+        idx = numpy.clip(base + first + j, 0, n - 1)
+        part = numpy.take(img, idx, axis=axis) * w
+        ret = part if ret is None else ret + part
+    return ret
+
+
+def build_mipmaps(img, mip_filter='BOX'):
+    taps = filter_taps(mip_filter)
+    levels = [img]
+    while img.shape[0] > 1 or img.shape[1] > 1:
+        img = downsample(downsample(img, 0, taps), 1, taps)
+        levels.append(numpy.clip(img, 0.0, 1.0))
+    return levels
+
+
+def memory_size(width, height, compression='NONE'):
+    """
+    Size of the mip chain build_mipmaps makes from image of given
+    size, once encoded
+    """
+    ret = 0
+    while True:
+        if compression == 'NONE':
+            ret += width * height * 4
+        else:
+            blocks = ((width + 3) // 4) * ((height + 3) // 4)
+            ret += blocks * (8 if compression == 'DXT1' else 16)
+        if width == 1 and height == 1:
+            return ret
+        width = max(1, width // 2)
+        height = max(1, height // 2)
+
+
+def to_rgba8(level):
+    return (numpy.clip(level, 0.0, 1.0) * 255.0 + 0.5).astype(numpy.uint8)
+
+
+def to_blocks(rgba8):
+    """
+    Splits image into (blocks, 16 pixels, 4 channels) padding it
+    with edge pixels to multiple of 4
+    """
+    h, w = rgba8.shape[:2]
+    ph = (4 - h % 4) % 4
+    pw = (4 - w % 4) % 4
+    if ph or pw:
+        rgba8 = numpy.pad(rgba8, ((0, ph), (0, pw), (0, 0)), mode='edge')
+    bh = rgba8.shape[0] // 4
+    bw = rgba8.shape[1] // 4
+    blocks = rgba8.reshape(bh, 4, bw, 4, 4).transpose(0, 2, 1, 3, 4)
+    return blocks.reshape(-1, 16, 4).astype(numpy.int32)
+
+
+def pack565(c):
+    return ((c[:, 0] >> 3) << 11) | ((c[:, 1] >> 2) << 5) | (c[:, 2] >> 3)
+
+
+def unpack565(c):
+    r = (c >> 11) & 31
+    g = (c >> 5) & 63
+    b = c & 31
+    return numpy.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], -1)
+
+
+def encode_color_blocks(blocks):
+    """
+    DXT1 color part with bounding box endpoints, 8 bytes per block
+    """
+    rgb = blocks[:, :, 0:3]
+    c0 = pack565(rgb.max(1))
+    c1 = pack565(rgb.min(1))
+    e0 = unpack565(c0).astype(numpy.float32)
+    e1 = unpack565(c1).astype(numpy.float32)
+    palette = numpy.stack([e0, e1, (2 * e0 + e1) / 3, (e0 + 2 * e1) / 3], 1)
+
+    dist = ((rgb[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(-1)
+    idx = dist.argmin(-1).astype(numpy.uint32)
+    # Equal endpoints switch decoder to 3-color mode, first color is safe
+    idx[c0 == c1] = 0
+
+    shifts = numpy.arange(16, dtype=numpy.uint32) * 2
+    out = numpy.zeros(len(blocks), dtype=[('c0', '<u2'), ('c1', '<u2'), ('idx', '<u4')])
+    out['c0'] = c0
+    out['c1'] = c1
+    out['idx'] = (idx << shifts).sum(1)
+    return out.view(numpy.uint8).reshape(-1, 8)
+
+
+def encode_alpha_blocks(blocks):
+    """
+    DXT5 alpha part with 8 interpolated values, 8 bytes per block
+    """
+    alpha = blocks[:, :, 3]
+    a0 = alpha.max(1)
+    a1 = alpha.min(1)
+    weights = numpy.array([7, 0, 6, 5, 4, 3, 2, 1], dtype=numpy.float32) / 7
+    palette = a0[:, None] * weights + a1[:, None] * (1 - weights)
+
+    idx = numpy.abs(alpha[:, :, None] - palette[:, None, :]).argmin(-1).astype(numpy.uint64)
+    idx[a0 == a1] = 0
+    bits = (idx << (numpy.arange(16, dtype=numpy.uint64) * 3)).sum(1).astype('<u8')
+
+    out = numpy.zeros((len(blocks), 8), dtype=numpy.uint8)
+    out[:, 0] = a0
+    out[:, 1] = a1
+    out[:, 2:8] = bits.view(numpy.uint8).reshape(-1, 8)[:, 0:6]
+    return out
+
+
+def encode_level(level, compression):
+    rgba8 = to_rgba8(level)
+    if compression == 'NONE':
+        return rgba8.tobytes()
+
+    blocks = to_blocks(rgba8)
+    color = encode_color_blocks(blocks)
+    if compression == 'DXT1':
+        return color.tobytes()
+    return numpy.concatenate([encode_alpha_blocks(blocks), color], 1).tobytes()
+
+
+def write_tex(path, levels, compression='NONE'):
+    height, width = levels[0].shape[0:2]
+    header = [
+        constants.TEX_SIGNATURE,
+        constants.TEX_VERSION,
+        COMPRESSION_FORMATS[compression],
+        constants.TEX_TARGET_2D,
+        width,
+        height,
+        1,  # depth
+        constants.TEX_FILTER_SMOOTH,
+        0, 0, 0,  # clamp u, v, w
+        len(levels)
+    ]
+    tmp_path = '%s.tmp' % path
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<12i', *header))
+        for level in levels:
+            data = encode_level(level, compression)
+            f.write(struct.pack('<3i', level.shape[1], level.shape[0], len(data)))
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def convert(path, pixels, width, height, compression='NONE', mip_filter='BOX', cache=None):
+    key = None
+    if cache is not None:
+        key = cache.make_key(
+            'tex', WRITER_VERSION, constants.TEX_VERSION, width, height, compression, mip_filter,
+            numpy.asarray(pixels, dtype=numpy.float32).tobytes()
+        )
+        if cache.fetch(key, path):
+            return
+
+    img = from_blender_pixels(pixels, width, height)
+    write_tex(path, build_mipmaps(img, mip_filter), compression)
+    if key:
+        cache.store(key, path)
+
+
+def _forget(path, future):
+    with _lock:
+        entry = _scheduled.get(path)
+        if entry is not None and entry[1] is future:
+            del _scheduled[path]
+
+
+def _convert_after(previous, *args):
+    if previous is not None:
+        # Older input of the same path must not overwrite this one
+        wait_futures([previous])
+    convert(*args)
+
+
+def schedule(path, pixels, width, height, compression='NONE', mip_filter='BOX', cache=None):
+    """
+    Queues conversion to the worker pool and returns its future.
+    If the same pixels and settings are being converted to the path
+    for any export, future of that conversion is returned instead.
+    Conversion of other input to the path starts once the queued one
+    is done, so the last input given is written last.
+    Converted files are taken from and stored to ExportCache if given
+    """
+    global _executor
+    pixels = numpy.ascontiguousarray(pixels, dtype=numpy.float32)
+    signature = (width, height, compression, mip_filter, hashlib.sha1(pixels).hexdigest())
+    with _lock:
+        entry = _scheduled.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        previous = entry[1] if entry is not None else None
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 2)
+        future = _executor.submit(
+            _convert_after, previous, path, pixels, width, height, compression, mip_filter, cache
+        )
+        _scheduled[path] = (signature, future)
+    future.add_done_callback(lambda f: _forget(path, f))
+    return future
+
+
+def wait(futures):
+    """
+    Waits for conversions of a single export given as {path: future},
+    returns list of failed paths
+    """
+    failed = []
+    for path, f in sorted(futures.items()):
+        try:
+            f.result()
+        except Exception as e:
+            print('Texture "%s" not exported: %s' % (path, e))
+            failed.append(path)
+    return failed
@@ -1,42 +1,40 @@
-from mathutils import Vector
-
-
-def __to_floats(tex_coords_as_str):
-    fcoords = list(map(float, tex_coords_as_str))
-    return fcoords
-
-
-def update_tangents_and_binormals(verts):
-
-    p0, p1, p2 = [Vector(__to_floats(v['position'])) for v in verts]
-    u0, u1, u2 = __to_floats([v['texture_coords'][0] for v in verts])
-    v0, v1, v2 = __to_floats([v['texture_coords'][1] for v in verts])
+from array import array
 
-    tangent = None
-    binormal = None
-
-    try:
-        tangent = ((v2 - v0) * (p1 - p0) - (v1 - v0) * (p2 - p0)) / ((u1 - u0) * (v2 - v0) - (v1 - v0) * (u2 - u0))
-    except Exception:
-        tangent = None
-
-    try:
-        binormal = ((u2 - u0) * (p1 - p0) - (u1 - u0) * (p2 - p0)) / ((v1 - v0) * (u2 - u0) - (u1 - u0) * (v2 - v0))
-    except Exception:
-        binormal = None
-
-    # Update tangent and binormal
-    for v in verts:
-        if not 'tangent' in v:
-            v['tangent'] = Vector((0,0,0))
-
-        if not 'binormal' in v:
-            v['binormal'] = Vector((0,0,0))
+from mathutils import Vector
 
-        if tangent:
-            v['tangent'] = v['tangent'] + tangent
-            v['tangent'].normalize()
 
-        if binormal:
-            v['binormal'] = v['binormal'] + binormal
-            v['binormal'].normalize()
+def update_tangents_and_binormals(store, indices):
+    """
+    Accumulates tangents and binormals of triangles listed in indices
+    into the vertex store
+    """
+    pos = store.positions
+    tc = store.texture_coords
+    for f in range(0, len(indices) - 2, 3):
+        verts = indices[f:f + 3]
+
+        p0, p1, p2 = [Vector(pos[i * 3:i * 3 + 3]) for i in verts]
+        u0, u1, u2 = [tc[i * 2] for i in verts]
+        v0, v1, v2 = [tc[i * 2 + 1] for i in verts]
+
+        try:
+            tangent = ((v2 - v0) * (p1 - p0) - (v1 - v0) * (p2 - p0)) / ((u1 - u0) * (v2 - v0) - (v1 - v0) * (u2 - u0))
+        except Exception:
+            tangent = None
+
+        try:
+            binormal = ((u2 - u0) * (p1 - p0) - (u1 - u0) * (p2 - p0)) / ((v1 - v0) * (u2 - u0) - (u1 - u0) * (v2 - v0))
+        except Exception:
+            binormal = None
+
+        # Update tangent and binormal
+        for i in verts:
+            if tangent is not None:
+                t = Vector(store.tangents[i * 3:i * 3 + 3]) + tangent
+                t.normalize()
+                store.tangents[i * 3:i * 3 + 3] = array('f', t)
+
+            if binormal is not None:
+                b = Vector(store.binormals[i * 3:i * 3 + 3]) + binormal
+                b.normalize()
+                store.binormals[i * 3:i * 3 + 3] = array('f', b)
@@ -0,0 +1,242 @@
+"""
+Triangulation of evaluated meshes straight from polygon and loop arrays.
+
+Triangles and quads are split in bulk with numpy, quads along the 0-2
+diagonal unless they are concave there. Convex planar n-gons are
+fanned, concave planar ones are ear-clipped in the polygon plane. Only
+non-planar n-gons are passed to bmesh, so in the common case the mesh
+is not copied at all.
+"""
+from array import array
+
+import numpy
+import bmesh
+
+
+PLANAR_EPSILON = 1e-4
+
+
+class Triangles(object):
+    """
+    Triangle list of a mesh in terms of its loops.
+    `loops` holds 3 loop indices per triangle, loop_vertices and
+    loop_uvs (None without UV layer) are indexed by loop
+    """
+    def __init__(self):
+        self.loops = array('I')
+        self.material_indices = array('H')
+        self.loop_vertices = array('I')
+        self.loop_uvs = None
+        self.fallback_polygons = 0
+
+    def __len__(self):
+        return len(self.material_indices)
+
+
+def polygon_normal(points):
+    """
+    Newell's method, works for concave polygons too
+    """
+    nx = ny = nz = 0.0
+    for i, p in enumerate(points):
+        q = points[(i + 1) % len(points)]
+        nx += (p[1] - q[1]) * (p[2] + q[2])
+        ny += (p[2] - q[2]) * (p[0] + q[0])
+        nz += (p[0] - q[0]) * (p[1] + q[1])
+    return nx, ny, nz
+
+
+def is_planar(points, normal):
+    length = sum([c * c for c in normal]) ** 0.5
+    if not length:
+        return False
+    n = [c / length for c in normal]
+    size = max([max(p[i] for p in points) - min(p[i] for p in points) for i in range(0, 3)])
+    d0 = sum([n[i] * points[0][i] for i in range(0, 3)])
+    for p in points[1:]:
+        if abs(sum([n[i] * p[i] for i in range(0, 3)]) - d0) > PLANAR_EPSILON * size:
+            return False
+    return True
+
+
+def project(points, normal):
+    """
+    Drops the dominant normal axis, 2D winding matches 3D winding
+    """
+    axis = max(range(0, 3), key=lambda i: abs(normal[i]))
+    u, v = [(1, 2), (2, 0), (0, 1)][axis]
+    if normal[axis] < 0:
+        u, v = v, u
+    return [(p[u], p[v]) for p in points]
+
+
+def cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def is_convex(pts):
+    n = len(pts)
+    return all([cross(pts[i - 1], pts[i], pts[(i + 1) % n]) >= 0 for i in range(0, n)])
+
+
+def fan(n):
+    return [(0, i, i + 1) for i in range(1, n - 1)]
+
+
+def ear_clip(pts):
+    """
+    Returns local index triples of counter clockwise 2D polygon
+    """
+    left = list(range(0, len(pts)))
+    ret = []
+    guard = len(left) ** 2
+    while len(left) > 3 and guard:
+        guard -= 1
+        n = len(left)
+        for k in range(0, n):
+            a, b, c = left[k - 1], left[k], left[(k + 1) % n]
+            if cross(pts[a], pts[b], pts[c]) <= 0:
+                continue
+            inside = False
+            for j in left:
+                if j in (a, b, c):
+                    continue
+                p = pts[j]
+                if cross(pts[a], pts[b], p) >= 0 and cross(pts[b], pts[c], p) >= 0 and \
+                        cross(pts[c], pts[a], p) >= 0:
+                    inside = True
+                    break
+            if not inside:
+                ret.append((a, b, c))
+                left.pop(k)
+                break
+        else:
+            # Degenerate polygon, no ear found
+            break
+    if len(left) == 3:
+        ret.append(tuple(left))
+        return ret
+    return None
+
+
+def triangulate_polygon(points):
+    """
+    Local index triples of the polygon or None if it needs bmesh
+    """
+    n = len(points)
+    if n < 4:
+        return fan(n)
+    normal = polygon_normal(points)
+    # Quads can always be split along a diagonal
+    if n > 4 and not is_planar(points, normal):
+        return None
+    pts = project(points, normal)
+    if is_convex(pts):
+        return fan(n)
+    return ear_clip(pts)
+
+
+def bmesh_triangles(mesh, polygons):
+    """
+    Tessellates listed polygons with bmesh,
+    returns {polygon index: local index triples}
+    """
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bm.faces.index_update()
+    wanted = set(polygons)
+    ret = {}
+    for tri in bm.calc_tessface():
+        face = tri[0].face
+        if face.index not in wanted:
+            continue
+        face_loops = list(face.loops)
+        ret.setdefault(face.index, []).append(tuple([face_loops.index(l) for l in tri]))
+    bm.free()
+    return ret
+
+
+def quad_flip(points):
+    """
+    True for quads (quads x 4 x 3) concave at vertex 0 or 2, which
+    are split along the 1-3 diagonal instead of 0-2
+    """
+    p0, p1, p2, p3 = points[:, 0], points[:, 1], points[:, 2], points[:, 3]
+    normal = numpy.cross(p2 - p0, p3 - p1)
+    first = (numpy.cross(p1 - p0, p2 - p0) * normal).sum(1)
+    second = (numpy.cross(p2 - p0, p3 - p0) * normal).sum(1)
+    return (first < 0) | (second < 0)
+
+
+def triangulate(mesh):
+    ret = Triangles()
+    count = len(mesh.polygons)
+    loop_start = numpy.zeros(count, dtype=numpy.int32)
+    loop_total = numpy.zeros(count, dtype=numpy.int32)
+    material_index = numpy.zeros(count, dtype=numpy.int32)
+    mesh.polygons.foreach_get('loop_start', loop_start)
+    mesh.polygons.foreach_get('loop_total', loop_total)
+    mesh.polygons.foreach_get('material_index', material_index)
+
+    loop_vertices = numpy.zeros(len(mesh.loops), dtype=numpy.uint32)
+    mesh.loops.foreach_get('vertex_index', loop_vertices)
+    ret.loop_vertices.frombytes(loop_vertices.tobytes())
+
+    if mesh.uv_layers.active:
+        ret.loop_uvs = array('f', [0]) * (len(mesh.loops) * 2)
+        mesh.uv_layers.active.data.foreach_get('uv', ret.loop_uvs)
+
+    co = numpy.zeros(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get('co', co)
+    co = co.reshape(-1, 3)
+
+    # Triangles of every polygon kind with their polygon indices,
+    # merged back to polygon order at the end
+    polys = numpy.arange(count)
+    tris = polys[loop_total == 3]
+    out_polys = [tris]
+    out_loops = [loop_start[tris, None] + numpy.arange(3)]
+
+    quads = polys[loop_total == 4]
+    quad_loops = loop_start[quads, None] + numpy.arange(4)
+    flip = quad_flip(co[loop_vertices[quad_loops]])[:, None]
+    out_polys.extend([quads, quads])
+    out_loops.extend([
+        numpy.where(flip, quad_loops[:, [0, 1, 3]], quad_loops[:, [0, 1, 2]]),
+        numpy.where(flip, quad_loops[:, [1, 2, 3]], quad_loops[:, [0, 2, 3]]),
+    ])
+
+    ngon_polys = []
+    ngon_loops = []
+
+    def add(poly, start, local):
+        for tri in local:
+            ngon_polys.append(poly)
+            ngon_loops.append([start + i for i in tri])
+
+    fallback = []
+    for poly in polys[loop_total > 4].tolist():
+        start = int(loop_start[poly])
+        points = co[loop_vertices[start:start + loop_total[poly]]].tolist()
+        local = triangulate_polygon(points)
+        if local is None:
+            fallback.append(poly)
+        else:
+            add(poly, start, local)
+
+    if fallback:
+        ret.fallback_polygons = len(fallback)
+        for poly, local in bmesh_triangles(mesh, fallback).items():
+            add(poly, int(loop_start[poly]), local)
+
+    if ngon_polys:
+        out_polys.append(numpy.array(ngon_polys))
+        out_loops.append(numpy.array(ngon_loops).reshape(-1, 3))
+
+    order = numpy.argsort(numpy.concatenate(out_polys), kind='stable')
+    loops = numpy.concatenate(out_loops)[order]
+    ret.loops.frombytes(loops.astype(numpy.uint32).tobytes())
+    ret.material_indices.frombytes(
+        material_index[numpy.concatenate(out_polys)[order]].astype(numpy.uint16).tobytes()
+    )
+    return ret
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import bpy
-from bpy_extras.io_utils import ExportHelper
-from .exporter import LeadwerksExporter
+from bpy_extras.io_utils import ExportHelper, ImportHelper
 
 bpy.types.Material.leadwerks_base_shader = bpy.props.StringProperty(name='Shader Name')
 
@@ -55,6 +54,31 @@ class ExportLeadwerks(bpy.types.Operator, ExportHelper):
         name='Overwrite existing textures',
         default=True
     )
+    texture_format = bpy.props.EnumProperty(
+        name="Texture format",
+        items=(
+            ('tex', ".tex", "Native Leadwerks texture with mipmaps"),
+            ('png', ".png", "Converted by Leadwerks editor on import"),
+        ),
+        default='png',
+    )
+    texture_compression = bpy.props.EnumProperty(
+        name="Texture compression",
+        items=(
+            ('NONE', "None", "Uncompressed RGBA"),
+            ('DXT1', "DXT1", "No alpha, 8:1"),
+            ('DXT5', "DXT5", "With alpha, 4:1"),
+        ),
+        default='NONE',
+    )
+    mipmap_filter = bpy.props.EnumProperty(
+        name="Mipmap filter",
+        items=(
+            ('BOX', "Box", ""),
+            ('KAISER', "Kaiser", "Sharper mipmaps"),
+        ),
+        default='BOX',
+    )
     export_animation = bpy.props.BoolProperty(
         name='Export animation',
         default=True
@@ -63,12 +87,141 @@ class ExportLeadwerks(bpy.types.Operator, ExportHelper):
         name='All actions',
         default=False
     )
+    action_name_prefix = bpy.props.StringProperty(
+        name="Action prefix",
+        description=("Export only actions whose name starts with it, "
+                     "empty for all"),
+        default='',
+    )
+    action_marker = bpy.props.StringProperty(
+        name="Action marker",
+        description=("Export only actions having a pose marker "
+                     "of this name, empty for all"),
+        default='',
+    )
+    split_animations = bpy.props.BoolProperty(
+        name='Separate animation files',
+        description=("Write model with bind pose only, every action to "
+                     "its own file and a .animations.json manifest"),
+        default=False
+    )
     anim_baking_step = bpy.props.IntProperty(
         name="Animation step",
         description=("Reduce frame count for animations"),
         min=1, max=100,
         default=1,
     )
+    max_bones_per_surface = bpy.props.IntProperty(
+        name="Max bones per surface",
+        description=("Split skinned surfaces referencing more bones, "
+                     "0 for no limit"),
+        min=0, max=256,
+        default=0,
+    )
+    export_aabb = bpy.props.BoolProperty(
+        name='Bounding boxes',
+        description=("Precompute bounds of surfaces and meshes, "
+                     "including all animation frames for skinned meshes"),
+        default=False
+    )
+    weld_vertices = bpy.props.BoolProperty(
+        name='Weld vertices',
+        description=("Merge vertices of a surface whose position, normal, "
+                     "UV, tangent and skin weights match"),
+        default=False
+    )
+    weld_position_epsilon = bpy.props.FloatProperty(
+        name="Position tolerance",
+        min=0.0, max=1.0, precision=6,
+        default=0.00001,
+    )
+    weld_normal_epsilon = bpy.props.FloatProperty(
+        name="Normal tolerance",
+        min=0.0, max=1.0, precision=6,
+        default=0.001,
+    )
+    weld_uv_epsilon = bpy.props.FloatProperty(
+        name="UV tolerance",
+        min=0.0, max=1.0, precision=6,
+        default=0.00001,
+    )
+    export_triangle_strips = bpy.props.BoolProperty(
+        name='Triangle strips',
+        description=("Write surface indices as triangle strip "
+                     "when it is shorter than triangle list"),
+        default=False
+    )
+    export_cache_dir = bpy.props.StringProperty(
+        name="Cache directory",
+        description=("Reuse files of unchanged assets from this directory, "
+                     "may be shared between machines. Empty to disable"),
+        subtype='DIR_PATH',
+        default='',
+    )
+    export_cache_size = bpy.props.IntProperty(
+        name="Cache size (MB)",
+        description=("Least recently used files are removed "
+                     "above this size"),
+        min=1, max=1048576,
+        default=1024,
+    )
+    write_stats_report = bpy.props.BoolProperty(
+        name='Write statistics',
+        description=("Write triangles, vertices, bones, keyframes, texture "
+                     "memory and file sizes of assets to a .stats.json file"),
+        default=True
+    )
+    budget_action = bpy.props.EnumProperty(
+        name="Over budget",
+        items=(
+            ('WARN', "Warn", "Export assets and report exceeded budgets"),
+            ('CANCEL', "Cancel", "Don't write any file if a budget is exceeded"),
+        ),
+        default='WARN',
+    )
+    budget_triangles = bpy.props.IntProperty(
+        name="Max triangles",
+        description="Per model, 0 for no limit",
+        min=0,
+        default=0,
+    )
+    budget_vertices = bpy.props.IntProperty(
+        name="Max vertices",
+        description="Per model, 0 for no limit",
+        min=0,
+        default=0,
+    )
+    budget_bones = bpy.props.IntProperty(
+        name="Max bones",
+        description="Per model, 0 for no limit",
+        min=0,
+        default=0,
+    )
+    budget_actions = bpy.props.IntProperty(
+        name="Max animations",
+        description="Per model, 0 for no limit",
+        min=0,
+        default=0,
+    )
+    budget_keyframes = bpy.props.IntProperty(
+        name="Max keyframes",
+        description="Bone keyframes per model, 0 for no limit",
+        min=0,
+        default=0,
+    )
+    budget_texture_memory = bpy.props.IntProperty(
+        name="Max texture memory (MB)",
+        description="Textures of model with mipmaps, 0 for no limit",
+        min=0,
+        default=0,
+    )
+    budget_file_size = bpy.props.IntProperty(
+        name="Max file size (MB)",
+        description=("Model with its animation files, "
+                     "0 for no limit"),
+        min=0,
+        default=0,
+    )
     write_debug_xml = bpy.props.BoolProperty(
         name='Write debug XML',
         default=True
@@ -91,11 +244,43 @@ class ExportLeadwerks(bpy.types.Operator, ExportHelper):
     )
 
     def execute(self, context):
+        # Export stack (templates, mesh processing, compiler) is loaded
+        # on first export, not when the add-on is registered
+        from .exporter import LeadwerksExporter
+
         kwargs = self.as_keywords()
 
         kwargs.update({
             'context': context,
             'operator': self
         })
+        if self.export_cache_dir:
+            kwargs['export_cache_dir'] = bpy.path.abspath(self.export_cache_dir)
 
         return LeadwerksExporter(**kwargs).export()
+
+
+class ImportLeadwerks(bpy.types.Operator, ImportHelper):
+    bl_idname = "import.mdl"
+    bl_label = "Import Leadwerks"
+    bl_options = {'UNDO'}
+
+    filename_ext = ".mdl"
+    filter_glob = bpy.props.StringProperty(default="*.mdl", options={'HIDDEN'})
+
+    import_animations = bpy.props.BoolProperty(
+        name='Import animations',
+        default=True
+    )
+
+    def execute(self, context):
+        from .importer import LeadwerksImporter
+
+        kwargs = self.as_keywords()
+
+        kwargs.update({
+            'context': context,
+            'operator': self
+        })
+
+        return LeadwerksImporter(**kwargs).import_file()
@@ -1,7 +1,8 @@
 import math
 import bpy
-import bmesh
-from mathutils import Matrix, Vector, Euler
+from mathutils import Matrix, Vector, Euler, Quaternion
+
+from . import triangulation
 
 
 def mget(inp_dict, inp_keys):
@@ -28,6 +29,36 @@ def format_floats_box(floats):
     return ret
 
 
+def calc_aabb(positions):
+    """
+    Bounding box [min, max] of flat list of x,y,z coordinates
+    """
+    coords = list(map(float, positions))
+    if not coords:
+        return None
+    return [
+        [min(coords[i::3]) for i in range(0, 3)],
+        [max(coords[i::3]) for i in range(0, 3)],
+    ]
+
+
+def merge_aabb(a, b):
+    if not a or not b:
+        return a or b
+    return [
+        [min(a[0][i], b[0][i]) for i in range(0, 3)],
+        [max(a[1][i], b[1][i]) for i in range(0, 3)],
+    ]
+
+
+def aabb_corners(aabb):
+    mn, mx = aabb
+    return [
+        Vector((x, y, z))
+        for x in (mn[0], mx[0]) for y in (mn[1], mx[1]) for z in (mn[2], mx[2])
+    ]
+
+
 def join_map(fn, data):
     d = list(map(fn, data))
     return ''.join(d)
@@ -45,27 +76,34 @@ def magick_convert(matrix):
 # 1.5707963267948966 = PI/2
 mtx4_z90 = Matrix.Rotation(1.5707963267948966, 4, 'Z')
 
-def triangulate_mesh(meshable_obj):
+def evaluated_mesh(meshable_obj):
+    """
+    Returns new mesh datablock with modifiers applied,
+    caller has to remove it
+    """
     is_editmode = (meshable_obj.mode == 'EDIT')
     if is_editmode:
         bpy.ops.object.editmode_toggle()
 
-    bm = bmesh.new()
     mesh = meshable_obj.to_mesh(bpy.context.scene, True, 'PREVIEW')
 
-    bm.from_mesh(mesh)
-
-    #bm.from_object(meshable_obj, bpy.context.scene, deform=True, render=False)
-    bmesh.ops.triangulate(bm, faces=bm.faces)
-    bm.to_mesh(mesh)
-    bm.free()
-
-    mesh.update(calc_tessface=True, calc_edges=True)
-
     if is_editmode:
         bpy.ops.object.editmode_toggle()
     return mesh
 
+def triangulate_mesh(meshable_obj):
+    """
+    Returns evaluated mesh and its triangulation.
+    Polygons are triangulated in place of loops, the mesh itself is kept as is
+    """
+    mesh = evaluated_mesh(meshable_obj)
+    triangles = triangulation.triangulate(mesh)
+    if triangles.fallback_polygons:
+        print('Object "%s": %s non-planar polygons triangulated with bmesh' % (
+            meshable_obj.name, triangles.fallback_polygons
+        ))
+    return mesh, triangles
+
 class Scale():
     x = 1.0
     y = 1.0
@@ -133,3 +171,22 @@ def convert_to_lw_matrix(mtx):
 
     return Matrix(ret)
 
+def convert_from_lw_matrix(mtx):
+    """
+    Inverse of convert_to_lw_matrix
+    """
+    rows = [Vector(mtx[i][0:3]) for i in range(0, 3)]
+    lw_scale = [r.length for r in rows]
+    rrot = Matrix([r.normalized() if r.length else r for r in rows]).to_quaternion()
+
+    # Undoing axis swaps of Scale and Rot
+    rscale = Vector((lw_scale[2], lw_scale[0], lw_scale[1]))
+    quat = Quaternion((rrot.y, rrot.x, rrot.z, -rrot.w))
+    pos = Vector((mtx[3][2], -mtx[3][0], mtx[3][1]))
+
+    ret = Matrix.Translation(pos) * quat.to_matrix().to_4x4() * \
+        Matrix.Scale(rscale[0], 4, (1.0, 0.0, 0.0)) * \
+        Matrix.Scale(rscale[1], 4, (0.0, 1.0, 0.0)) * \
+        Matrix.Scale(rscale[2], 4, (0.0, 0.0, 1.0))
+    return ret * Matrix.Rotation(1.5707963267948966*2, 4, 'Z').inverted()
+
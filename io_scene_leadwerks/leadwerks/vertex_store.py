@@ -0,0 +1,103 @@
+"""
+Compact structure-of-arrays storage of mesh vertices.
+
+Every attribute lives in its own flat typed array (4 byte floats,
+single byte bone data), so a vertex costs tens of bytes instead of a
+dict of string lists. Vertices split for texture coordinates are
+appended at the end and remember their source vertex in `original`.
+Bulk operations work on numpy views of the arrays, which must not
+outlive the call, as arrays exporting their buffer can't be resized.
+"""
+from array import array
+
+import numpy
+
+
+ATTRIBUTES = [
+    # name, type code, elements per vertex
+    ('positions', 'f', 3),
+    ('normals', 'f', 3),
+    ('texture_coords', 'f', 2),
+    ('tangents', 'f', 3),
+    ('binormals', 'f', 3),
+    ('bone_indexes', 'B', 4),
+    ('bone_weights', 'B', 4),
+]
+
+DEFAULT_BONE_INDEXES = (1, 1, 1, 1)
+DEFAULT_BONE_WEIGHTS = (255, 0, 0, 0)
+
+
+class VertexStore(object):
+    def __init__(self, count=0, has_texture_coords=False):
+        self.has_texture_coords = has_texture_coords
+        for name, code, elements in ATTRIBUTES:
+            if name in ['texture_coords', 'tangents', 'binormals'] and not has_texture_coords:
+                setattr(self, name, array(code))
+            else:
+                setattr(self, name, array(code, [0]) * (count * elements))
+        self.bone_indexes = array('B', DEFAULT_BONE_INDEXES * count)
+        self.bone_weights = array('B', DEFAULT_BONE_WEIGHTS * count)
+        self.original = array('I', range(0, count))
+
+    def __len__(self):
+        return len(self.original)
+
+    def arrays(self):
+        for name, code, elements in ATTRIBUTES:
+            data = getattr(self, name)
+            if data:
+                yield name, data, elements
+
+    def nbytes(self):
+        ret = self.original.itemsize * len(self.original)
+        for name, data, elements in self.arrays():
+            ret += data.itemsize * len(data)
+        return ret
+
+    def bytes_per_vertex(self):
+        return self.nbytes() / float(len(self) or 1)
+
+    def view(self, name):
+        """
+        Writable numpy view of attribute, elements in a flat row
+        """
+        data = getattr(self, name)
+        if not data:
+            return numpy.zeros(0, dtype=data.typecode)
+        return numpy.frombuffer(data, dtype=data.typecode)
+
+    def negate(self, name):
+        data = self.view(name)
+        numpy.negative(data, out=data)
+
+    def set_bone_data(self, idx, indexes, weights):
+        self.bone_indexes[idx * 4:idx * 4 + 4] = array('B', indexes)
+        self.bone_weights[idx * 4:idx * 4 + 4] = array('B', weights)
+
+    def split(self, idx, texture_coords):
+        """
+        Appends copy of vertex idx with other texture coordinates,
+        returns index of the new vertex
+        """
+        new_idx = len(self)
+        for name, data, elements in self.arrays():
+            start = idx * elements
+            data.extend(data[start:start + elements])
+        self.texture_coords[new_idx * 2:new_idx * 2 + 2] = array('f', texture_coords)
+        self.original.append(self.original[idx])
+        return new_idx
+
+    def gather(self, order):
+        """
+        Returns new store holding vertices listed in order
+        """
+        ret = VertexStore(0, self.has_texture_coords)
+        if not order:
+            return ret
+        idx = numpy.frombuffer(order, dtype=order.typecode)
+        for name, data, elements in self.arrays():
+            rows = self.view(name).reshape(-1, elements)[idx]
+            setattr(ret, name, array(data.typecode, rows.tobytes()))
+        ret.original = array('I', self.view('original')[idx].tobytes())
+        return ret
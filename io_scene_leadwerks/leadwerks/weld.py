@@ -0,0 +1,93 @@
+"""
+Welding of surface vertices whose attributes match within epsilons.
+
+Candidates are looked up in a spatial hash of quantized positions
+(the vertex cell and its neighbours), so the pass stays close to linear
+in the number of vertices.
+"""
+from array import array
+from itertools import product
+
+
+SURFACE_ATTRIBUTES = [
+    # surface key, elements per vertex, epsilon kind
+    ('vertices', 3, 'position'),
+    ('normals', 3, 'normal'),
+    ('texture_coords', 2, 'uv'),
+    ('tangents', 3, 'normal'),
+    ('binormals', 3, 'normal'),
+    ('bone_indexes', 4, None),
+    ('bone_weights', 4, None),
+    ('original', 1, 'any'),
+]
+
+NEIGHBOURS = list(product((-1, 0, 1), repeat=3))
+
+
+def matches(surface, a, b, attributes):
+    for key, elements, eps in attributes:
+        if eps == 'any':
+            continue
+        data = surface[key]
+        for i in range(0, elements):
+            if abs(data[a * elements + i] - data[b * elements + i]) > eps:
+                return False
+    return True
+
+
+def weld_surface(surface, position_epsilon, normal_epsilon, uv_epsilon):
+    """
+    Merges matching vertices of the surface in place,
+    returns vertex count (before, after)
+    """
+    epsilons = {'position': position_epsilon, 'normal': normal_epsilon,
+                'uv': uv_epsilon, None: 0, 'any': 'any'}
+    attributes = [
+        (key, elements, epsilons[eps]) for key, elements, eps in SURFACE_ATTRIBUTES
+        if surface.get(key)
+    ]
+
+    positions = surface['vertices']
+    count = len(positions) // 3
+    cell = position_epsilon * 2 or 1.0
+
+    grid = {}
+    remap = array('I', [0]) * count
+    order = array('I')
+    for v in range(0, count):
+        p = positions[v * 3:v * 3 + 3]
+        base = tuple([int(c // cell) for c in p])
+
+        found = None
+        for offset in NEIGHBOURS if position_epsilon else [(0, 0, 0)]:
+            key = (base[0] + offset[0], base[1] + offset[1], base[2] + offset[2])
+            for candidate in grid.get(key, ()):
+                if matches(surface, v, candidate, attributes):
+                    found = candidate
+                    break
+            if found is not None:
+                break
+
+        if found is None:
+            grid.setdefault(base, []).append(v)
+            remap[v] = len(order)
+            order.append(v)
+        else:
+            remap[v] = remap[found]
+
+    if len(order) < count:
+        for key, elements, eps in attributes:
+            data = surface[key]
+            welded = array(data.typecode)
+            for v in order:
+                welded.extend(data[v * elements:v * elements + elements])
+            surface[key] = welded
+        indices = array('I')
+        old = surface['indices']
+        for t in range(0, len(old) - 2, 3):
+            a, b, c = remap[old[t]], remap[old[t + 1]], remap[old[t + 2]]
+            # Triangles collapsed by the weld are dropped
+            if a != b and b != c and a != c:
+                indices.extend((a, b, c))
+        surface['indices'] = indices
+    return count, len(order)
@@ -5,14 +5,55 @@ It also can compile .xml to .mdl again.
 Usage:
 python3 -m xml_tool whatever.mdl whatever.mod.xml
 python3 -m xml_tool whatever.mod.xml whatever.new.mdl
+python3 -m xml_tool whatever.mdl whatever.json (JSON tree + whatever.npz, needs NumPy)
+python3 -m xml_tool whatever.json whatever.new.mdl
+python3 -m xml_tool diff old.mdl new.mdl [float_tolerance]
+python3 -m xml_tool validate whatever.mdl [more.mdl ...]
 """
 import sys
 import os
 from xml_tool.compiler import MdlCompiler
 from xml_tool.dumper import MdlDumper
+from xml_tool.diff import MdlDiff
+from xml_tool.validator import MdlValidator
+
+
+def diff(args):
+    if len(args) < 2:
+        print('Pass two .mdl files to compare please')
+        sys.exit(1)
+    tolerance = float(args[2]) if len(args) > 2 else 0.0
+    differ = MdlDiff(args[0], args[1], tolerance)
+    differences = differ.compare()
+    for path, msg in differences:
+        print('%s: %s' % (path, msg))
+    differ.close()
+    sys.exit(1 if differences else 0)
+
+
+def validate(args):
+    if not args:
+        print('Pass .mdl files to validate please')
+        sys.exit(1)
+    failed = 0
+    for path in args:
+        errors = MdlValidator(path).validate()
+        if errors:
+            failed += 1
+        for offset, msg in errors:
+            print('%s:%s: %s' % (path, offset, msg))
+    sys.exit(1 if failed else 0)
+
+
+commands = {
+    'diff': diff,
+    'validate': validate,
+}
 
 if __name__ == "__main__":
     args = sys.argv
+    if len(args) > 1 and args[1] in commands:
+        commands[args[1]](args[2:])
     if len(args) < 2:
         print('Pass a .mdl file as parameter please')
         sys.exit(1)
@@ -32,9 +73,19 @@ if __name__ == "__main__":
 
         compiler = MdlCompiler(path, output_path)
         compiler.compile()
+    elif path.endswith('.json'):
+        from xml_tool.npz import MdlNpzCompiler
+        if len(args) > 2:
+            output_path = args[2]
+        else:
+            output_path = '%s.mdl' % path[0:-5]
+
+        MdlNpzCompiler(path, output_path).compile()
+    elif path.endswith('.mdl') and len(args) > 2 and args[2].endswith('.json'):
+        from xml_tool.npz import MdlNpzDumper
+        MdlNpzDumper(path).dump(args[2])
     elif path.endswith('.mdl'):
         dumper = MdlDumper(path)
-        dumper.read()
 
         if len(args) > 2:
             output = args[2]
@@ -42,7 +93,7 @@ if __name__ == "__main__":
             output = '%s.xml' % path
 
         with open(output, 'w') as f:
-            f.write(dumper.as_xml())
+            dumper.dump(f)
     else:
-        print('Please provide .xml or .mdl file as argument')
+        print('Please provide .xml, .json or .mdl file as argument')
         sys.exit(1)
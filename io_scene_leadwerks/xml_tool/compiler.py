@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import binascii
+
 from . import streams
 
 from leadwerks import constants
 import xml.etree.ElementTree as ET
 
 
+# Bump on any change of bytes written for the same XML,
+# files of other versions are not taken from ExportCache
+COMPILER_VERSION = 1
+
+
 class MdlCompiler(object):
     def __init__(self, path_or_xml, output_path):
         if path_or_xml.startswith('<'):
@@ -22,6 +29,7 @@ class MdlCompiler(object):
 
     def compile(self):
         self.compile_node(self.source)
+        self.writer.close()
 
     def compile_node(self, node):
         code = node.attrib.get('code')
@@ -60,6 +68,8 @@ class MdlCompiler(object):
             str(constants.MDL_BONE): self.bone_compiler,
             str(constants.MDL_ANIMATIONKEYS): self.anim_compiler,
             str(constants.MDL_NODE): self.node_compiler,
+            str(constants.MDL_NEWTONCOLLISIONTREE): self.collision_compiler,
+            str(constants.MDL_AABB): self.aabb_compiler,
         }
         return amap.get(code)
 
@@ -216,12 +226,8 @@ class MdlCompiler(object):
 
         sz = ct*64 + 4
         if self.FILE_FORMAT_VERSION == 2:
-            anim_name = self.get_subnode_by_name(node, 'animation_name').text
-            if anim_name:
-                sz += len(anim_name) + 1
-            else:
-                anim_name = ''
-                sz += 2
+            anim_name = self.get_subnode_by_name(node, 'animation_name').text or ''
+            sz += len(anim_name) + 1
 
         self.writer.write_batch(
             'I',
@@ -239,3 +245,33 @@ class MdlCompiler(object):
 
         if self.FILE_FORMAT_VERSION == 2:
             self.writer.write_nt_str(anim_name)
+
+    def collision_compiler(self, node):
+        """
+        Raw serialized Newton tree dumped by MdlDumper
+        """
+        data = binascii.unhexlify(self.get_subnode_by_name(node, 'data').text or '')
+
+        self.writer.write_batch(
+            'I',
+            [
+                constants.MDL_NEWTONCOLLISIONTREE,
+                self.count_subnodes(node),  # kids count
+                len(data),  # block size
+            ]
+        )
+        self.writer.write_bytes(data)
+
+    def aabb_compiler(self, node):
+        bounds = self._parse_list(self.get_subnode_by_name(node, 'min').text, float)
+        bounds.extend(self._parse_list(self.get_subnode_by_name(node, 'max').text, float))
+
+        self.writer.write_batch(
+            'I',
+            [
+                constants.MDL_AABB,
+                self.count_subnodes(node),  # kids count
+                24,  # block size
+            ]
+        )
+        self.writer.write_batch('f', bounds)
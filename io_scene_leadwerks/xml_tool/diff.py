@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Structural diff of two .mdl files.
+
+Every block gets a hash of its own payload and a hash of its whole
+subtree. Trees are compared top-down and only subtrees with different
+hashes are descended into, so identical parts of big models are skipped
+without looking at their data twice.
+Differences are reported by block path like
+MESH[Cube]/SURFACE[2]/VERTEXARRAY[NORMAL] (the FILE root is omitted)
+"""
+import hashlib
+import struct
+
+from leadwerks import constants
+from .reader import MdlFile
+
+
+class MdlDiff(object):
+    def __init__(self, path_a, path_b, tolerance=0.0):
+        self.mdl_a = MdlFile(path_a)
+        self.mdl_b = MdlFile(path_b)
+        self.tolerance = tolerance
+        self.differences = []
+        self._hashes = {}
+
+    def close(self):
+        self.mdl_a.close()
+        self.mdl_b.close()
+
+    def compare(self):
+        """
+        Returns list of (path, message) tuples, empty if files are equal
+        """
+        self.differences = []
+        self._hash_tree(self.mdl_a.root)
+        self._hash_tree(self.mdl_b.root)
+        self.compare_blocks(self.mdl_a.root, self.mdl_b.root, '')
+        return self.differences
+
+    def _hash_tree(self, block):
+        """
+        Computes (payload hash, subtree hash) for block and all descendants
+        """
+        h = hashlib.sha1(struct.pack('<I', block.code))
+        payload_hash = hashlib.sha1(block.payload).digest()
+        h.update(payload_hash)
+        for k in block.kids:
+            h.update(self._hash_tree(k))
+        self._hashes[id(block)] = (payload_hash, h.digest())
+        return h.digest()
+
+    def report(self, path, msg):
+        self.differences.append((path, msg))
+
+    def label(self, block, index=None):
+        key = None
+        if block.code == constants.MDL_VERTEXARRAY:
+            key = block.vertex_array()['data_type_name']
+        elif block.code == constants.MDL_ANIMATIONKEYS:
+            key = block.animation_keys()['animation_name'] or None
+        elif block.code in [constants.MDL_MESH, constants.MDL_NODE, constants.MDL_BONE]:
+            key = block.name_property
+        if key is None:
+            key = index
+        if key is None:
+            return block.name
+        return '%s[%s]' % (block.name, key)
+
+    def label_kids(self, block):
+        """
+        Keyed children of block. Blocks without natural key (surfaces,
+        properties) are keyed by position among siblings of the same type
+        """
+        ret = []
+        seen = {}
+        totals = {}
+        for kid in block.kids:
+            totals[kid.code] = totals.get(kid.code, 0) + 1
+        for kid in block.kids:
+            pos = seen.get(kid.code, 0)
+            seen[kid.code] = pos + 1
+            lbl = self.label(kid, pos if totals[kid.code] > 1 else None)
+            if lbl in [l for l, k in ret]:
+                lbl = '%s#%s' % (lbl, pos)
+            ret.append((lbl, kid))
+        return ret
+
+    def compare_blocks(self, a, b, path):
+        ha = self._hashes[id(a)]
+        hb = self._hashes[id(b)]
+        if ha[1] == hb[1]:
+            return
+
+        path = path or a.name
+        if a.code != b.code:
+            self.report(path, 'block type %s != %s' % (a.name, b.name))
+            return
+
+        if ha[0] != hb[0]:
+            msg = self.compare_payloads(a, b)
+            if msg:
+                self.report(path, msg)
+
+        kids_a = self.label_kids(a)
+        kids_b = dict(self.label_kids(b))
+        for lbl, kid in kids_a:
+            other = kids_b.pop(lbl, None)
+            if other is None:
+                self.report(self.join(path, a, lbl), 'only in first file')
+                continue
+            self.compare_blocks(kid, other, self.join(path, a, lbl))
+
+        for lbl, kid in self.label_kids(b):
+            if lbl in kids_b:
+                self.report(self.join(path, b, lbl), 'only in second file')
+
+    def join(self, path, parent, lbl):
+        if parent.code == constants.MDL_FILE:
+            return lbl
+        return '%s/%s' % (path, lbl)
+
+    def float_ranges(self, block):
+        """
+        Payload byte ranges holding floats, used for tolerant comparison
+        """
+        if block.code in [constants.MDL_MESH, constants.MDL_NODE, constants.MDL_BONE]:
+            return [(0, 64)]
+        if block.code == constants.MDL_VERTEXARRAY:
+            if block.vertex_array()['variable_type'] == constants.MDL_FLOAT:
+                return [(16, block.size)]
+        if block.code == constants.MDL_ANIMATIONKEYS:
+            return [(4, 4 + block.animation_keys()['number_of_frames'] * 64)]
+        if block.code == constants.MDL_AABB:
+            return [(0, 24)]
+        return []
+
+    def compare_payloads(self, a, b):
+        pa = a.payload
+        pb = b.payload
+        if len(pa) != len(pb):
+            return 'payload size %s != %s' % (len(pa), len(pb))
+
+        ranges = self.float_ranges(a)
+        if not self.tolerance or ranges != self.float_ranges(b):
+            return 'payload differs'
+
+        # Bytes outside of float ranges should match exactly
+        pos = 0
+        for start, end in ranges + [(len(pa), len(pa))]:
+            if pa[pos:start] != pb[pos:start]:
+                return 'payload differs'
+            pos = end
+
+        max_delta = 0.0
+        count = 0
+        for start, end in ranges:
+            fa = pa[start:end].cast('f')
+            fb = pb[start:end].cast('f')
+            for va, vb in zip(fa, fb):
+                d = abs(va - vb)
+                if d > self.tolerance:
+                    count += 1
+                    max_delta = max(max_delta, d)
+
+        if count:
+            return '%s values differ by more than %s (max delta %.9f)' % (
+                count, self.tolerance, max_delta
+            )
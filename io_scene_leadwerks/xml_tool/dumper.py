@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
 
 from collections import OrderedDict
-import sys
+import binascii
+import io
+from xml.sax.saxutils import escape, quoteattr
 
 from leadwerks import constants
 from . import streams
-from xml.dom import minidom
 
 
 class MdlDumper(object):
@@ -16,12 +17,32 @@ class MdlDumper(object):
         self.FILE_FORMAT_VERSION = constants.MDL_VERSION
 
     def read(self):
-        self.data = self.read_node()
-        self.reader.close()
+        try:
+            self.data = self.read_node()
+        finally:
+            self.reader.close()
 
-    def read_node(self):
+    def dump(self, stream):
+        """
+        Writes XML into stream block by block as the file is read,
+        so decoded data of the whole file is never held in memory
+        """
+        stream.write('<?xml version="1.0" ?>\n')
+        try:
+            self.write_node(stream, self.read_block(), 0, streaming=True)
+        finally:
+            self.reader.close()
+
+    def read_block(self):
+        """
+        Reads header and payload of a single block without children
+        """
         data, read_fn = self.read_header()
         data.update(read_fn())
+        return data
+
+    def read_node(self):
+        data = self.read_block()
         if data['num_kids']:
             data['blocks'] = []
         for i in range(0, data['num_kids']):
@@ -36,10 +57,10 @@ class MdlDumper(object):
             '_block_size': self.reader.read_int(),
             '_offset': self.reader.cur_pos(),
         })
+        self.block_size = header['_block_size']
         reader = self.get_node_reader(node_code)
         if not reader:
-            print('ERROR! Block reader not found:', node_code)
-            sys.exit(1)
+            raise ValueError('Block reader not found: %s' % node_code)
 
         return header, reader
 
@@ -54,14 +75,16 @@ class MdlDumper(object):
             str(constants.MDL_BONE): self.bone_reader,
             str(constants.MDL_ANIMATIONKEYS): self.anim_reader,
             str(constants.MDL_NODE): self.node_reader,
+            str(constants.MDL_NEWTONCOLLISIONTREE): self.collision_reader,
+            str(constants.MDL_AABB): self.aabb_reader,
         }
         return amap.get(str(node_code))
 
-    def fmt_batch(self, data, modifier='s'):
-        ret = []
-        for d in data:
-            ret.append(format(d, modifier))
-        return ret
+    def fmt_floats(self, data, sep=','):
+        """
+        Formats all floats of a payload with a single formatting operation
+        """
+        return sep.join(['%.9f'] * len(data)) % tuple(data)
 
     def fmt_var_type(self, dt):
         var_type_map = {
@@ -89,7 +112,7 @@ class MdlDumper(object):
     def mesh_reader(self):
         ret = {
             'name': 'MESH',
-            'matrix': self.fmt_batch(self.reader.read_batch('f', 16), '.9f')
+            'matrix': self.reader.read_batch('f', 16)
         }
         return ret
 
@@ -136,10 +159,10 @@ class MdlDumper(object):
             ret['elements_count'] = 4
             mod = 'B'
 
-        ret['data'] = self.fmt_batch(self.reader.read_batch(
+        ret['data'] = self.reader.read_batch(
             mod,
             ret['elements_count'] * ret['number_of_vertices']
-        ), '.9f' if mod == 'f' else 'd')
+        )
         return ret
 
     def indices_reader(self):
@@ -156,7 +179,7 @@ class MdlDumper(object):
     def bone_reader(self):
         ret = {
             'name': 'BONE',
-            'matrix': self.fmt_batch(self.reader.read_batch('f', 16), '.9f'),
+            'matrix': self.reader.read_batch('f', 16),
             'bone_id': self.reader.read_int()
         }
         return ret
@@ -164,10 +187,25 @@ class MdlDumper(object):
     def node_reader(self):
         ret = {
             'name': 'NODE',
-            'matrix': self.fmt_batch(self.reader.read_batch('f', 16), '.9f'),
+            'matrix': self.reader.read_batch('f', 16),
         }
         return ret
 
+    def aabb_reader(self):
+        ret = OrderedDict({'name': 'AABB'})
+        ret['min'] = self.reader.read_batch('f', 3)
+        ret['max'] = self.reader.read_batch('f', 3)
+        return ret
+
+    def collision_reader(self):
+        """
+        Serialized Newton tree is internal to the physics library,
+        payload is kept as hex so it can be compiled back unchanged
+        """
+        ret = OrderedDict({'name': 'NEWTONCOLLISIONTREE'})
+        ret['data'] = binascii.hexlify(self.reader.read_bytes(self.block_size)).decode('ascii')
+        return ret
+
     def anim_reader(self):
         ret = OrderedDict({'name': 'ANIMATIONKEYS'})
         ret['number_of_frames'] = self.reader.read_int()
@@ -175,7 +213,7 @@ class MdlDumper(object):
 
         for i in range(0, ret['number_of_frames']):
             ret['frames'].append(
-                self.fmt_batch(self.reader.read_batch('f', 16), '.9f')
+                self.reader.read_batch('f', 16)
             )
 
         # In version 2 animation name is added
@@ -185,59 +223,90 @@ class MdlDumper(object):
         return ret
 
     def as_xml(self):
-        out = self.__convert_node_to_xml(self.data)
-        doc = minidom.parseString(out)
-        return doc.toprettyxml()
+        out = io.StringIO()
+        out.write('<?xml version="1.0" ?>\n')
+        self.write_node(out, self.data, 0)
+        return out.getvalue()
 
-    def __convert_node_to_xml(self, node):
+    def write_node(self, stream, node, depth, streaming=False):
+        """
+        Writes block with its children in the same layout as
+        minidom.toprettyxml used to produce. In streaming mode children
+        are read from the file right before they are written
+        """
         # list of parameters displayed as xml attributes of block
         attrs = ['name', '_num_kids', '_block_size', '_offset', 'code']
+        indent = '\t' * depth
 
-        out = '<block'
+        out = '%s<block' % indent
         for k in attrs:
             v = node.get(k)
             if v:
-                out = '%s %s="%s"' % (out, k, v)
-        out = '%s>' % out
+                out = '%s %s=%s' % (out, k, quoteattr(str(v)))
+        stream.write('%s>\n' % out)
 
         for k, v in node.items():
             if k == 'blocks' or k in attrs:
                 continue
-
-            if type(v) is list:
-                if not v:
-                    continue
-
-                res = ''
-                if type(v[0]) is dict or type(v[0]) is OrderedDict:
-                    for iv in v:
-                        res = '%s%s' % (res, self.__fmt_kv(iv))
-
-                # animation frames list
-                if type(v[0]) is list:
-                    for l in v:
-                        res = '%s<frame>%s</frame>' % (res, ', '.join(map(str, l)))
-
-                if not res:
-                    res = ','.join(map(str, v))
-                v = res
-            elif type(v) is dict or type(v) is OrderedDict:
-                v = self.__fmt_kv(v)
-            out = '%s<%s>%s</%s>' % (out, k, v, k)
-
-        # recursive calls to add children blocks
-        if node.get('blocks'):
-            out = '%s<subblocks>' % out
-            for n in node['blocks']:
-                out = '%s%s' % (out, self.__convert_node_to_xml(n))
-            out = '%s</subblocks>' % out
-
-        out = '%s</block>' % out
-        return out
-
-    def __fmt_kv(self, v):
+            self.__write_field(stream, k, v, depth + 1)
+
+        if streaming:
+            kids = (self.read_block() for i in range(0, node['num_kids']))
+        else:
+            kids = node.get('blocks') or []
+
+        if node['num_kids']:
+            stream.write('%s\t<subblocks>\n' % indent)
+            for n in kids:
+                self.write_node(stream, n, depth + 2, streaming)
+            stream.write('%s\t</subblocks>\n' % indent)
+
+        stream.write('%s</block>\n' % indent)
+
+    def __write_field(self, stream, k, v, depth):
+        indent = '\t' * depth
+
+        if type(v) is list:
+            if not v:
+                return
+
+            if type(v[0]) is dict or type(v[0]) is OrderedDict:
+                stream.write('%s<%s>\n' % (indent, k))
+                for iv in v:
+                    self.__write_kv(stream, iv, depth + 1)
+                stream.write('%s</%s>\n' % (indent, k))
+                return
+
+            # animation frames list
+            if type(v[0]) is list:
+                stream.write('%s<%s>\n' % (indent, k))
+                for l in v:
+                    self.__write_text(stream, 'frame', self.fmt_floats(l, ', '), depth + 1)
+                stream.write('%s</%s>\n' % (indent, k))
+                return
+
+            if type(v[0]) is float:
+                v = self.fmt_floats(v)
+            else:
+                v = ','.join(map(str, v))
+        elif type(v) is dict or type(v) is OrderedDict:
+            stream.write('%s<%s>\n' % (indent, k))
+            self.__write_kv(stream, v, depth + 1)
+            stream.write('%s</%s>\n' % (indent, k))
+            return
+
+        self.__write_text(stream, k, str(v), depth)
+
+    def __write_text(self, stream, tag, text, depth, attrs=''):
+        indent = '\t' * depth
+        if text:
+            stream.write('%s<%s%s>%s</%s>\n' % (indent, tag, attrs, escape(text, {'"': '&quot;'}), tag))
+        else:
+            stream.write('%s<%s%s/>\n' % (indent, tag, attrs))
+
+    def __write_kv(self, stream, v, depth):
         """
-        Formatting key/value pairs
+        Writing key/value pairs
         """
-        v = '<value means="%s">%s</value>' % (v.get('name', ''), v.get('value', ''))
-        return v
+        means = ' means=%s' % quoteattr(str(v.get('name', '')))
+        self.__write_text(stream, 'value', str(v.get('value', '')), depth, means)
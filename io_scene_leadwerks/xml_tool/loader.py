@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Decoding of .mdl files into plain Python structures for importing.
+
+No Blender modules are used here, so the result can be inspected and
+tested from the command line. Bulk data is returned as typed arrays
+(array.array) ready for foreach_set, strips and fans are expanded to
+triangle lists.
+
+Usage:
+    scene = MdlScene('whatever.mdl').load()
+    for node in scene.nodes:
+        print(node['name'], len(node['surfaces']))
+"""
+from array import array
+
+from leadwerks import constants
+from leadwerks.stripify import strip_to_triangles
+from .reader import MdlFile
+
+
+VERTEX_ARRAY_KEYS = {
+    constants.MDL_POSITION: 'positions',
+    constants.MDL_NORMAL: 'normals',
+    constants.MDL_TEXTURE_COORD: 'texture_coords',
+    constants.MDL_BONEINDICE: 'bone_indexes',
+    constants.MDL_BONEWEIGHT: 'bone_weights',
+}
+
+
+def copy_view(view):
+    """
+    Detaches typed view of the mapped file
+    """
+    ret = array(view.format)
+    ret.frombytes(view.tobytes())
+    return ret
+
+
+def fan_to_triangles(fan):
+    ret = array('I')
+    for i in range(1, len(fan) - 1):
+        ret.extend((fan[0], fan[i], fan[i + 1]))
+    return ret
+
+
+class MdlScene(object):
+    def __init__(self, path):
+        self.path = path
+        self.version = constants.MDL_VERSION
+        self.nodes = []
+
+    def load(self):
+        with MdlFile(self.path) as mdl:
+            self.version = mdl.version
+            self.nodes = [
+                self.convert_node(k) for k in mdl.root.kids
+                if k.code in [constants.MDL_MESH, constants.MDL_NODE]
+            ]
+        return self
+
+    def properties(self, block):
+        ret = {}
+        for props in block.kids_by_code(constants.MDL_PROPERTIES):
+            ret.update(dict(props.properties()))
+        return ret
+
+    def convert_node(self, block):
+        ret = {
+            'type': block.name,
+            'name': self.properties(block).get('name', block.name),
+            'matrix': block.matrix.tolist(),
+            'surfaces': [],
+            'bones': [],
+            'children': [],
+        }
+        for k in block.kids:
+            if k.code == constants.MDL_SURFACE:
+                ret['surfaces'].append(self.convert_surface(k))
+            elif k.code == constants.MDL_BONE:
+                ret['bones'].append(self.convert_bone(k))
+            elif k.code in [constants.MDL_MESH, constants.MDL_NODE]:
+                ret['children'].append(self.convert_node(k))
+        return ret
+
+    def convert_surface(self, block):
+        props = self.properties(block)
+        ret = {
+            'material': props.get('material', ''),
+            'bones': None,
+            'indices': array('I'),
+        }
+        if props.get('bones'):
+            ret['bones'] = list(map(int, props['bones'].split(',')))
+
+        for k in block.kids_by_code(constants.MDL_VERTEXARRAY):
+            va = k.vertex_array()
+            key = VERTEX_ARRAY_KEYS.get(va['data_type'])
+            if key:
+                ret[key] = copy_view(va['data'])
+                va['data'].release()
+
+        for k in block.kids_by_code(constants.MDL_INDICEARRAY):
+            ia = k.indices()
+            data = array('I', ia['data'])
+            ia['data'].release()
+            if ia['primitive_type'] == constants.MDL_TRIANGLE_STRIP:
+                data = strip_to_triangles(data)
+            elif ia['primitive_type'] == constants.MDL_TRIANGLE_FAN:
+                data = fan_to_triangles(data)
+            ret['indices'].extend(data)
+        return ret
+
+    def convert_bone(self, block):
+        ret = {
+            'name': block.name_property,
+            'id': block.bone_id,
+            'matrix': block.matrix.tolist(),
+            'animations': [],
+            'children': [],
+        }
+        for k in block.kids:
+            if k.code == constants.MDL_ANIMATIONKEYS:
+                ak = k.animation_keys()
+                ret['animations'].append((ak['animation_name'], copy_view(ak['frames'])))
+                ak['frames'].release()
+            elif k.code == constants.MDL_BONE:
+                ret['children'].append(self.convert_bone(k))
+        return ret
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Compact intermediate representation of .mdl files for scripting.
+
+The block tree goes into a JSON file, bulk payloads (vertex, index and
+keyframe data) go into a NumPy .npz archive next to it and are referenced
+from the tree by key. Compiling the pair back gives a byte-identical .mdl
+as long as the arrays were not changed; block sizes and counts are
+recomputed from the arrays, so edited data compiles to a consistent file.
+
+Usage:
+python3 -m xml_tool whatever.mdl whatever.json
+python3 -m xml_tool whatever.json whatever.new.mdl
+"""
+import json
+import struct
+
+import numpy
+
+from leadwerks import constants
+from . import streams
+from .reader import MdlFile, vertex_format
+
+
+MATRIX_BLOCKS = [constants.MDL_MESH, constants.MDL_NODE, constants.MDL_BONE]
+
+
+def npz_path(json_path):
+    base = json_path[0:-5] if json_path.endswith('.json') else json_path
+    return '%s.npz' % base
+
+
+class MdlNpzDumper(object):
+    def __init__(self, path):
+        self.path = path
+        self.arrays = {}
+
+    def dump(self, json_path):
+        with MdlFile(self.path) as mdl:
+            self.arrays = {}
+            tree = self.convert_block(mdl.root)
+            numpy.savez(npz_path(json_path), **self.arrays)
+            # Arrays are views of the mapped file and must go before unmapping
+            self.arrays = {}
+
+        with open(json_path, 'w') as f:
+            json.dump(tree, f, indent=1)
+
+    def add_array(self, data, dtype, shape=None):
+        key = 'a%s' % len(self.arrays)
+        arr = numpy.frombuffer(data, dtype=dtype)
+        if shape:
+            arr = arr.reshape(shape)
+        self.arrays[key] = arr
+        return key
+
+    def convert_block(self, block):
+        ret = {'name': block.name, 'code': block.code}
+
+        if block.code == constants.MDL_FILE:
+            ret['version'] = block.version
+        elif block.code in MATRIX_BLOCKS:
+            ret['matrix'] = block.matrix.tolist()
+            if block.code == constants.MDL_BONE:
+                ret['bone_id'] = block.bone_id
+        elif block.code == constants.MDL_PROPERTIES:
+            ret['properties'] = block.properties()
+        elif block.code == constants.MDL_VERTEXARRAY:
+            va = block.vertex_array()
+            mod = va['data'].format
+            ret.update({
+                'data_type': va['data_type'],
+                'data_type_name': va['data_type_name'],
+                'variable_type': va['variable_type'],
+                'data': self.add_array(
+                    va['data'], mod, (va['number_of_vertices'], va['elements_count'])
+                ),
+            })
+        elif block.code == constants.MDL_INDICEARRAY:
+            ia = block.indices()
+            ret.update({
+                'primitive_type': ia['primitive_type'],
+                'variable_type': ia['variable_type'],
+                'data': self.add_array(ia['data'], 'H'),
+            })
+        elif block.code == constants.MDL_ANIMATIONKEYS:
+            ak = block.animation_keys()
+            ret.update({
+                'animation_name': ak['animation_name'],
+                'frames': self.add_array(ak['frames'], 'f', (ak['number_of_frames'], 16)),
+            })
+        elif block.code == constants.MDL_AABB:
+            mn, mx = block.aabb()
+            ret['min'] = mn.tolist()
+            ret['max'] = mx.tolist()
+        elif block.code != constants.MDL_SURFACE:
+            # Blocks without known layout are kept as raw bytes
+            ret['raw'] = self.add_array(block.payload, 'B')
+
+        if block.kids:
+            ret['blocks'] = [self.convert_block(k) for k in block.kids]
+        return ret
+
+
+class MdlNpzCompiler(object):
+    def __init__(self, json_path, output_path):
+        with open(json_path, 'r') as f:
+            self.source = json.load(f)
+        self.arrays = numpy.load(npz_path(json_path))
+
+        self.writer = streams.BinaryStreamWriter(output_path)
+        self.FILE_FORMAT_VERSION = constants.MDL_VERSION
+
+    def compile(self):
+        self.writer.open()
+        self.compile_node(self.source)
+        self.writer.close()
+        self.arrays.close()
+
+    def compile_node(self, node):
+        code = node['code']
+        payload = self.encode_payload(node)
+        kids = node.get('blocks', [])
+        self.writer.write_batch('I', [code, len(kids), len(payload)])
+        self.writer.write_bytes(payload)
+
+        for k in kids:
+            self.compile_node(k)
+
+    def encode_payload(self, node):
+        code = node['code']
+        out = bytearray()
+
+        if code == constants.MDL_FILE:
+            self.FILE_FORMAT_VERSION = node['version']
+            out += struct.pack('<I', node['version'])
+        elif code in MATRIX_BLOCKS:
+            out += numpy.array(node['matrix'], dtype='<f4').tobytes()
+            if code == constants.MDL_BONE:
+                out += struct.pack('<I', node['bone_id'])
+        elif code == constants.MDL_PROPERTIES:
+            out += struct.pack('<I', len(node['properties']))
+            for k, v in node['properties']:
+                out += bytes(k, encoding='ascii') + b'\x00'
+                out += bytes(v, encoding='ascii') + b'\x00'
+        elif code == constants.MDL_VERTEXARRAY:
+            mod, elements = vertex_format(node['data_type'], node['variable_type'])
+            data = self.arrays[node['data']].astype('<%s' % mod).reshape(-1)
+            out += struct.pack(
+                '<4I',
+                len(data) // elements,
+                node['data_type'],
+                node['variable_type'],
+                elements
+            )
+            out += data.tobytes()
+        elif code == constants.MDL_INDICEARRAY:
+            data = self.arrays[node['data']].astype('<u2').reshape(-1)
+            out += struct.pack(
+                '<3I',
+                len(data),
+                node['primitive_type'],
+                node['variable_type']
+            )
+            out += data.tobytes()
+        elif code == constants.MDL_ANIMATIONKEYS:
+            frames = self.arrays[node['frames']].astype('<f4').reshape(-1, 16)
+            out += struct.pack('<I', len(frames))
+            out += frames.tobytes()
+            if self.FILE_FORMAT_VERSION == 2:
+                out += bytes(node.get('animation_name', ''), encoding='ascii') + b'\x00'
+        elif code == constants.MDL_AABB:
+            out += numpy.array(node['min'] + node['max'], dtype='<f4').tobytes()
+        elif 'raw' in node:
+            out += self.arrays[node['raw']].tobytes()
+
+        return bytes(out)
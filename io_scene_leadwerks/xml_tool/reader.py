@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy, memory-mapped access to .mdl files.
+
+Unlike MdlDumper, which decodes (and formats) every block up front,
+MdlFile only walks the block headers once to build an index. Payloads
+are exposed as zero-copy memoryview slices of the mapped file and are
+decoded only when a caller asks for them, so querying bone names or a
+single surface of a huge model costs almost nothing.
+
+Usage:
+    with MdlFile('whatever.mdl') as mdl:
+        for bone in mdl.find_all(constants.MDL_BONE):
+            print(bone.bone_id, bone.name_property)
+
+Typed views can be wrapped into NumPy arrays without copying, e.g.
+numpy.frombuffer(block.vertex_array()['data'], dtype='f4')
+"""
+import mmap
+import struct
+
+from leadwerks import constants
+
+
+BLOCK_NAMES = {
+    constants.MDL_FILE: 'FILE',
+    constants.MDL_NODE: 'NODE',
+    constants.MDL_MESH: 'MESH',
+    constants.MDL_BONE: 'BONE',
+    constants.MDL_VERTEXARRAY: 'VERTEXARRAY',
+    constants.MDL_INDICEARRAY: 'INDICEARRAY',
+    constants.MDL_PROPERTIES: 'PROPERTIES',
+    constants.MDL_ANIMATIONKEYS: 'ANIMATIONKEYS',
+    constants.MDL_AABB: 'AABB',
+    constants.MDL_SURFACE: 'SURFACE',
+    constants.MDL_NEWTONCOLLISIONTREE: 'NEWTONCOLLISIONTREE',
+}
+
+DATA_TYPE_NAMES = {
+    constants.MDL_POSITION: 'POSITION',
+    constants.MDL_NORMAL: 'NORMAL',
+    constants.MDL_TEXTURE_COORD: 'TEXTURE_COORD',
+    constants.MDL_COLOR: 'COLOR',
+    constants.MDL_TANGENT: 'TANGENT',
+    constants.MDL_BINORMAL: 'BINORMAL',
+    constants.MDL_BONEINDICE: 'BONEINDICE',
+    constants.MDL_BONEWEIGHT: 'BONEWEIGHT',
+}
+
+HEADER = struct.Struct('<3I')
+
+
+def vertex_format(data_type, variable_type):
+    """
+    Returns (struct format character, elements per vertex) for the
+    given vertex array description. Mirrors MdlDumper.vertex_array_reader
+    """
+    if data_type in [constants.MDL_COLOR, constants.MDL_BONEINDICE,
+                     constants.MDL_BONEWEIGHT]:
+        return 'B', 4
+    mod = 'f' if variable_type == constants.MDL_FLOAT else 'H'
+    return mod, 2 if data_type == constants.MDL_TEXTURE_COORD else 3
+
+
+class MdlBlock(object):
+    """
+    Index entry of a single block. Only the header is decoded, the
+    payload is a view into the mapped file
+    """
+    __slots__ = ('mdl', 'code', 'num_kids', 'size', 'offset', 'kids', 'parent')
+
+    def __init__(self, mdl, code, num_kids, size, offset, parent=None):
+        self.mdl = mdl
+        self.code = code
+        self.num_kids = num_kids
+        self.size = size
+        # Offset of the payload (right after the 12 byte header)
+        self.offset = offset
+        self.kids = []
+        self.parent = parent
+
+    def __repr__(self):
+        return '<MdlBlock %s kids=%s size=%s offset=%s>' % (
+            self.name, self.num_kids, self.size, self.offset
+        )
+
+    @property
+    def name(self):
+        return BLOCK_NAMES.get(self.code, 'UNKNOWN')
+
+    @property
+    def payload(self):
+        return self.mdl.view[self.offset:self.offset + self.size]
+
+    def _ints(self, ct, pos=0):
+        return struct.unpack_from('<%sI' % ct, self.mdl.view, self.offset + pos)
+
+    def _cast(self, mod, ct, pos=0):
+        start = self.offset + pos
+        end = start + ct * struct.calcsize(mod)
+        return self.mdl.view[start:end].cast(mod)
+
+    def kids_by_code(self, code):
+        return [k for k in self.kids if k.code == code]
+
+    @property
+    def matrix(self):
+        """
+        16 floats of MESH, NODE and BONE blocks
+        """
+        return self._cast('f', 16)
+
+    @property
+    def bone_id(self):
+        return self._ints(1, 64)[0]
+
+    @property
+    def version(self):
+        return self._ints(1)[0]
+
+    def properties(self):
+        """
+        Decodes PROPERTIES block into list of [key, value] pairs
+        """
+        view = self.mdl.view
+        count = self._ints(1)[0]
+        pos = self.offset + 4
+        ret = []
+        for i in range(0, count * 2):
+            end = self.mdl.mm.find(b'\x00', pos)
+            ret.append(bytes(view[pos:end]).decode('ascii'))
+            pos = end + 1
+        return [ret[i:i + 2] for i in range(0, len(ret), 2)]
+
+    @property
+    def name_property(self):
+        """
+        Value of the 'name' property of MESH, NODE or BONE block
+        """
+        for props in self.kids_by_code(constants.MDL_PROPERTIES):
+            for k, v in props.properties():
+                if k == 'name':
+                    return v
+
+    def vertex_array(self):
+        count, data_type, var_type, elements = self._ints(4)
+        mod, elements = vertex_format(data_type, var_type)
+        return {
+            'number_of_vertices': count,
+            'data_type': data_type,
+            'data_type_name': DATA_TYPE_NAMES.get(data_type, 'UNKNOWN'),
+            'variable_type': var_type,
+            'elements_count': elements,
+            'data': self._cast(mod, count * elements, 16),
+        }
+
+    def indices(self):
+        count, primitive_type, var_type = self._ints(3)
+        return {
+            'number_of_indexes': count,
+            'primitive_type': primitive_type,
+            'variable_type': var_type,
+            'data': self._cast('H', count, 12),
+        }
+
+    def aabb(self):
+        """
+        Returns (min, max) float views of AABB block
+        """
+        bounds = self._cast('f', 6)
+        return bounds[0:3], bounds[3:6]
+
+    def animation_keys(self):
+        """
+        Frames are returned as flat float view (16 floats per frame)
+        """
+        count = self._ints(1)[0]
+        ret = {
+            'number_of_frames': count,
+            'frames': self._cast('f', count * 16, 4),
+            'animation_name': '',
+        }
+        if self.mdl.version == 2:
+            pos = self.offset + 4 + count * 64
+            end = self.mdl.mm.find(b'\x00', pos)
+            ret['animation_name'] = bytes(self.mdl.view[pos:end]).decode('ascii')
+        return ret
+
+
+class MdlFile(object):
+    """
+    Memory-mapped .mdl file with lazily decoded blocks
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+        self.version = constants.MDL_VERSION
+        self.root = None
+        self.blocks = []
+        self.build_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the file. All views handed out before must be released
+        """
+        self.view.release()
+        self.mm.close()
+        self._file.close()
+
+    def build_index(self):
+        self.blocks = []
+        self.root, end = self._index_block(0, None)
+        if self.root.code == constants.MDL_FILE:
+            self.version = self.root.version
+
+    def _index_block(self, pos, parent):
+        code, num_kids, size = HEADER.unpack_from(self.mm, pos)
+        block = MdlBlock(self, code, num_kids, size, pos + HEADER.size, parent)
+        self.blocks.append(block)
+        pos = block.offset + size
+        for i in range(0, num_kids):
+            kid, pos = self._index_block(pos, block)
+            block.kids.append(kid)
+        return block, pos
+
+    def find_all(self, code):
+        return [b for b in self.blocks if b.code == code]
+
+    def meshes(self):
+        return self.find_all(constants.MDL_MESH)
+
+    def surfaces(self):
+        return self.find_all(constants.MDL_SURFACE)
+
+    def bone_names(self):
+        return [b.name_property for b in self.find_all(constants.MDL_BONE)]
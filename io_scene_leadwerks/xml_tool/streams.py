@@ -70,6 +70,9 @@ class BinaryStreamReader(BinaryStream):
         ret = self.read_str()
         return ret
 
+    def read_bytes(self, ct):
+        return self.stream.read(ct)
+
     def read_batch(self, *args, **kwargs):
         return self.__reader(*args, **kwargs)
 
@@ -99,3 +102,6 @@ class BinaryStreamWriter(BinaryStream):
     def write_batch(self, modifier, elements_list):
         mod = '%s%s' % (len(elements_list), modifier)
         self.stream.write(pack(mod, *elements_list))
+
+    def write_bytes(self, data):
+        self.stream.write(data)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Single pass structural validator for .mdl files.
+
+The file is streamed once with constant memory: headers are read, bulk
+payloads are either skipped with seek or scanned in fixed size chunks
+(index arrays). Validation goes on after an error whenever the block
+sizes allow it, so all problems are reported in one run.
+"""
+import os
+import struct
+from array import array
+
+from leadwerks import constants
+from .reader import BLOCK_NAMES, DATA_TYPE_NAMES, HEADER, vertex_format
+
+
+INDEX_CHUNK = 65536
+
+
+class MdlValidator(object):
+    def __init__(self, path):
+        self.path = path
+        self.errors = []
+        self.FILE_FORMAT_VERSION = constants.MDL_VERSION
+        self.file_size = os.path.getsize(path)
+        self.stream = None
+
+    def validate(self):
+        """
+        Returns list of (offset, message) tuples, empty for a valid file
+        """
+        self.errors = []
+        with open(self.path, 'rb') as self.stream:
+            if self.validate_block(None) is not None:
+                pos = self.stream.tell()
+                if pos < self.file_size:
+                    self.error(pos, '%s trailing bytes after the root block' % (
+                        self.file_size - pos
+                    ))
+        return self.errors
+
+    def error(self, offset, msg):
+        self.errors.append((offset, msg))
+
+    def read(self, fmt):
+        sz = struct.calcsize(fmt)
+        data = self.stream.read(sz)
+        if len(data) < sz:
+            raise EOFError()
+        return struct.unpack(fmt, data)
+
+    def read_nt_str(self, limit):
+        """
+        Reads null terminated string not going beyond limit offset
+        """
+        ret = b''
+        while self.stream.tell() < limit:
+            c = self.stream.read(1)
+            if c == b'\x00':
+                return ret.decode('ascii', 'replace')
+            ret += c
+        raise EOFError()
+
+    def validate_block(self, surface):
+        """
+        Validates block at current position and all its children.
+        Returns the block code or None if the file ended prematurely
+        """
+        offset = self.stream.tell()
+        header = self.stream.read(HEADER.size)
+        if len(header) < HEADER.size:
+            self.error(offset, 'unexpected end of file, block header expected')
+            return None
+
+        code, num_kids, size = HEADER.unpack(header)
+        start = offset + HEADER.size
+        end = start + size
+        name = BLOCK_NAMES.get(code)
+
+        if end > self.file_size:
+            self.error(offset, '%s payload of %s bytes runs past end of file' % (
+                name or 'block', size
+            ))
+            return None
+
+        if name is None:
+            self.error(offset, 'unknown block code %s' % code)
+        else:
+            checker = getattr(self, 'check_%s' % name.lower(), None)
+            try:
+                used = checker(offset, size, surface) if checker else size
+            except EOFError:
+                used = None
+                self.error(offset, '%s payload is truncated' % name)
+            if used is not None and used != size:
+                self.error(offset, '%s _block_size is %s but payload takes %s bytes' % (
+                    name, size, used
+                ))
+
+        self.stream.seek(end)
+
+        kids_surface = {'offset': offset, 'arrays': [], 'indices': []}
+        for i in range(0, num_kids):
+            if self.validate_block(kids_surface) is None:
+                self.error(offset, '%s num_kids is %s but only %s children found' % (
+                    name or 'block', num_kids, i
+                ))
+                return None
+
+        if code == constants.MDL_SURFACE:
+            self.check_surface_consistency(kids_surface)
+        return code
+
+    def check_file(self, offset, size, surface):
+        self.FILE_FORMAT_VERSION = self.read('<I')[0]
+        if self.FILE_FORMAT_VERSION not in [1, 2]:
+            self.error(offset, 'unsupported file version %s' % self.FILE_FORMAT_VERSION)
+        return 4
+
+    def check_mesh(self, offset, size, surface):
+        return 64
+
+    def check_node(self, offset, size, surface):
+        return 64
+
+    def check_bone(self, offset, size, surface):
+        return 68
+
+    def check_surface(self, offset, size, surface):
+        return 0
+
+    def check_aabb(self, offset, size, surface):
+        bounds = self.read('<6f')
+        if any([bounds[i] > bounds[i + 3] for i in range(0, 3)]):
+            self.error(offset, 'AABB min is greater than max')
+        return 24
+
+    def check_properties(self, offset, size, surface):
+        limit = offset + HEADER.size + size
+        count = self.read('<I')[0]
+        for i in range(0, count * 2):
+            self.read_nt_str(limit)
+        return self.stream.tell() - offset - HEADER.size
+
+    def check_vertexarray(self, offset, size, surface):
+        count, data_type, var_type, elements = self.read('<4I')
+        mod, expected = vertex_format(data_type, var_type)
+        if data_type not in DATA_TYPE_NAMES:
+            self.error(offset, 'unknown vertex data type %s' % data_type)
+        if elements != expected:
+            self.error(offset, 'VERTEXARRAY elements_count is %s, %s expected' % (
+                elements, expected
+            ))
+        if surface is not None:
+            surface['arrays'].append((offset, data_type, count))
+        return 16 + count * expected * struct.calcsize(mod)
+
+    def check_indicearray(self, offset, size, surface):
+        count, primitive_type, var_type = self.read('<3I')
+        if primitive_type == constants.MDL_TRIANGLES and count % 3:
+            self.error(offset, '%s indexes do not form whole triangles' % count)
+        elif primitive_type == constants.MDL_TRIANGLE_STRIP and 0 < count < 3:
+            self.error(offset, '%s indexes do not form a triangle strip' % count)
+
+        used = 12 + count * 2
+        if used > size:
+            return used
+
+        max_index = -1
+        left = count
+        while left:
+            chunk = array('H')
+            chunk.fromfile(self.stream, min(left, INDEX_CHUNK))
+            max_index = max(max_index, max(chunk))
+            left -= len(chunk)
+
+        if surface is not None:
+            surface['indices'].append((offset, max_index))
+        return used
+
+    def check_animationkeys(self, offset, size, surface):
+        count = self.read('<I')[0]
+        used = 4 + count * 64
+        if self.FILE_FORMAT_VERSION == 2 and used < size:
+            self.stream.seek(offset + HEADER.size + used)
+            name = self.read_nt_str(offset + HEADER.size + size)
+            used += len(name) + 1
+        return used
+
+    def check_surface_consistency(self, surface):
+        offset = surface['offset']
+        counts = set([c for o, t, c in surface['arrays']])
+        if len(counts) > 1:
+            self.error(offset, 'SURFACE vertex arrays differ in length: %s' % (
+                ', '.join(['%s=%s' % (DATA_TYPE_NAMES.get(t, t), c)
+                           for o, t, c in surface['arrays']])
+            ))
+
+        types = [t for o, t, c in surface['arrays']]
+        if constants.MDL_POSITION not in types:
+            self.error(offset, 'SURFACE has no POSITION vertex array')
+            return
+
+        vertex_count = min(counts)
+        for idx_offset, max_index in surface['indices']:
+            if max_index >= vertex_count:
+                self.error(idx_offset, 'index %s out of range of %s vertices' % (
+                    max_index, vertex_count
+                ))
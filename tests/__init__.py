@@ -0,0 +1,13 @@
+"""
+Tests run outside of Blender, modules using bpy are imported with
+stubs of it.
+Run with python -m pytest or python -m unittest from the repository root
+"""
+import os
+import sys
+
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'io_scene_leadwerks'
+))
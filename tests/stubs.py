@@ -0,0 +1,41 @@
+"""
+Imports of add-on modules using bpy, with Blender modules and templates
+(vendored Jinja2 doesn't run on recent Python) stubbed.
+Matrices are numpy arrays
+"""
+import sys
+import types
+from unittest import mock
+
+import numpy
+
+
+def render(template, context):
+    """
+    Nesting of rendered blocks as N(name...), M(name...) or B(name...)
+    """
+    if template == 'PROPERTIES':
+        return context['props'][0][1]
+    return '%s(%s%s%s)' % (
+        template[0], context['props'], context.get('bones', ''), context['childs']
+    )
+
+
+def import_modules():
+    mathutils = mock.MagicMock()
+    mathutils.Matrix.side_effect = lambda rows: numpy.array(rows, dtype=float)
+    mathutils.Matrix.Rotation.return_value = numpy.identity(4)
+    templates = types.ModuleType('leadwerks.templates')
+    templates.render = render
+    stubs = {
+        'bpy': mock.MagicMock(),
+        'bmesh': mock.MagicMock(),
+        'mathutils': mathutils,
+        'leadwerks.templates': templates,
+    }
+    with mock.patch.dict(sys.modules, stubs):
+        from leadwerks import exporter, armature
+    return exporter, armature
+
+
+exporter, armature = import_modules()
@@ -0,0 +1,63 @@
+import io
+import types
+import unittest
+from unittest import mock
+
+from leadwerks.config import ExportOptions
+
+from .stubs import armature
+
+
+def action(name, bones=('Spine',), markers=()):
+    return types.SimpleNamespace(
+        name=name,
+        pose_markers=[types.SimpleNamespace(name=m) for m in markers],
+        fcurves=[
+            types.SimpleNamespace(data_path='pose.bones["%s"].location' % b)
+            for b in bones
+        ],
+    )
+
+
+class NeededActionsTest(unittest.TestCase):
+    def needed(self, actions, active=None, **options):
+        arm = armature.Armature.__new__(armature.Armature)
+        arm.blender_data = types.SimpleNamespace(name='Armature')
+        arm.config = ExportOptions(options)
+        arm.bone_slots = {'Spine': 0}
+
+        bpy = mock.MagicMock()
+        bpy.data.actions.values.return_value = actions
+        bpy.context.area.spaces.active.action = active
+        out = io.StringIO()
+        with mock.patch.object(armature, 'bpy', bpy), mock.patch('sys.stdout', out):
+            names = [a.name for a in arm._Armature__get_needed_actions()]
+        return names, out.getvalue()
+
+    def test_all_actions_filtered(self):
+        actions = [action('lw_walk'), action('run'), action('lw_other', bones=['Tail'])]
+        names, log = self.needed(actions, export_all_actions=True, action_name_prefix='lw_')
+        self.assertEqual(names, ['lw_walk'])
+        self.assertIn('action "run" skipped, name does not start with "lw_"', log)
+        self.assertIn('action "lw_other" skipped, no bones of the armature animated', log)
+
+    def test_active_action(self):
+        walk = action('walk', markers=['export'])
+        names, log = self.needed([action('run'), walk], walk, action_marker='export')
+        self.assertEqual((names, log), (['walk'], ''))
+
+    def test_active_action_skipped(self):
+        run = action('run')
+        actions = [run, action('jump', bones=['Tail']), action('walk', markers=['export'])]
+        names, log = self.needed(actions, run, action_marker='export')
+        self.assertEqual(names, ['walk'])
+        self.assertIn('Armature "Armature": action "run" skipped, no "export" pose marker', log)
+
+    def test_nothing_left(self):
+        run = action('run')
+        self.assertEqual(self.needed([run], run, action_marker='export')[0], [])
+        self.assertEqual(self.needed([])[0], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import random
+import unittest
+from array import array
+
+from leadwerks import bone_palette
+
+
+def skinned_surface(triangles, bones, seed=5):
+    """
+    Triangles of 3 own vertices, each weighted to 1-2 random bones
+    """
+    rnd = random.Random(seed)
+    surface = {
+        'vertices': array('f'),
+        'bone_indexes': array('B'),
+        'bone_weights': array('B'),
+        'original': array('I'),
+        'indices': array('I'),
+    }
+    for t in range(0, triangles):
+        for k in range(0, 3):
+            v = t * 3 + k
+            influences = rnd.sample(range(0, bones), rnd.randint(1, 2))
+            surface['vertices'].extend((float(v), float(t), 0.0))
+            surface['bone_indexes'].extend(influences + [0] * (4 - len(influences)))
+            surface['bone_weights'].extend([255 // len(influences)] * len(influences) +
+                                           [0] * (4 - len(influences)))
+            surface['original'].append(v)
+            surface['indices'].append(v)
+    return surface
+
+
+def triangle_influences(surface, palette=None):
+    """
+    Sorted (original vertices, (bone, weight) pairs) of every triangle,
+    bones resolved through the palette
+    """
+    ret = []
+    indices = surface['indices']
+    for t in range(0, len(indices), 3):
+        tri = []
+        for v in indices[t:t + 3]:
+            pairs = []
+            for i in range(v * 4, v * 4 + 4):
+                w = surface['bone_weights'][i]
+                if w:
+                    idx = surface['bone_indexes'][i]
+                    pairs.append((palette[idx] if palette else idx, w))
+            tri.append((surface['original'][v], tuple(sorted(pairs))))
+        ret.append(tuple(tri))
+    return sorted(ret)
+
+
+class BonePaletteTest(unittest.TestCase):
+    def test_within_budget(self):
+        surface = skinned_surface(20, 6)
+        self.assertEqual(bone_palette.partition_surface(surface, 6), [surface])
+
+    def test_partitions(self):
+        surface = skinned_surface(200, 24)
+        expected = triangle_influences(surface)
+        for max_bones in [6, 8, 12]:
+            parts = bone_palette.partition_surface(surface, max_bones)
+            self.assertGreater(len(parts), 1)
+            self.assertEqual(bone_palette.over_budget(parts, max_bones), [])
+
+            found = []
+            for p in parts:
+                palette = p['bones']
+                self.assertLessEqual(len(palette), max_bones)
+                self.assertEqual(len(set(palette)), len(palette))
+                count = len(p['vertices']) // 3
+                self.assertEqual(len(p['bone_indexes']), count * 4)
+                self.assertTrue(all([i < count for i in p['indices']]))
+                self.assertTrue(all([i < len(palette) for i in p['bone_indexes']]))
+                found.extend(triangle_influences(p, palette))
+            self.assertEqual(sorted(found), expected)
+
+    def test_group_over_budget(self):
+        surface = skinned_surface(10, 2)
+        # Triangle weighted to 6 bones can't be split
+        for v in range(0, 3):
+            surface['bone_indexes'][v * 4:v * 4 + 4] = array('B', [2 + v, 3 + v, 0, 1])
+            surface['bone_weights'][v * 4:v * 4 + 4] = array('B', [64, 64, 64, 63])
+
+        parts = bone_palette.partition_surface(surface, 4)
+        over = bone_palette.over_budget(parts, 4)
+        self.assertEqual(len(over), 1)
+        self.assertEqual(over[0]['bones'], [0, 1, 2, 3, 4, 5])
+        self.assertEqual(len(over[0]['indices']), 3)
+        self.assertEqual(sum([len(p['indices']) for p in parts]), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from leadwerks.config import CONFIG, DEFAULTS, ExportOptions
+
+
+class ExportOptionsTest(unittest.TestCase):
+    def test_defaults(self):
+        options = ExportOptions({'export_aabb': True})
+        self.assertTrue(options.export_aabb)
+        self.assertEqual(options.texture_format, DEFAULTS['texture_format'])
+        self.assertEqual(sorted(options.values().keys()), sorted(DEFAULTS.keys()))
+
+    def test_read_only(self):
+        options = ExportOptions()
+        with self.assertRaises(AttributeError):
+            options.export_aabb = True
+        with self.assertRaises(TypeError):
+            DEFAULTS['export_aabb'] = True
+
+    def test_config_update_is_isolated(self):
+        before = CONFIG.values()
+        try:
+            CONFIG.update({'texture_format': 'tex'})
+            self.assertEqual(ExportOptions().texture_format, DEFAULTS['texture_format'])
+        finally:
+            CONFIG.update(before)
+
+    def test_gmf_version(self):
+        self.assertEqual(ExportOptions({'file_extension': '.gmf'}).file_version, 1)
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from leadwerks.export_cache import ExportCache
+
+
+class ExportCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, 'cache')
+        self.cache = ExportCache(self.cache_dir, 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, size):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+
+    def store(self, key, size, mtime):
+        self.cache.store(key, self.write('%s.mdl' % key, size))
+        os.utime(self.cache.entry_path(key, '.mdl'), (mtime, mtime))
+
+    def test_key(self):
+        self.assertEqual(self.cache.make_key('a', 1, b'\x00'), self.cache.make_key('a', 1, b'\x00'))
+        self.assertNotEqual(self.cache.make_key('a', 1), self.cache.make_key('a', 2))
+        # Parts are separated, not concatenated
+        self.assertNotEqual(self.cache.make_key('ab', 'c'), self.cache.make_key('a', 'bc'))
+
+    def test_fetch(self):
+        key = self.cache.make_key('a')
+        out_path = os.path.join(self.dir, 'out.mdl')
+        self.assertFalse(self.cache.fetch(key, out_path))
+        self.cache.store(key, self.write('a.mdl', 10))
+        self.assertTrue(self.cache.fetch(key, out_path))
+        self.assertEqual(os.path.getsize(out_path), 10)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_size_is_tracked(self):
+        self.store('aa', 100, 1)
+        self.store('bb', 200, 2)
+        self.assertEqual(self.cache.size, 300)
+        self.assertEqual(self.cache.evicted, 0)
+
+    def test_evicts_least_recently_used(self):
+        for i, key in enumerate(['aa', 'bb', 'cc', 'dd']):
+            self.store(key, 300, 100 - i if key == 'aa' else 10 + i)
+        # 'aa' is used last, 'bb' is the oldest one
+        self.assertEqual(self.cache.evicted, 1)
+        self.assertLessEqual(self.cache.size, 1000)
+        for key in ['aa', 'cc', 'dd']:
+            self.assertTrue(os.path.exists(self.cache.entry_path(key, '.mdl')))
+        self.assertFalse(os.path.exists(self.cache.entry_path('bb', '.mdl')))
+
+    def test_evicts_below_limit(self):
+        for i in range(0, 12):
+            self.store('%02d' % i, 100, i)
+        self.assertLessEqual(self.cache.size, 1000)
+        self.assertEqual(
+            self.cache.size,
+            sum([size for mtime, size, path in self.cache.entries()])
+        )
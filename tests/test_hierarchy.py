@@ -0,0 +1,119 @@
+import sys
+import types
+import unittest
+from unittest import mock
+
+import numpy
+
+from .stubs import exporter, armature
+
+
+DEPTH = 1500
+
+
+def chain(depth, make):
+    root = item = make(0)
+    for i in range(1, depth):
+        child = make(i)
+        item.children.append(child)
+        item = child
+    return root
+
+
+class FormatTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.assertGreater(DEPTH, sys.getrecursionlimit())
+        self.exporter = exporter.LeadwerksExporter()
+        patcher = mock.patch.object(
+            exporter.utils, 'convert_to_lw_matrix', return_value=numpy.identity(4)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def node(self, name, children=None):
+        return {
+            'type': 'NODE',
+            'object': types.SimpleNamespace(
+                name=name, matrix_world=numpy.identity(4), matrix_local=numpy.identity(4)
+            ),
+            'parent': None,
+            'children': children or [],
+        }
+
+    def test_order(self):
+        tree = self.node('root', [
+            self.node('a', [self.node('a1'), self.node('a2')]),
+            self.node('b'),
+        ])
+        self.assertEqual(
+            self.exporter.format_block(tree), 'N(rootN(aN(a1)N(a2))N(b))'
+        )
+
+    def test_deep_nodes(self):
+        root = self.node('n0')
+        item = root
+        for i in range(1, DEPTH):
+            child = self.node('n%s' % i)
+            child['parent'] = item['object']
+            item['children'].append(child)
+            item = child
+
+        out = self.exporter.format_block(root)
+        expected = ''.join(['N(n%s' % i for i in range(DEPTH)]) + ')' * DEPTH
+        self.assertEqual(out, expected)
+
+    def test_deep_bones(self):
+        def make(i):
+            bone = armature.Bone()
+            bone.name = 'b%s' % i
+            bone.index = i
+            return bone
+
+        mesh = types.SimpleNamespace(
+            name='Body', armature=types.SimpleNamespace(bones=[chain(DEPTH, make)])
+        )
+        out = self.exporter.format_animation_mesh(mesh)
+        expected = 'M(Body%s)' % (''.join(['B(b%s' % i for i in range(DEPTH)]) + ')' * DEPTH)
+        self.assertEqual(out, expected)
+
+
+class ParseBonesTest(unittest.TestCase):
+    def test_deep_chain(self):
+        def make(i):
+            return types.SimpleNamespace(name='b%s' % i, children=[])
+
+        root = chain(DEPTH, make)
+        arm = armature.Armature.__new__(armature.Armature)
+        arm.current_bone_index = 1
+        arm._name_map = {}
+        arm._anims_map = {}
+        arm._Armature__needs_export = ['b%s' % i for i in range(DEPTH)]
+
+        bones = arm.parse_bones([root])
+        indexes = []
+        while bones:
+            indexes.append((bones[0].name, bones[0].index))
+            bones = bones[0].children
+        self.assertEqual(indexes, [('b%s' % i, i + 1) for i in range(DEPTH)])
+        self.assertEqual(len(arm.get_bones_map()), DEPTH)
+
+    def test_depth_first_indexes(self):
+        def bone(name, children=()):
+            return types.SimpleNamespace(name=name, children=list(children))
+
+        arm = armature.Armature.__new__(armature.Armature)
+        arm.current_bone_index = 1
+        arm._name_map = {}
+        arm._anims_map = {}
+        arm._Armature__needs_export = ['a', 'a1', 'a2', 'b']
+
+        bones = arm.parse_bones([
+            bone('a', [bone('a1'), bone('skipped', [bone('a3')]), bone('a2')]),
+            bone('b'),
+        ])
+        self.assertEqual([(b.name, b.index) for b in bones], [('a', 1), ('b', 4)])
+        self.assertEqual([(b.name, b.index) for b in bones[0].children], [('a1', 2), ('a2', 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
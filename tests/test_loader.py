@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from leadwerks import constants
+from xml_tool.compiler import MdlCompiler
+from xml_tool.loader import MdlScene
+
+
+IDENTITY = '1,0,0,0,0,1,0,0,0,0,1,0,0,0,0,1'
+MOVED = '1,0,0,0,0,1,0,0,0,0,1,0,2,3,4,1'
+
+POSITIONS = [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0]
+NORMALS = [0.0, 0.0, 1.0] * 4
+TEXTURE_COORDS = [0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 1.0]
+BONE_INDEXES = [0, 1, 0, 0] * 4
+BONE_WEIGHTS = [200, 55, 0, 0] * 4
+
+
+def block(code, content, kids=()):
+    return '<block code="%s">%s<subblocks>%s</subblocks></block>' % (
+        code, content, ''.join(kids)
+    )
+
+
+def props(values):
+    return block(constants.MDL_PROPERTIES, '<properties>%s</properties>' % ''.join([
+        '<value means="%s">%s</value>' % (k, v) for k, v in values
+    ]))
+
+
+def vertex_array(data_type, variable_type, elements, data):
+    return block(constants.MDL_VERTEXARRAY, (
+        '<number_of_vertices>%s</number_of_vertices>'
+        '<data_type><value>%s</value></data_type>'
+        '<variable_type><value>%s</value></variable_type>'
+        '<data>%s</data>'
+    ) % (len(data) // elements, data_type, variable_type, ','.join(map(str, data))))
+
+
+def surface(material, indices, primitive_type, palette=None):
+    values = [['material', material]]
+    if palette:
+        values.append(['bones', ','.join(map(str, palette))])
+    return block(constants.MDL_SURFACE, '', [
+        props(values),
+        vertex_array(constants.MDL_POSITION, constants.MDL_FLOAT, 3, POSITIONS),
+        vertex_array(constants.MDL_NORMAL, constants.MDL_FLOAT, 3, NORMALS),
+        vertex_array(constants.MDL_TEXTURE_COORD, constants.MDL_FLOAT, 2, TEXTURE_COORDS),
+        vertex_array(constants.MDL_BONEINDICE, constants.MDL_UNSIGNED_BYTE, 4, BONE_INDEXES),
+        vertex_array(constants.MDL_BONEWEIGHT, constants.MDL_UNSIGNED_BYTE, 4, BONE_WEIGHTS),
+        block(constants.MDL_INDICEARRAY, (
+            '<primitive_type>%s</primitive_type>'
+            '<variable_type><value>%s</value></variable_type>'
+            '<data>%s</data>'
+        ) % (primitive_type, constants.MDL_SHORT, ','.join(map(str, indices)))),
+    ])
+
+
+def bone(bone_id, name, frames, children=()):
+    keys = block(constants.MDL_ANIMATIONKEYS, (
+        '<animation_name>Walk</animation_name><frames>%s</frames>'
+    ) % ''.join(['<frame>%s</frame>' % f for f in frames]))
+    return block(constants.MDL_BONE, (
+        '<bone_id>%s</bone_id><matrix>%s</matrix>'
+    ) % (bone_id, IDENTITY), [props([['name', name]]), keys] + list(children))
+
+
+def scene_xml():
+    bones = bone(0, 'Armature', [IDENTITY, IDENTITY], [
+        bone(1, 'Spine', [IDENTITY, MOVED])
+    ])
+    child = block(constants.MDL_NODE, '<matrix>%s</matrix>' % MOVED, [
+        props([['name', 'Pivot']])
+    ])
+    mesh = block(constants.MDL_MESH, '<matrix>%s</matrix>' % IDENTITY, [
+        props([['name', 'Body']]),
+        surface('Skin', [0, 1, 2, 2, 1, 3], constants.MDL_TRIANGLES),
+        surface('Cloth', [0, 1, 2, 3], constants.MDL_TRIANGLE_STRIP, [3, 5]),
+        bones,
+        child,
+    ])
+    return block(constants.MDL_FILE, '<version>%s</version>' % constants.MDL_VERSION, [mesh])
+
+
+class MdlSceneTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'scene.mdl')
+        MdlCompiler(scene_xml(), self.path).compile()
+        self.scene = MdlScene(self.path).load()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_nodes(self):
+        self.assertEqual(self.scene.version, constants.MDL_VERSION)
+        self.assertEqual(len(self.scene.nodes), 1)
+        mesh = self.scene.nodes[0]
+        self.assertEqual(mesh['name'], 'Body')
+        self.assertEqual(len(mesh['children']), 1)
+        child = mesh['children'][0]
+        self.assertEqual(child['name'], 'Pivot')
+        self.assertEqual(child['matrix'], [float(v) for v in MOVED.split(',')])
+
+    def test_surfaces(self):
+        skin, cloth = self.scene.nodes[0]['surfaces']
+        self.assertEqual(skin['material'], 'Skin')
+        self.assertIsNone(skin['bones'])
+        self.assertEqual(cloth['bones'], [3, 5])
+        for s in [skin, cloth]:
+            self.assertEqual(s['positions'].tolist(), POSITIONS)
+            self.assertEqual(s['normals'].tolist(), NORMALS)
+            self.assertEqual(s['texture_coords'].tolist(), TEXTURE_COORDS)
+            self.assertEqual(s['bone_indexes'].tolist(), BONE_INDEXES)
+            self.assertEqual(s['bone_weights'].tolist(), BONE_WEIGHTS)
+        self.assertEqual(skin['indices'].tolist(), [0, 1, 2, 2, 1, 3])
+
+    def test_strip_expanded(self):
+        cloth = self.scene.nodes[0]['surfaces'][1]
+        triangles = cloth['indices'].tolist()
+        self.assertEqual(len(triangles), 6)
+        faces = set(frozenset(triangles[i:i + 3]) for i in range(0, 6, 3))
+        self.assertEqual(faces, set([frozenset([0, 1, 2]), frozenset([1, 2, 3])]))
+
+    def test_bones(self):
+        topmost = self.scene.nodes[0]['bones'][0]
+        self.assertEqual((topmost['name'], topmost['id']), ('Armature', 0))
+        spine = topmost['children'][0]
+        self.assertEqual((spine['name'], spine['id']), ('Spine', 1))
+        name, frames = spine['animations'][0]
+        self.assertEqual(name, 'Walk')
+        self.assertEqual(len(frames), 32)
+        self.assertEqual(frames[28:31].tolist(), [2.0, 3.0, 4.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from leadwerks import stats
+from leadwerks.config import ExportOptions
+
+from .stubs import exporter
+
+
+def bone(name, keyframes=0, children=()):
+    return types.SimpleNamespace(
+        name=name,
+        children=list(children),
+        animations=[{'name': 'Walk', 'keyframes': [None] * keyframes}] if keyframes else [],
+    )
+
+
+def mesh(triangles, bones=None):
+    return types.SimpleNamespace(
+        stats={'surfaces': 1, 'triangles': triangles, 'vertices': triangles * 3},
+        materials={},
+        is_animated=bool(bones),
+        armature=types.SimpleNamespace(bones=bones) if bones else None,
+    )
+
+
+class AssetStatsTest(unittest.TestCase):
+    def test_add_mesh(self):
+        topmost = bone('Armature', 10, [
+            bone('Hips', 10, [bone('Spine', 10), bone('Leg', 10)]),
+        ])
+        asset = stats.AssetStats('a.mdl')
+        asset.add_mesh(mesh(12, [topmost]))
+        asset.add_mesh(mesh(4))
+        values = asset.values()
+        self.assertEqual(values['meshes'], 2)
+        self.assertEqual(values['triangles'], 16)
+        self.assertEqual(values['bones'], 3)
+        self.assertEqual(values['actions'], 1)
+        self.assertEqual(values['keyframes'], 40)
+
+    def test_without_bones(self):
+        asset = stats.AssetStats('a.mdl')
+        asset.add_mesh(mesh(12, [bone('Armature', 10, [bone('Hips', 10)])]), with_bones=False)
+        self.assertEqual((asset.bones, asset.keyframes), (0, 0))
+
+    def test_check_budgets(self):
+        asset = stats.AssetStats('a.mdl')
+        asset.add_mesh(mesh(12))
+        asset.add_file('a.mdl', 3 * 1024 * 1024)
+        config = ExportOptions({'budget_triangles': 10, 'budget_vertices': 36, 'budget_file_size': 2})
+        self.assertEqual(stats.check_budgets([asset], config), [
+            '"a.mdl": 12 triangles over budget of 10',
+            '"a.mdl": 3145728 file size over budget of 2097152',
+        ])
+
+
+class ExporterBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.report = os.path.join(self.dir, 'a.stats.json')
+
+    def check(self, **options):
+        operator = mock.MagicMock()
+        ex = exporter.LeadwerksExporter(
+            filepath=os.path.join(self.dir, 'a.mdl'), operator=operator,
+            budget_triangles=10, **options
+        )
+        asset = stats.AssetStats('a.mdl')
+        asset.add_mesh(mesh(12))
+        ex.assets = [asset]
+        with mock.patch('sys.stdout'):
+            ret = ex.check_budgets()
+        return ret, [c[0][0] for c in operator.report.call_args_list]
+
+    def test_warn(self):
+        self.assertEqual(self.check(budget_action='WARN'), (True, [{'WARNING'}]))
+        self.assertTrue(os.path.exists(self.report))
+
+    def test_cancel(self):
+        self.assertEqual(self.check(budget_action='CANCEL'), (False, [{'ERROR'}]))
+        self.assertFalse(os.path.exists(self.report))
+
+
+if __name__ == '__main__':
+    unittest.main()
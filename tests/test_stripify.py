@@ -0,0 +1,72 @@
+import random
+import unittest
+from array import array
+
+from leadwerks.stripify import stripify, strip_to_triangles
+
+
+def winding(a, b, c):
+    """
+    Triangle rotated to start with its lowest index, keeping winding
+    """
+    return min([(a, b, c), (b, c, a), (c, a, b)])
+
+
+def triangle_set(indices):
+    return sorted([winding(*indices[i:i + 3]) for i in range(0, len(indices) - 2, 3)])
+
+
+def grid(width, height):
+    ret = array('I')
+    for y in range(0, height):
+        for x in range(0, width):
+            v = y * (width + 1) + x
+            ret.extend((v, v + 1, v + width + 1))
+            ret.extend((v + 1, v + width + 2, v + width + 1))
+    return ret
+
+
+class StripifyTest(unittest.TestCase):
+    def check(self, indices):
+        strip = stripify(indices)
+        self.assertIsNotNone(strip)
+        self.assertLess(len(strip), len(indices))
+        self.assertEqual(triangle_set(strip_to_triangles(strip)), triangle_set(indices))
+
+    def test_grid(self):
+        self.check(grid(8, 8))
+
+    def test_disconnected(self):
+        indices = grid(3, 1)
+        indices.extend([i + 100 for i in grid(2, 2)])
+        indices.extend((200, 201, 202))
+        self.check(indices)
+
+    def test_random_mesh(self):
+        rnd = random.Random(7)
+        indices = array('I')
+        for y in range(0, 12):
+            for x in range(0, 12):
+                v = y * 13 + x
+                quad = [(v, v + 1, v + 13), (v + 1, v + 14, v + 13)]
+                if rnd.random() < 0.5:
+                    quad = [(v, v + 1, v + 14), (v, v + 14, v + 13)]
+                for t in quad:
+                    if rnd.random() < 0.85:
+                        indices.extend(t)
+        self.check(indices)
+
+    def test_not_shorter(self):
+        self.assertIsNone(stripify(array('I')))
+        self.assertIsNone(stripify(array('I', (0, 1, 2))))
+        self.assertIsNone(stripify(array('I', (0, 1, 2, 3, 4, 5))))
+
+    def test_degenerates_skipped(self):
+        self.assertEqual(
+            strip_to_triangles(array('I', (0, 1, 2, 3, 3, 5, 5, 6, 7))).tolist(),
+            [0, 1, 2, 2, 1, 3, 5, 6, 7]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
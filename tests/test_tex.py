@@ -0,0 +1,126 @@
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy
+
+from leadwerks import constants, tex
+
+
+def read_tex(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = struct.unpack_from('<12i', data)
+    pos = 48
+    levels = []
+    for i in range(header[11]):
+        width, height, size = struct.unpack_from('<3i', data, pos)
+        pos += 12
+        levels.append((width, height, data[pos:pos + size]))
+        pos += size
+    return header, levels, pos == len(data)
+
+
+class TexWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        rnd = numpy.random.RandomState(0)
+        self.width, self.height = 8, 4
+        self.pixels = rnd.rand(self.width * self.height * 4).astype(numpy.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def convert(self, compression):
+        path = os.path.join(self.dir, 'test.tex')
+        tex.convert(path, self.pixels, self.width, self.height, compression)
+        return read_tex(path)
+
+    def test_header(self):
+        header, levels, complete = self.convert('NONE')
+        self.assertTrue(complete)
+        self.assertEqual(header, (
+            constants.TEX_SIGNATURE, constants.TEX_VERSION, constants.TEX_RGBA,
+            constants.TEX_TARGET_2D, 8, 4, 1, constants.TEX_FILTER_SMOOTH,
+            0, 0, 0, 4
+        ))
+
+    def test_mip_chain(self):
+        header, levels, complete = self.convert('NONE')
+        self.assertEqual([l[0:2] for l in levels], [(8, 4), (4, 2), (2, 1), (1, 1)])
+        for width, height, data in levels:
+            self.assertEqual(len(data), width * height * 4)
+
+    def test_top_level_is_flipped_pixels(self):
+        header, levels, complete = self.convert('NONE')
+        expected = tex.to_rgba8(tex.from_blender_pixels(self.pixels, 8, 4))
+        self.assertEqual(levels[0][2], expected.tobytes())
+        # Blender's first pixel row is the bottom one
+        self.assertEqual(levels[0][2][-32:], tex.to_rgba8(self.pixels[0:32]).tobytes())
+
+    def test_box_filter(self):
+        header, levels, complete = self.convert('NONE')
+        img = tex.from_blender_pixels(self.pixels, 8, 4)
+        box = img.reshape(2, 2, 4, 2, 4).mean(axis=(1, 3))
+        self.assertEqual(levels[1][2], tex.to_rgba8(box).tobytes())
+
+    def test_block_compression(self):
+        for compression, fmt, block_size in [
+            ('DXT1', constants.TEX_DXT1, 8),
+            ('DXT5', constants.TEX_DXT5, 16),
+        ]:
+            header, levels, complete = self.convert(compression)
+            self.assertTrue(complete)
+            self.assertEqual(header[2], fmt)
+            for width, height, data in levels:
+                blocks = ((width + 3) // 4) * ((height + 3) // 4)
+                self.assertEqual(len(data), blocks * block_size)
+
+    def test_memory_size(self):
+        for compression in ['NONE', 'DXT1', 'DXT5']:
+            header, levels, complete = self.convert(compression)
+            self.assertEqual(
+                sum(len(l[2]) for l in levels),
+                tex.memory_size(self.width, self.height, compression)
+            )
+
+
+class TexScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.tex')
+        self.black = numpy.zeros(4 * 4 * 4, dtype=numpy.float32)
+        self.white = numpy.ones(4 * 4 * 4, dtype=numpy.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_same_input_is_converted_once(self):
+        release = threading.Event()
+        converted = []
+
+        def convert(path, pixels, *args):
+            release.wait(5)
+            converted.append(float(pixels[0]))
+
+        with mock.patch.object(tex, 'convert', convert):
+            first = tex.schedule(self.path, self.black, 4, 4)
+            self.assertIs(tex.schedule(self.path, self.black.copy(), 4, 4), first)
+            self.assertIsNot(tex.schedule(self.path, self.black, 4, 4, 'DXT1'), first)
+            last = tex.schedule(self.path, self.white, 4, 4)
+            self.assertIsNot(last, first)
+            release.set()
+            self.assertEqual(tex.wait({self.path: last}), [])
+        # Conversions of the path run in the order they were queued
+        self.assertEqual(converted, [0.0, 0.0, 1.0])
+
+    def test_last_input_is_written(self):
+        futures = [tex.schedule(self.path, p, 4, 4) for p in [self.black, self.white]]
+        for f in futures:
+            f.result()
+        header, levels, complete = read_tex(self.path)
+        self.assertEqual(levels[0][2], b'\xff' * 64)
@@ -0,0 +1,52 @@
+import unittest
+from array import array
+
+from leadwerks.vertex_store import VertexStore
+
+
+def make_store(count=4):
+    store = VertexStore(count, True)
+    store.positions = array('f', range(0, count * 3))
+    store.normals = array('f', [1.0, -2.0, 0.5] * count)
+    store.texture_coords = array('f', range(100, 100 + count * 2))
+    for i in range(0, count):
+        store.set_bone_data(i, (i, 1, 1, 1), (255, 0, 0, 0))
+    return store
+
+
+class VertexStoreTest(unittest.TestCase):
+    def test_negate(self):
+        store = make_store()
+        store.negate('normals')
+        self.assertEqual(store.normals.tolist(), [-1.0, 2.0, -0.5] * 4)
+        # View is released, array can still grow
+        store.split(0, (0.5, 0.5))
+        self.assertEqual(len(store), 5)
+
+    def test_split(self):
+        store = make_store()
+        idx = store.split(2, (0.25, 0.75))
+        self.assertEqual(idx, 4)
+        self.assertEqual(store.positions[12:15].tolist(), [6.0, 7.0, 8.0])
+        self.assertEqual(store.texture_coords[8:10].tolist(), [0.25, 0.75])
+        self.assertEqual(store.bone_indexes[16:20].tolist(), [2, 1, 1, 1])
+        self.assertEqual(store.original.tolist(), [0, 1, 2, 3, 2])
+
+    def test_gather(self):
+        store = make_store()
+        store.split(1, (0.5, 0.5))
+        out = store.gather(array('I', [4, 0, 4, 3]))
+        self.assertEqual(len(out), 4)
+        self.assertEqual(out.positions.tolist(), [3.0, 4.0, 5.0, 0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 9.0, 10.0, 11.0])
+        self.assertEqual(out.texture_coords.tolist(), [0.5, 0.5, 100.0, 101.0, 0.5, 0.5, 106.0, 107.0])
+        self.assertEqual(out.bone_indexes.tolist(), [1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 3, 1, 1, 1])
+        self.assertEqual(out.original.tolist(), [1, 0, 1, 3])
+        for name in ['positions', 'normals', 'bone_weights', 'original']:
+            self.assertEqual(getattr(out, name).typecode, getattr(store, name).typecode)
+
+    def test_gather_without_texture_coords(self):
+        store = VertexStore(2, False)
+        out = store.gather(array('I', [1]))
+        self.assertEqual(len(out.positions), 3)
+        self.assertEqual(len(out.texture_coords), 0)
+        self.assertEqual(len(store.gather(array('I'))), 0)
@@ -0,0 +1,83 @@
+import unittest
+from array import array
+
+from leadwerks import weld
+
+
+def surface(offsets=None, indices=(0, 1, 2, 2, 4, 3)):
+    """
+    Four distinct vertices and a fifth one copying vertex 1, moved by
+    offsets {surface key: (element, delta)}
+    """
+    data = {
+        'vertices': [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 1.0, 0.0, 0.0, 1.0, 0.0],
+        'normals': [0.0, 0.0, 1.0] * 4,
+        'texture_coords': [0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0, 1.0],
+        'bone_indexes': [1, 0, 0, 0] * 4,
+        'bone_weights': [255, 0, 0, 0] * 4,
+        'original': [0, 1, 2, 3],
+    }
+    elements = dict([(key, count) for key, count, eps in weld.SURFACE_ATTRIBUTES])
+    for key, values in data.items():
+        values.extend(values[elements[key]:elements[key] * 2])
+    data['original'][4] = 4
+    for key, (element, delta) in (offsets or {}).items():
+        data[key][4 * elements[key] + element] += delta
+
+    return {
+        'vertices': array('f', data['vertices']),
+        'normals': array('f', data['normals']),
+        'texture_coords': array('f', data['texture_coords']),
+        'bone_indexes': array('B', data['bone_indexes']),
+        'bone_weights': array('B', data['bone_weights']),
+        'original': array('I', data['original']),
+        'indices': array('I', indices),
+    }
+
+
+def weld_surface(s, position=0.0, normal=0.0, uv=0.0):
+    return weld.weld_surface(s, position, normal, uv)
+
+
+class WeldTest(unittest.TestCase):
+    def test_exact_duplicate(self):
+        s = surface()
+        self.assertEqual(weld_surface(s), (5, 4))
+        self.assertEqual(s['indices'].tolist(), [0, 1, 2, 2, 1, 3])
+        self.assertEqual(s['original'].tolist(), [0, 1, 2, 3])
+        self.assertEqual(len(s['vertices']), 12)
+        self.assertEqual(len(s['bone_weights']), 16)
+
+    def test_position_epsilon(self):
+        self.assertEqual(weld_surface(surface({'vertices': (0, 0.004)}), position=0.005), (5, 4))
+        self.assertEqual(weld_surface(surface({'vertices': (0, 0.004)}), position=0.003), (5, 5))
+
+    def test_position_neighbour_cell(self):
+        # Vertex 1 sits at a cell boundary, the copy lands in the next cell
+        self.assertEqual(weld_surface(surface({'vertices': (1, -0.0005)}), position=0.001), (5, 4))
+
+    def test_normal_epsilon(self):
+        s = surface({'normals': (0, 0.01)})
+        self.assertEqual(weld_surface(s, position=0.001, normal=0.02), (5, 4))
+        s = surface({'normals': (0, 0.01)})
+        self.assertEqual(weld_surface(s, position=0.001, normal=0.005, uv=0.5), (5, 5))
+
+    def test_uv_epsilon(self):
+        s = surface({'texture_coords': (1, 0.01)})
+        self.assertEqual(weld_surface(s, uv=0.02), (5, 4))
+        s = surface({'texture_coords': (1, 0.01)})
+        self.assertEqual(weld_surface(s, position=0.5, normal=0.5, uv=0.005), (5, 5))
+
+    def test_bones_exact(self):
+        s = surface({'bone_weights': (0, -1)})
+        self.assertEqual(weld_surface(s, position=0.5, normal=0.5, uv=0.5), (5, 5))
+        self.assertEqual(s['indices'].tolist(), [0, 1, 2, 2, 4, 3])
+
+    def test_collapsed_triangles_dropped(self):
+        s = surface(indices=(0, 1, 2, 0, 1, 4))
+        self.assertEqual(weld_surface(s), (5, 4))
+        self.assertEqual(s['indices'].tolist(), [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from xml_tool.compiler import MdlCompiler
+from xml_tool.npz import MdlNpzDumper, MdlNpzCompiler
+from xml_tool.validator import MdlValidator
+
+from .test_loader import IDENTITY, MOVED, scene_xml
+
+
+PACKAGE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'io_scene_leadwerks'
+)
+
+
+class XmlToolTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = self.compile('scene.mdl', scene_xml())
+
+    def compile(self, name, xml):
+        path = os.path.join(self.dir, name)
+        MdlCompiler(xml, path).compile()
+        return path
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def run_tool(self, *args):
+        return subprocess.run(
+            [sys.executable, '-m', 'xml_tool'] + list(args),
+            cwd=PACKAGE_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+
+    def test_valid(self):
+        self.assertEqual(MdlValidator(self.path).validate(), [])
+
+    def test_truncated_block(self):
+        data = self.read(self.path)
+        truncated = os.path.join(self.dir, 'truncated.mdl')
+        with open(truncated, 'wb') as f:
+            f.write(data[0:-10])
+
+        errors = MdlValidator(truncated).validate()
+        self.assertIn('PROPERTIES payload', errors[0][1])
+        self.assertIn('runs past end of file', errors[0][1])
+        self.assertIn('num_kids', errors[-1][1])
+
+        result = self.run_tool('validate', truncated)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('runs past end of file', result.stdout)
+
+    def test_diff_exit_code(self):
+        same = self.compile('same.mdl', scene_xml())
+        self.assertEqual(self.run_tool('diff', self.path, same).returncode, 0)
+
+        moved = '<matrix>%s</matrix>' % MOVED
+        xml = scene_xml()
+        self.assertEqual(xml.count(moved), 1)
+        other = self.compile('other.mdl', xml.replace(moved, '<matrix>%s</matrix>' % IDENTITY))
+        result = self.run_tool('diff', self.path, other)
+        self.assertEqual(result.returncode, 1)
+        self.assertTrue(result.stdout.strip())
+
+    def test_npz_round_trip(self):
+        json_path = os.path.join(self.dir, 'scene.json')
+        MdlNpzDumper(self.path).dump(json_path)
+        self.assertTrue(os.path.exists(os.path.join(self.dir, 'scene.npz')))
+
+        compiled = os.path.join(self.dir, 'compiled.mdl')
+        MdlNpzCompiler(json_path, compiled).compile()
+        self.assertEqual(self.read(compiled), self.read(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()